@@ -34,6 +34,8 @@ struct ext_module_s {
   int (*add_pads)(void *, struct pad_list_s *);
   int (*close)(void*);
   int (*tick)(void*, uint64_t);
+  /* Optional: time of the next event (>= time + 1ps) the module needs to be ticked for. */
+  uint64_t (*next_event)(void*, uint64_t);
 };
 
 struct ext_module_list_s {
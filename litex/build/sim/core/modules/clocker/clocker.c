@@ -148,7 +148,7 @@ static int clocker_tick(void *sess, uint64_t time_ps)
   uint64_t phase_shift_ps = period_ps * s->phase_deg / 360;
 
   // phase-shifted time relative to start of current period
-  uint64_t rel_time_ps = (time_ps - phase_shift_ps) % period_ps;
+  uint64_t rel_time_ps = (time_ps + period_ps - phase_shift_ps) % period_ps;
   if (rel_time_ps < (period_ps/2)) {
     *s->clk = 1;
   } else {
@@ -158,13 +158,34 @@ static int clocker_tick(void *sess, uint64_t time_ps)
   return 0;
 }
 
+static uint64_t clocker_next_event(void *sess, uint64_t time_ps)
+{
+  static const uint64_t ps_in_sec = 1000000000000ull;
+  struct session_s *s = (struct session_s*) sess;
+
+  uint64_t period_ps = ps_in_sec / s->freq_hz;
+  uint64_t phase_shift_ps = period_ps * s->phase_deg / 360;
+  uint64_t next_ps;
+
+  // next rising/falling edge (same phase-shifted time as in clocker_tick)
+  uint64_t rel_time_ps = (time_ps + period_ps - phase_shift_ps) % period_ps;
+  if (rel_time_ps < (period_ps/2)) {
+    next_ps = time_ps + (period_ps/2 - rel_time_ps);
+  } else {
+    next_ps = time_ps + (period_ps - rel_time_ps);
+  }
+
+  return next_ps;
+}
+
 static struct ext_module_s ext_mod = {
   "clocker",
   clocker_start,
   clocker_new,
   clocker_add_pads,
   NULL,
-  clocker_tick
+  clocker_tick,
+  clocker_next_event
 };
 
 int litex_sim_ext_module_init(int (*register_module)(struct ext_module_s *))
@@ -169,6 +169,27 @@ int litex_sim_sort_session()
 
 struct event *ev;
 
+static uint64_t litex_sim_next_time(void)
+{
+  struct session_list_s *s;
+  uint64_t next_ps = 0;
+  uint64_t ps;
+
+  /* Jump to the next event (clock edge) of the modules, or step by timebase if none. */
+  for(s = sesslist; s; s=s->next)
+  {
+    if(!s->module->next_event)
+      continue;
+    ps = s->module->next_event(s->session, sim_time_ps);
+    if((next_ps == 0) || (ps < next_ps))
+      next_ps = ps;
+  }
+  if(next_ps <= sim_time_ps)
+    next_ps = sim_time_ps + timebase_ps;
+
+  return next_ps;
+}
+
 static void cb(int sock, short which, void *arg)
 {
   struct session_list_s *s;
@@ -195,7 +216,7 @@ static void cb(int sock, short which, void *arg)
         s->module->tick(s->session, sim_time_ps);
     }
 
-    sim_time_ps += timebase_ps;
+    sim_time_ps = litex_sim_next_time();
 
     if (litex_sim_got_finish()) {
         event_base_loopbreak(base);
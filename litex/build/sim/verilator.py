@@ -7,6 +7,10 @@
 
 import os
 import sys
+import json
+import shutil
+import hashlib
+import tempfile
 import subprocess
 from pathlib import Path
 from shutil import which
@@ -133,7 +137,8 @@ def _generate_sim_config(config):
     tools.write_to_file("sim_config.js", content)
 
 
-def _build_sim(build_name, sources, jobs, threads, coverage, opt_level="O3", trace_fst=False, video=False):
+def _build_sim(build_name, sources, jobs, threads, coverage, opt_level="O3", trace_fst=False, video=False,
+    include_paths=[], extra_mods=None, extra_mods_path=""):
     makefile = os.path.join(core_directory, 'Makefile')
 
     cc_srcs = []
@@ -142,7 +147,6 @@ def _build_sim(build_name, sources, jobs, threads, coverage, opt_level="O3", tra
             cc_srcs.append("--cc " + filename + " ")
 
     build_script_contents = """\
-rm -rf obj_dir/
 make -C . -f {} {} {} {} {} {} {}
 """.format(makefile,
     "CC_SRCS=\"{}\"".format("".join(cc_srcs)),
@@ -156,7 +160,130 @@ make -C . -f {} {} {} {} {} {} {}
     build_script_file = "build_" + build_name + ".sh"
     tools.write_to_file(build_script_file, build_script_contents, force_unix=True)
 
-def _compile_sim(build_name, verbose):
+    _generate_sim_build_hash(build_name, sources, include_paths, extra_mods, extra_mods_path)
+
+# Build Cache --------------------------------------------------------------------------------------
+
+# Vsim/modules only depend on the compiled sources and on the build flags/environment: data files
+# (.init/.hex, loaded by $readmemh) and sim_config.js are read at runtime and are not part of the
+# hash. The build is skipped when nothing changed, done incrementally (make) when only the sources
+# changed and done from scratch when the build flags/environment changed.
+
+# Paths are hashed relative to the build directory (or by their name outside of it) with the files
+# contents, so that builds of the same design in different directories share the cache.
+
+def _hash_path(path):
+    path = os.path.abspath(path)
+    if (path + os.sep).startswith(os.getcwd() + os.sep):
+        return os.path.relpath(path)
+    return os.path.basename(path)
+
+def _hash_files(h, filenames, root=None):
+    for filename in filenames:
+        h.update((_hash_path(filename) if root is None else os.path.relpath(filename, root)).encode())
+        with open(filename, "rb") as f:
+            h.update(f.read())
+
+def _hash_directory(h, directory):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        _hash_files(h, [os.path.join(root, f) for f in sorted(files)], root=directory)
+
+def _hash_build_files(h, filenames, paths):
+    # Generated build files, with their source/include/build paths replaced as hashed.
+    for filename in filenames:
+        with open(filename, "r") as f:
+            contents = f.read()
+        for path in sorted(paths, key=len, reverse=True):
+            contents = contents.replace(path, _hash_path(path))
+        h.update(filename.encode())
+        h.update(contents.encode())
+
+def _generate_sim_build_hash(build_name, sources, include_paths, extra_mods, extra_mods_path):
+    filenames = [filename for filename, *_ in sources if Path(filename).suffix not in [".hex", ".init"]]
+
+    # Build flags/environment.
+    config = hashlib.sha256()
+    paths  = [os.path.abspath(p) for p in filenames + include_paths] + [os.getcwd()]
+    _hash_build_files(config, ["build_" + build_name + ".sh", "variables.mak"], paths)
+    _hash_directory(config, core_directory)
+    for mod in sorted(extra_mods or []):
+        _hash_directory(config, os.path.join(extra_mods_path, mod))
+    if which("verilator") is not None:
+        config.update(subprocess.check_output(["verilator", "--version"]))
+
+    # Sources.
+    srcs = hashlib.sha256()
+    _hash_files(srcs, ["sim_header.h", "sim_init.cpp"])
+    _hash_files(srcs, filenames)
+    for path in include_paths:
+        if os.path.isdir(path):
+            srcs.update(_hash_path(path).encode())
+            _hash_directory(srcs, path)
+
+    build_hash = {"config": config.hexdigest(), "sources": srcs.hexdigest()}
+    tools.write_to_file("build_" + build_name + ".hash", json.dumps(build_hash, indent=4))
+
+def _read_sim_build_hash(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename, "r") as f:
+        return json.load(f)
+
+def _get_sim_build_outputs():
+    outputs = [os.path.join("obj_dir", "Vsim")]
+    if os.path.isdir("modules"):
+        outputs += [os.path.join("modules", f) for f in sorted(os.listdir("modules")) if f.endswith(".so")]
+    return outputs
+
+def _store_sim_build(cache_dir, key):
+    # Store Vsim/modules in the shared cache (in a temporary directory renamed once complete).
+    if os.path.exists(os.path.join(cache_dir, key)):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+    for output in _get_sim_build_outputs():
+        os.makedirs(os.path.join(tmp_dir, os.path.dirname(output)), exist_ok=True)
+        shutil.copy2(output, os.path.join(tmp_dir, output))
+    try:
+        os.rename(tmp_dir, os.path.join(cache_dir, key))
+    except OSError:
+        shutil.rmtree(tmp_dir) # Already stored.
+
+def _restore_sim_build(cache_dir, key):
+    # Restore Vsim/modules from the shared cache.
+    cache_key_dir = os.path.join(cache_dir, key)
+    if not os.path.isdir(cache_key_dir):
+        return False
+    for root, dirs, files in os.walk(cache_key_dir):
+        for f in files:
+            output = os.path.relpath(os.path.join(root, f), cache_key_dir)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            shutil.copy2(os.path.join(root, f), output)
+    return True
+
+def _compile_sim(build_name, verbose, cache_dir=None):
+    build_hash      = _read_sim_build_hash("build_" + build_name + ".hash")
+    build_hash_file = os.path.join("obj_dir", "build.hash")
+    last_build_hash = _read_sim_build_hash(build_hash_file)
+    if build_hash is not None:
+        key = build_hash["config"][:32] + build_hash["sources"][:32]
+
+        # Reuse previous build when nothing changed.
+        if build_hash == last_build_hash and os.path.exists(os.path.join("obj_dir", "Vsim")):
+            print("Reusing simulation build (unchanged sources).")
+            return
+
+        # Reuse build from the shared cache.
+        if cache_dir is not None and _restore_sim_build(cache_dir, key):
+            print("Reusing simulation build from {}.".format(os.path.join(cache_dir, key)))
+            tools.write_to_file(build_hash_file, json.dumps(build_hash, indent=4))
+            return
+
+    # Rebuild from scratch when the build flags/environment changed (incremental build otherwise).
+    if (build_hash is None) or (last_build_hash is None) or (build_hash["config"] != last_build_hash["config"]):
+        shutil.rmtree("obj_dir", ignore_errors=True)
+
     build_script_file = "build_" + build_name + ".sh"
     p = subprocess.Popen(["bash", build_script_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     output, _ = p.communicate()
@@ -170,6 +297,11 @@ def _compile_sim(build_name, verbose):
     if verbose:
         print(output)
 
+    if build_hash is not None:
+        tools.write_to_file(build_hash_file, json.dumps(build_hash, indent=4))
+        if cache_dir is not None:
+            _store_sim_build(cache_dir, key)
+
 def _run_sim(build_name, as_root=False, interactive=True):
     run_script_contents = "sudo " if as_root else ""
     run_script_contents += "obj_dir/Vsim"
@@ -212,10 +344,13 @@ class SimVerilatorToolchain:
             interactive      = True,
             pre_run_callback = None,
             extra_mods       = None,
-            extra_mods_path  = ""):
+            extra_mods_path  = "",
+            cache_dir        = None):
 
         # Create build directory
         os.makedirs(build_dir, exist_ok=True)
+        if cache_dir is not None:
+            cache_dir = os.path.abspath(cache_dir)
         cwd = os.getcwd()
         os.chdir(build_dir)
 
@@ -250,14 +385,17 @@ class SimVerilatorToolchain:
 
             # Build
             _build_sim(
-                build_name = build_name,
-                sources    = platform.sources,
-                jobs       = jobs,
-                threads    = threads,
-                coverage   = coverage,
-                opt_level  = opt_level,
-                trace_fst  = trace_fst,
-                video      = video,
+                build_name      = build_name,
+                sources         = platform.sources,
+                jobs            = jobs,
+                threads         = threads,
+                coverage        = coverage,
+                opt_level       = opt_level,
+                trace_fst       = trace_fst,
+                video           = video,
+                include_paths   = platform.verilog_include_paths,
+                extra_mods      = extra_mods,
+                extra_mods_path = extra_mods_path,
             )
 
         # Run
@@ -269,7 +407,7 @@ class SimVerilatorToolchain:
                 msg += "- Install Verilator.\n"
                 msg += "- Add Verilator toolchain to your $PATH."
                 raise OSError(msg)
-            _compile_sim(build_name, verbose)
+            _compile_sim(build_name, verbose, cache_dir=cache_dir)
             run_as_root = False
             if sim_config.has_module("ethernet") \
                or sim_config.has_module("xgmii_ethernet") \
@@ -291,6 +429,7 @@ def verilator_build_args(parser):
     toolchain_group.add_argument("--trace-start",  default="0",         help="Time to start tracing (ps).")
     toolchain_group.add_argument("--trace-end",    default="-1",        help="Time to end tracing (ps).")
     toolchain_group.add_argument("--opt-level",    default="O3",        help="Compilation optimization level.")
+    toolchain_group.add_argument("--cache-dir",    default=None,        help="Shared simulation build cache directory (across build directories).")
 
 def verilator_build_argdict(args):
     return {
@@ -300,5 +439,6 @@ def verilator_build_argdict(args):
         "trace_fst"   : args.trace_fst,
         "trace_start" : int(float(args.trace_start)),
         "trace_end"   : int(float(args.trace_end)),
-        "opt_level"   : args.opt_level
+        "opt_level"   : args.opt_level,
+        "cache_dir"   : args.cache_dir,
     }
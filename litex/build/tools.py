@@ -40,6 +40,24 @@ def write_to_file(filename, contents, force_unix=False):
         with open(filename, "w", newline=newline) as f:
             f.write(contents)
 
+def write_to_file_with_digest(filename, contents, digest=None, force_unix=False):
+    # Same as write_to_file, but with contents generated from a callable. When a digest of its
+    # inputs is provided, it is stored next to the file (.filename.digest) and contents are not
+    # (re-)generated when it matches the one of the previous write. Without digest, a stale
+    # digest file is removed.
+    digest_filename = os.path.join(os.path.dirname(filename), "." + os.path.basename(filename) + ".digest")
+    if digest is None:
+        if os.path.exists(digest_filename):
+            os.remove(digest_filename)
+    elif os.path.exists(filename) and os.path.exists(digest_filename):
+        with open(digest_filename, "r") as f:
+            if f.read() == digest:
+                return False
+    write_to_file(filename, contents(), force_unix)
+    if digest is not None:
+        write_to_file(digest_filename, digest)
+    return True
+
 def replace_in_file(filename, _from, _to):
     # Read in the file
     with open(filename, "r") as file :
@@ -0,0 +1,72 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen.fhdl.visit import NodeVisitor
+from migen.util.misc  import flat_iteration
+
+# Signal/Target Lister -----------------------------------------------------------------------------
+
+class SignalTargetLister(NodeVisitor):
+    # Equivalent of migen's list_signals and list_targets in a single traversal.
+    def __init__(self):
+        self.signals        = set()
+        self.targets        = set()
+        self.target_context = False
+
+    def visit_Signal(self, node):
+        self.signals.add(node)
+        if self.target_context:
+            self.targets.add(node)
+
+    def visit_Assign(self, node):
+        self.target_context = True
+        self.visit(node.l)
+        self.target_context = False
+        self.visit(node.r)
+
+    def visit_ArrayProxy(self, node):
+        for choice in node.choices:
+            self.visit(choice)
+        # The key of an assigned ArrayProxy is read, not assigned.
+        target_context, self.target_context = self.target_context, False
+        self.visit(node.key)
+        self.target_context = target_context
+
+def list_statements_targets(statements):
+    # (statement, targets) pairs of the (flattened) statements.
+    lister = SignalTargetLister()
+    r      = []
+    for statement in flat_iteration(statements):
+        lister.targets = set()
+        lister.visit(statement)
+        r.append((statement, lister.targets))
+    return r
+
+# Group By Targets ---------------------------------------------------------------------------------
+
+def group_by_targets(statements):
+    # Same groups (and group order) as migen.fhdl.tools.group_by_targets from (statement, targets)
+    # pairs, with groups merged through a union-find to remain linear in the number of statements.
+    # A merge makes the latest statement the root, so each root is the last statement of its group,
+    # which is also the position migen gives to the group.
+    parents = []
+    owners  = {}
+    def find(group):
+        while parents[group] != group:
+            parents[group] = parents[parents[group]]
+            group = parents[group]
+        return group
+    for group, (statement, targets) in enumerate(statements):
+        parents.append(group)
+        for target in targets:
+            if target in owners:
+                parents[find(owners[target])] = group
+            owners[target] = group
+    groups = {}
+    for group, (statement, targets) in enumerate(statements):
+        root_targets, root_statements = groups.setdefault(find(group), (set(), []))
+        root_targets |= targets
+        root_statements.append(statement)
+    return [groups[root] for root in sorted(groups)]
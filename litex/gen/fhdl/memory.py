@@ -5,6 +5,9 @@
 # This file is Copyright (c) 2021-2023 Florent Kermarrec <florent@enjoy-digital.fr>
 # SPDX-License-Identifier: BSD-2-Clause
 
+import sys
+import array
+
 from migen.fhdl.structure    import *
 from migen.fhdl.module       import *
 from migen.fhdl.bitcontainer import bits_for
@@ -12,6 +15,31 @@ from migen.fhdl.tools        import *
 from migen.fhdl.verilog      import _printexpr as verilog_printexpr
 from migen.fhdl.specials     import *
 
+# LiteX Memory Init Generation ---------------------------------------------------------------------
+
+def _memory_generate_init(init, width):
+    """Generate the $readmemh content (one hex word per line) of a Memory init."""
+    # Bulk conversion: words are packed to big-endian bytes (through an array for 32-bit words) and
+    # converted to hex in a single operation.
+    nbytes = width//8
+    if len(init) and (width % 8 == 0):
+        try:
+            if width == 32:
+                words = array.array("I", init)
+                if sys.byteorder == "little":
+                    words.byteswap()
+                data = memoryview(words)
+            else:
+                data = b"".join(d.to_bytes(nbytes, "big") for d in init)
+            content  = data.hex("\n", nbytes)
+            content += "\n" # In-place (no copy of the content).
+            return content
+        # Negative/oversized values or non-int init: use the generic formatting.
+        except (OverflowError, TypeError, AttributeError):
+            pass
+    formatter = f"{{:0{int(width/4)}x}}\n"
+    return "".join(formatter.format(d) for d in init)
+
 # LiteX Memory Verilog Generation ------------------------------------------------------------------
 
 def _memory_generate_verilog(name, memory, namespace, add_data_file):
@@ -26,7 +54,7 @@ def _memory_generate_verilog(name, memory, namespace, add_data_file):
 
     # Parameters.
     # -----------
-    r         = ""
+    r         = []
     adr_regs  = {}
     data_regs = {}
 
@@ -47,42 +75,39 @@ def _memory_generate_verilog(name, memory, namespace, add_data_file):
 
     # Memory Description.
     # -------------------
-    r += "//" + "-"*78 + "\n"
-    r += f"// Memory {_get_name(memory)}: {memory.depth}-words x {memory.width}-bit\n"
-    r += "//" + "-"*78 + "\n"
+    r.append("//" + "-"*78 + "\n")
+    r.append(f"// Memory {_get_name(memory)}: {memory.depth}-words x {memory.width}-bit\n")
+    r.append("//" + "-"*78 + "\n")
     for n, port in enumerate(memory.ports):
-        r += f"// Port {n} | "
+        r.append(f"// Port {n} | ")
         if port.async_read:
-            r += "Read: Async | "
+            r.append("Read: Async | ")
         else:
-            r += "Read: Sync  | "
+            r.append("Read: Sync  | ")
         if port.we is None:
-            r += "Write: ---- | "
+            r.append("Write: ---- | ")
         else:
-            r += "Write: Sync | "
-            r += "Mode: "
+            r.append("Write: Sync | ")
+            r.append("Mode: ")
             if port.mode == WRITE_FIRST:
-                r += "Write-First | "
+                r.append("Write-First | ")
             elif port.mode == READ_FIRST:
-                r += "Read-First  | "
+                r.append("Read-First  | ")
             elif port.mode == NO_CHANGE:
-                r += "No-Change | "
-            r += f"Write-Granularity: {port.we_granularity} "
-        r += "\n"
+                r.append("No-Change | ")
+            r.append(f"Write-Granularity: {port.we_granularity} ")
+        r.append("\n")
 
     # Memory Logic Declaration/Initialization.
     # ----------------------------------------
-    r += f"reg [{memory.width-1}:0] {_get_name(memory)}[0:{memory.depth-1}];\n"
+    r.append(f"reg [{memory.width-1}:0] {_get_name(memory)}[0:{memory.depth-1}];\n")
     if memory.init is not None:
-        content = ""
-        formatter = f"{{:0{int(memory.width/4)}x}}\n"
-        for d in memory.init:
-            content += formatter.format(d)
+        content = _memory_generate_init(memory.init, memory.width)
         memory_filename = add_data_file(f"{name}_{_get_name(memory)}.init", content)
 
-        r += "initial begin\n"
-        r += f"\t$readmemh(\"{memory_filename}\", {_get_name(memory)});\n"
-        r += "end\n"
+        r.append("initial begin\n")
+        r.append(f"\t$readmemh(\"{memory_filename}\", {_get_name(memory)});\n")
+        r.append("end\n")
 
     # Port Intermediate Signals.
     # --------------------------
@@ -94,27 +119,27 @@ def _memory_generate_verilog(name, memory, namespace, add_data_file):
         # Create Address Register in Write-First mode.
         if port.mode in [WRITE_FIRST]:
             adr_regs[n] = Signal(name_override=f"{_get_name(memory)}_adr{n}")
-            r += f"reg [{bits_for(memory.depth-1)-1}:0] {_get_name(adr_regs[n])};\n"
+            r.append(f"reg [{bits_for(memory.depth-1)-1}:0] {_get_name(adr_regs[n])};\n")
 
         # Create Data Register in Read-First/No Change mode.
         if port.mode in [READ_FIRST, NO_CHANGE]:
             data_regs[n] = Signal(name_override=f"{_get_name(memory)}_dat{n}")
-            r += f"reg [{memory.width-1}:0] {_get_name(data_regs[n])};\n"
+            r.append(f"reg [{memory.width-1}:0] {_get_name(data_regs[n])};\n")
 
     # Ports Write/Read Logic.
     # -----------------------
     for n, port in enumerate(memory.ports):
-        r += f"always @(posedge {_get_name(port.clock)}) begin\n"
+        r.append(f"always @(posedge {_get_name(port.clock)}) begin\n")
         # Write Logic.
         if port.we is not None:
             # Split Write Logic.
             for i in range(memory.width//port.we_granularity):
                 wbit = f"[{i}]" if memory.width != port.we_granularity else ""
-                r += f"\tif ({_get_name(port.we)}{wbit})\n"
+                r.append(f"\tif ({_get_name(port.we)}{wbit})\n")
                 lbit =     i*port.we_granularity
                 hbit = (i+1)*port.we_granularity-1
                 dslc = f"[{hbit}:{lbit}]" if (memory.width != port.we_granularity) else ""
-                r += f"\t\t{_get_name(memory)}[{_get_name(port.adr)}]{dslc} <= {_get_name(port.dat_w)}{dslc};\n"
+                r.append(f"\t\t{_get_name(memory)}[{_get_name(port.adr)}]{dslc} <= {_get_name(port.dat_w)}{dslc};\n")
 
         # Read Logic.
         if not port.async_read:
@@ -133,27 +158,27 @@ def _memory_generate_verilog(name, memory, namespace, add_data_file):
 
             # Add Read-Enable Logic.
             if port.re is None:
-                r += rd
+                r.append(rd)
             else:
-                r += f"\tif ({_get_name(port.re)})\n"
-                r += "\t" + rd.replace("\n\t", "\n\t\t")
-        r += "end\n"
+                r.append(f"\tif ({_get_name(port.re)})\n")
+                r.append("\t" + rd.replace("\n\t", "\n\t\t"))
+        r.append("end\n")
 
     # Ports Read Mapping.
     # -------------------
     for n, port in enumerate(memory.ports):
         # Direct (Asynchronous) Read on Async-Read mode.
         if port.async_read:
-            r += f"assign {_get_name(port.dat_r)} = {_get_name(memory)}[{_get_name(port.adr)}];\n"
+            r.append(f"assign {_get_name(port.dat_r)} = {_get_name(memory)}[{_get_name(port.adr)}];\n")
             continue
 
         # Write-First mode: Do Read through Address Register.
         if port.mode in [WRITE_FIRST]:
-            r += f"assign {_get_name(port.dat_r)} = {_get_name(memory)}[{_get_name(adr_regs[n])}];\n"
+            r.append(f"assign {_get_name(port.dat_r)} = {_get_name(memory)}[{_get_name(adr_regs[n])}];\n")
 
         # Read-First/No-Change mode: Data already Read on Data Register.
         if port.mode in [READ_FIRST, NO_CHANGE]:
-             r += f"assign {_get_name(port.dat_r)} = {_get_name(data_regs[n])};\n"
-    r += "\n\n"
+             r.append(f"assign {_get_name(port.dat_r)} = {_get_name(data_regs[n])};\n")
+    r.append("\n\n")
 
-    return r
+    return "".join(r)
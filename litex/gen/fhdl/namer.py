@@ -5,7 +5,8 @@
 # This file is Copyright (c) 2023 Florent Kermarrec <florent@enjoy-digital.fr>
 # SPDX-License-Identifier: BSD-2-Clause
 
-from itertools import combinations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 from migen.fhdl.structure import *
 
@@ -103,10 +104,15 @@ def _determine_name_usage(node, node_name=""):
         for child_name, child_node in node.children.items()
     }
 
-    # Check for naming conflicts between all pairs of children.
-    for (child1_name, names1), (child2_name, names2) in combinations(child_name_sets.items(), 2):
-        if names1 & names2:  # If there's an intersection, we have a naming conflict.
-            node.children[child1_name].use_name = node.children[child2_name].use_name = True
+    # Check for naming conflicts between children through a name-collision index (counting the
+    # children providing each name): a child is in conflict when one of its names is provided by
+    # another child. This is linear in the number of names (instead of pairwise intersections).
+    name_index = Counter()
+    for child_names in child_name_sets.values():
+        name_index.update(child_names)
+    for child_name, child_names in child_name_sets.items():
+        if any(name_index[name] > 1 for name in child_names):
+            node.children[child_name].use_name = True
 
     # Collect names, prepending child's name if necessary.
     for child_name, child_names in child_name_sets.items():
@@ -279,6 +285,29 @@ def _build_signal_name_dict_for_group(group_number, signals):
 
     return name_dict
 
+# Build Signal Names For Group Function (Parallel Worker) ------------------------------------------
+
+class _SignalStub:
+    """Lightweight, picklable stand-in for a Signal (only what group naming uses)."""
+    __slots__ = ("backtrace", "duid")
+
+    def __init__(self, backtrace, duid):
+        self.backtrace = backtrace
+        self.duid      = duid
+
+def _build_signal_names_for_group(group_number, backtraces_duids):
+    """Builds the names of a group of signals described by their (backtrace, duid).
+
+    Runs in a worker process: signals are replaced with _SignalStubs since Signals (and their
+    related/attributes) are expensive to pickle.
+
+    Returns:
+        list: The names, in the order of backtraces_duids.
+    """
+    signals   = [_SignalStub(backtrace, duid) for backtrace, duid in backtraces_duids]
+    name_dict = _build_signal_name_dict_for_group(group_number, signals)
+    return [name_dict[signal] for signal in signals]
+
 # Build Signal Groups Function ---------------------------------------------------------------------
 
 def _build_signal_groups(signals):
@@ -358,12 +387,12 @@ def _update_name_dict_with_group(name_dict, group_number, group_name_dict, group
 
 # Build Signal Name Dict Function ------------------------------------------------------------------
 
-def _build_signal_name_dict(signals):
+def _build_signal_name_dict(signals, jobs=1):
     """Builds a complete signal-to-name dictionary using a hierarchical tree.
 
     Parameters:
-        signals    (iterable): An iterable of all signals to be named.
-        tree (_HierarchyNode): The root node of the tree used for name resolution.
+        signals (iterable): An iterable of all signals to be named.
+        jobs         (int): Number of worker processes used to name the groups in parallel.
 
     Returns:
         dict: A complete dictionary mapping signals to their hierarchical names.
@@ -371,11 +400,24 @@ def _build_signal_name_dict(signals):
     # Group the signals based on their relationships.
     groups = _build_signal_groups(signals)
 
-    # Generate a name mapping for each group.
-    group_name_dict_mappings = [
-        _build_signal_name_dict_for_group(group_number, group_signals)
-        for group_number, group_signals in enumerate(groups)
-    ]
+    # Generate a name mapping for each group (groups are independent and can be named in parallel).
+    if jobs > 1 and len(groups) > 1:
+        groups = [list(group_signals) for group_signals in groups]
+        with ProcessPoolExecutor(max_workers=min(jobs, len(groups))) as executor:
+            futures = [
+                executor.submit(_build_signal_names_for_group, group_number,
+                    [(signal.backtrace, signal.duid) for signal in group_signals])
+                for group_number, group_signals in enumerate(groups)
+            ]
+            group_name_dict_mappings = [
+                dict(zip(group_signals, future.result()))
+                for group_signals, future in zip(groups, futures)
+            ]
+    else:
+        group_name_dict_mappings = [
+            _build_signal_name_dict_for_group(group_number, group_signals)
+            for group_number, group_signals in enumerate(groups)
+        ]
 
     # Create the final signal-to-name mapping.
     name_dict = {}
@@ -456,18 +498,20 @@ class SignalNamespace:
 
 # Build Signal Namespace function ------------------------------------------------------------------
 
-def build_signal_namespace(signals, reserved_keywords=set()):
+def build_signal_namespace(signals, reserved_keywords=set(), jobs=1):
     """Constructs a namespace where each signal is given a unique hierarchical name.
     Parameters:
         signals                (iterable): An iterable of all signals to be named.
         reserved_keywords (set, optional): A set of keywords that cannot be used as signal names.
+        jobs              (int, optional): Number of worker processes used to name the independent
+                                           related groups in parallel (1: sequential).
 
     Returns:
         SignalNamespace: An object that contains the mapping of signals to unique names and provides methods to access them.
     """
 
     # Create the primary signal-to-name dictionary.
-    pnd = _build_signal_name_dict(signals)
+    pnd = _build_signal_name_dict(signals, jobs=jobs)
 
     # Initialize the namespace with reserved keywords and the primary mapping.
     namespace = SignalNamespace(pnd, reserved_keywords)
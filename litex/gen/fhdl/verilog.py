@@ -28,6 +28,7 @@ from migen.fhdl.specials    import Instance, Memory
 
 from litex.gen import LiteXContext
 from litex.gen.fhdl.namer     import build_signal_namespace
+from litex.gen.fhdl.analysis  import SignalTargetLister, group_by_targets
 from litex.gen.fhdl.hierarchy import LiteXHierarchyExplorer
 
 from litex.build.tools import get_litex_git_revision
@@ -70,12 +71,7 @@ def _generate_trailer():
 )
 
 def _generate_separator(msg=""):
-    r =  "\n"
-    r +=  "//" + "-"*78 + "\n"
-    r += f"// {msg}\n"
-    r +=  "//" + "-"*78 + "\n"
-    r += "\n"
-    return r
+    return "\n//" + "-"*78 + f"\n// {msg}\n//" + "-"*78 + "\n\n"
 
 # ------------------------------------------------------------------------------------------------ #
 #                                         TIMESCALE                                                #
@@ -305,9 +301,16 @@ class AssignType(IntEnum):
     SIGNAL       = 2
 
 def _generate_node(ns, at, level, node, target_filter=None):
+    r = []
+    _emit_node(r, ns, at, level, node, target_filter)
+    return "".join(r)
+
+def _emit_node(r, ns, at, level, node, target_filter=None):
+    # Append the Verilog of node to r (a list of strings joined once by the caller, to keep
+    # generation linear in the output size).
     assert at in [item.value for item in AssignType]
     if target_filter is not None and target_filter not in list_targets(node):
-        return ""
+        return
 
     # Assignment.
     elif isinstance(node, _Assign):
@@ -319,55 +322,51 @@ def _generate_node(ns, at, level, node, target_filter=None):
             assignment = " = "
         else:
             assignment = " <= "
-        return _tab*level + _generate_expression(ns, node.l)[0] + assignment + _generate_expression(ns, node.r)[0] + ";\n"
+        r.append(_tab*level + _generate_expression(ns, node.l)[0] + assignment + _generate_expression(ns, node.r)[0] + ";\n")
 
     # Iterable.
     elif isinstance(node, collections.abc.Iterable):
-        return "".join(_generate_node(ns, at, level, n, target_filter) for n in node)
+        for n in node:
+            _emit_node(r, ns, at, level, n, target_filter)
 
     # If.
     elif isinstance(node, If):
-        r = _tab*level + "if (" + _generate_expression(ns, node.cond)[0] + ") begin\n"
-        r += _generate_node(ns, at, level + 1, node.t, target_filter)
+        r.append(_tab*level + "if (" + _generate_expression(ns, node.cond)[0] + ") begin\n")
+        _emit_node(r, ns, at, level + 1, node.t, target_filter)
         if node.f:
-            r += _tab*level + "end else begin\n"
-            r += _generate_node(ns, at, level + 1, node.f, target_filter)
-        r += _tab*level + "end\n"
-        return r
+            r.append(_tab*level + "end else begin\n")
+            _emit_node(r, ns, at, level + 1, node.f, target_filter)
+        r.append(_tab*level + "end\n")
 
     # Case.
     elif isinstance(node, Case):
         if node.cases:
-            r = _tab*level + "case (" + _generate_expression(ns, node.test)[0] + ")\n"
+            r.append(_tab*level + "case (" + _generate_expression(ns, node.test)[0] + ")\n")
             css = [(k, v) for k, v in node.cases.items() if isinstance(k, Constant)]
             css = sorted(css, key=lambda x: x[0].value)
             for choice, statements in css:
-                r += _tab*(level + 1) + _generate_expression(ns, choice)[0] + ": begin\n"
-                r += _generate_node(ns, at, level + 2, statements, target_filter)
-                r += _tab*(level + 1) + "end\n"
+                r.append(_tab*(level + 1) + _generate_expression(ns, choice)[0] + ": begin\n")
+                _emit_node(r, ns, at, level + 2, statements, target_filter)
+                r.append(_tab*(level + 1) + "end\n")
             if "default" in node.cases:
-                r += _tab*(level + 1) + "default: begin\n"
-                r += _generate_node(ns, at, level + 2, node.cases["default"], target_filter)
-                r += _tab*(level + 1) + "end\n"
-            r += _tab*level + "endcase\n"
-            return r
-        else:
-            return ""
+                r.append(_tab*(level + 1) + "default: begin\n")
+                _emit_node(r, ns, at, level + 2, node.cases["default"], target_filter)
+                r.append(_tab*(level + 1) + "end\n")
+            r.append(_tab*level + "endcase\n")
 
     # Display.
     elif isinstance(node, Display):
-        s = "\"" + node.s + "\""
+        s = ["\"" + node.s + "\""]
         for arg in node.args:
-            s += ", "
             if isinstance(arg, Signal):
-                s += ns.get_name(arg)
+                s.append(ns.get_name(arg))
             else:
-                s += str(arg)
-        return _tab*level + "$display(" + s + ");\n"
+                s.append(str(arg))
+        r.append(_tab*level + "$display(" + ", ".join(s) + ");\n")
 
     # Finish.
     elif isinstance(node, Finish):
-        return _tab*level + "$finish;\n"
+        r.append(_tab*level + "$finish;\n")
 
     # Unknown.
     else:
@@ -378,8 +377,7 @@ def _generate_node(ns, at, level, node, target_filter=None):
 # ------------------------------------------------------------------------------------------------ #
 
 def _generate_attribute(attr, attr_translate):
-    r = ""
-    first = True
+    r = []
     for attr in sorted(attr, key=lambda x: ("", x) if isinstance(x, str) else x):
         if isinstance(attr, tuple):
             # Platform-dependent attribute.
@@ -390,152 +388,169 @@ def _generate_attribute(attr, attr_translate):
             if at is None:
                 continue
             attr_name, attr_value = at
-        if not first:
-            r += ", "
-        first = False
         const_expr = "\"" + attr_value + "\"" if not isinstance(attr_value, int) else str(attr_value)
-        r += attr_name + " = " + const_expr
+        r.append(attr_name + " = " + const_expr)
     if r:
-        r = "(* " + r + " *)\n"
-    return r
+        return "(* " + ", ".join(r) + " *)\n"
+    return ""
 
 # ------------------------------------------------------------------------------------------------ #
-#                                           MODULE                                                 #
+#                                          ANALYSIS                                                #
 # ------------------------------------------------------------------------------------------------ #
 
 def _use_wire(stmts):
     return (len(stmts) == 1 and isinstance(stmts[0], _Assign) and
             not isinstance(stmts[0].l, _Slice))
 
-def _list_comb_wires(f):
-    r = set()
-    groups = group_by_targets(f.comb)
-    for g in groups:
-        if _use_wire(g[1]):
-            r |= g[0]
-    return r
+class _FragmentAnalysis:
+    """Signals, targets, special IOs, comb groups and wires of a fragment.
+
+    Computed once per conversion (in a single traversal of the statements) and shared by all the
+    Verilog generation stages.
+    """
+    def __init__(self, f):
+        lister  = SignalTargetLister()
+        targets = set()
+
+        # Comb statements (with their targets, for grouping).
+        self.comb_statements = []
+        for statement in flat_iteration(f.comb):
+            lister.targets = set()
+            lister.visit(statement)
+            self.comb_statements.append((statement, lister.targets))
+            targets |= lister.targets
+
+        # Sync statements.
+        lister.targets = targets
+        lister.visit(f.sync)
+
+        # Specials IOs.
+        self.special_ios  = list_special_ios(f, ins=True,  outs=True,  inouts=True)
+        self.special_outs = list_special_ios(f, ins=False, outs=True,  inouts=True)
+        self.inouts       = list_special_ios(f, ins=False, outs=False, inouts=True)
+
+        # Signals/Targets.
+        self.signals = lister.signals | self.special_ios
+        self.targets = lister.targets | self.special_outs
+
+        # Comb groups/Wires.
+        self.comb_groups = group_by_targets(self.comb_statements)
+        self.wires       = set(self.special_outs)
+        for group_targets, group_statements in self.comb_groups:
+            if _use_wire(group_statements):
+                self.wires |= group_targets
+
+# ------------------------------------------------------------------------------------------------ #
+#                                           MODULE                                                 #
+# ------------------------------------------------------------------------------------------------ #
 
-def _generate_module(f, ios, name, ns, attr_translate):
-    sigs         = list_signals(f) | list_special_ios(f, ins=True, outs=True, inouts=True)
-    special_outs = list_special_ios(f, ins=False, outs=True,  inouts=True)
-    inouts       = list_special_ios(f, ins=False, outs=False, inouts=True)
-    targets      = list_targets(f) | special_outs
-    wires        = _list_comb_wires(f) | special_outs
+def _generate_module(analysis, ios, name, ns, attr_translate):
+    inouts  = analysis.inouts
+    targets = analysis.targets
+    wires   = analysis.wires
 
-    r = f"module {name} (\n"
-    firstp = True
+    ports = []
     for sig in sorted(ios, key=lambda x: ns.get_name(x)):
-        if not firstp:
-            r += ",\n"
-        firstp = False
         attr = _generate_attribute(sig.attr, attr_translate)
-        if attr:
-            r += _tab + attr
+        port = _tab + attr if attr else ""
         sig.type = "wire"
         sig.name = ns.get_name(sig)
         sig.port = True
         if sig in inouts:
             sig.direction = "inout"
-            r += _tab + "inout  wire " + _generate_signal(ns, sig)
+            port += _tab + "inout  wire " + _generate_signal(ns, sig)
         elif sig in targets:
             sig.direction = "output"
             if sig in wires:
-                r += _tab + "output wire " + _generate_signal(ns, sig)
+                port += _tab + "output wire " + _generate_signal(ns, sig)
             else:
                 sig.type = "reg"
-                r += _tab + "output reg  " + _generate_signal(ns, sig)
+                port += _tab + "output reg  " + _generate_signal(ns, sig)
         else:
             sig.direction = "input"
-            r += _tab + "input  wire " + _generate_signal(ns, sig)
-    r += "\n);\n\n"
+            port += _tab + "input  wire " + _generate_signal(ns, sig)
+        ports.append(port)
 
-    return r
+    return f"module {name} (\n" + ",\n".join(ports) + "\n);\n\n"
 
-def _generate_signals(f, ios, name, ns, attr_translate, regs_init):
-    sigs = list_signals(f) | list_special_ios(f, ins=True, outs=True, inouts=True)
-    special_outs = list_special_ios(f, ins=False, outs=True,  inouts=True)
-    inouts       = list_special_ios(f, ins=False, outs=False, inouts=True)
-    targets      = list_targets(f) | special_outs
-    wires        = _list_comb_wires(f) | special_outs
+def _generate_signals(analysis, ios, name, ns, attr_translate, regs_init):
+    wires = analysis.wires
 
-    r = ""
-    for sig in sorted(sigs - ios, key=lambda x: ns.get_name(x)):
-        r += _generate_attribute(sig.attr, attr_translate)
+    r = []
+    for sig in sorted(analysis.signals - ios, key=lambda x: ns.get_name(x)):
+        r.append(_generate_attribute(sig.attr, attr_translate))
         if sig in wires:
-            r += "wire " + _generate_signal(ns, sig) + ";\n"
+            r.append("wire " + _generate_signal(ns, sig) + ";\n")
         else:
-            r += "reg  " + _generate_signal(ns, sig)
+            r.append("reg  " + _generate_signal(ns, sig))
             if regs_init:
-                r += " = " + _generate_expression(ns, sig.reset)[0]
-            r += ";\n"
-    return r
+                r.append(" = " + _generate_expression(ns, sig.reset)[0])
+            r.append(";\n")
+    return "".join(r)
 
 # ------------------------------------------------------------------------------------------------ #
 #                                  COMBINATORIAL LOGIC                                             #
 # ------------------------------------------------------------------------------------------------ #
 
-def _generate_combinatorial_logic_sim(f, ns):
-    r = ""
-    if f.comb:
+def _generate_combinatorial_logic_sim(analysis, ns):
+    r = []
+    if analysis.comb_statements:
         target_stmt_map = collections.defaultdict(list)
 
-        for statement in flat_iteration(f.comb):
-            targets = list_targets(statement)
+        for statement, targets in analysis.comb_statements:
             for t in targets:
                 target_stmt_map[t].append(statement)
 
-        groups = group_by_targets(f.comb)
-
         for n, (t, stmts) in enumerate(target_stmt_map.items()):
             assert isinstance(t, Signal)
             if _use_wire(stmts):
-                r += "assign " + _generate_node(ns, AssignType.BLOCKING, 0, stmts[0])
+                r.append("assign ")
+                _emit_node(r, ns, AssignType.BLOCKING, 0, stmts[0])
             else:
-                r += "always @(*) begin\n"
-                r += _tab + ns.get_name(t) + " <= " + _generate_expression(ns, t.reset)[0] + ";\n"
-                r += _generate_node(ns, AssignType.NON_BLOCKING, 1, stmts, t)
-                r += "end\n"
-    r += "\n"
-    return r
-
-def _generate_combinatorial_logic_synth(f, ns):
-    r = ""
-    if f.comb:
-        groups = group_by_targets(f.comb)
-
-        for n, g in enumerate(groups):
+                r.append("always @(*) begin\n")
+                r.append(_tab + ns.get_name(t) + " <= " + _generate_expression(ns, t.reset)[0] + ";\n")
+                _emit_node(r, ns, AssignType.NON_BLOCKING, 1, stmts, t)
+                r.append("end\n")
+    r.append("\n")
+    return "".join(r)
+
+def _generate_combinatorial_logic_synth(analysis, ns):
+    r = []
+    if analysis.comb_groups:
+        for n, g in enumerate(analysis.comb_groups):
             if _use_wire(g[1]):
-                r += "assign " + _generate_node(ns, AssignType.BLOCKING, 0, g[1][0])
+                r.append("assign ")
+                _emit_node(r, ns, AssignType.BLOCKING, 0, g[1][0])
             else:
-                r += "always @(*) begin\n"
+                r.append("always @(*) begin\n")
                 for t in sorted(g[0], key=lambda x: ns.get_name(x)):
-                    r += _tab + ns.get_name(t) + " <= " + _generate_expression(ns, t.reset)[0] + ";\n"
-                r += _generate_node(ns, AssignType.NON_BLOCKING, 1, g[1])
-                r += "end\n"
-    r += "\n"
-    return r
+                    r.append(_tab + ns.get_name(t) + " <= " + _generate_expression(ns, t.reset)[0] + ";\n")
+                _emit_node(r, ns, AssignType.NON_BLOCKING, 1, g[1])
+                r.append("end\n")
+    r.append("\n")
+    return "".join(r)
 
 # ------------------------------------------------------------------------------------------------ #
 #                                    SYNCHRONOUS LOGIC                                             #
 # ------------------------------------------------------------------------------------------------ #
 
 def _generate_synchronous_logic(f, ns):
-    r = ""
+    r = []
     for k, v in sorted(f.sync.items(), key=itemgetter(0)):
-        r += "always @(posedge " + ns.get_name(f.clock_domains[k].clk) + ") begin\n"
-        r += _generate_node(ns, AssignType.SIGNAL, 1, v)
-        r += "end\n\n"
-    return r
+        r.append("always @(posedge " + ns.get_name(f.clock_domains[k].clk) + ") begin\n")
+        _emit_node(r, ns, AssignType.SIGNAL, 1, v)
+        r.append("end\n\n")
+    return "".join(r)
 
 # ------------------------------------------------------------------------------------------------ #
 #                                      SPECIALS                                                    #
 # ------------------------------------------------------------------------------------------------ #
 
 def _generate_specials(name, overrides, specials, namespace, add_data_file, attr_translate):
-    r = ""
+    r = []
     for special in sorted(specials, key=lambda x: x.duid):
         if hasattr(special, "attr"):
-            r += _generate_attribute(special.attr, attr_translate)
+            r.append(_generate_attribute(special.attr, attr_translate))
         # Replace Migen Memory's emit_verilog with LiteX's implementation.
         if isinstance(special, Memory):
             from litex.gen.fhdl.memory import _memory_generate_verilog
@@ -548,8 +563,8 @@ def _generate_specials(name, overrides, specials, namespace, add_data_file, attr
             pr = call_special_classmethod(overrides, special, "emit_verilog", namespace, add_data_file)
         if pr is None:
             raise NotImplementedError("Special " + str(special) + " failed to implement emit_verilog")
-        r += pr
-    return r
+        r.append(pr)
+    return "".join(r)
 
 # ------------------------------------------------------------------------------------------------ #
 #                                    FHDL --> VERILOG                                              #
@@ -622,75 +637,76 @@ def convert(f, ios=set(), name="top", platform=None,
             if io_name:
                 io.name_override = io_name
 
+    # Analyze Fragment (once, shared by all the generation stages).
+    # --------------------------------------------------------------
+    analysis = _FragmentAnalysis(f)
+
     # Build Signal Namespace.
     # ----------------------
     ns = build_signal_namespace(
-        signals = (
-            list_signals(f) |
-            list_special_ios(f, ins=True, outs=True, inouts=True) |
-            ios
-        ),
+        signals           = analysis.signals | ios,
         reserved_keywords = _ieee_1800_2017_verilog_reserved_keywords
     )
     ns.clock_domains = f.clock_domains
 
     # Build Verilog.
     # --------------
-    verilog = ""
+    # Sections are accumulated in a list and joined once (linear in the output size).
+    verilog = []
 
     # Banner.
-    verilog += _generate_banner(
+    verilog.append(_generate_banner(
         filename = name,
         device   = getattr(platform, "device", "Unknown")
-    )
+    ))
 
     # Timescale.
-    verilog += _generate_timescale(
+    verilog.append(_generate_timescale(
         time_unit      = time_unit,
         time_precision = time_precision
-    )
+    ))
 
     # Module Definition.
-    verilog += _generate_separator("Module")
-    verilog += _generate_module(f, ios, name, ns, attr_translate)
+    verilog.append(_generate_separator("Module"))
+    verilog.append(_generate_module(analysis, ios, name, ns, attr_translate))
 
     # Module Hierarchy.
-    verilog += _generate_separator("Hierarchy")
-    verilog += _generate_hierarchy(top=LiteXContext.top)
+    verilog.append(_generate_separator("Hierarchy"))
+    verilog.append(_generate_hierarchy(top=LiteXContext.top))
 
     # Module Signals.
-    verilog += _generate_separator("Signals")
-    verilog += _generate_signals(f, ios, name, ns, attr_translate, regs_init)
+    verilog.append(_generate_separator("Signals"))
+    verilog.append(_generate_signals(analysis, ios, name, ns, attr_translate, regs_init))
 
     # Combinatorial Logic.
-    verilog += _generate_separator("Combinatorial Logic")
+    verilog.append(_generate_separator("Combinatorial Logic"))
     if regular_comb:
-        verilog += _generate_combinatorial_logic_synth(f, ns)
+        verilog.append(_generate_combinatorial_logic_synth(analysis, ns))
     else:
-        verilog += _generate_combinatorial_logic_sim(f, ns)
+        verilog.append(_generate_combinatorial_logic_sim(analysis, ns))
 
     # Synchronous Logic.
-    verilog += _generate_separator("Synchronous Logic")
-    verilog += _generate_synchronous_logic(f, ns)
+    verilog.append(_generate_separator("Synchronous Logic"))
+    verilog.append(_generate_synchronous_logic(f, ns))
 
     # Specials
-    verilog += _generate_separator("Specialized Logic")
-    verilog += _generate_specials(
+    verilog.append(_generate_separator("Specialized Logic"))
+    verilog.append(_generate_specials(
         name           = name,
         overrides      = special_overrides,
         specials       = f.specials - lowered_specials,
         namespace      = ns,
         add_data_file  = r.add_data_file,
         attr_translate = attr_translate
-    )
+    ))
 
     # Module End.
-    verilog += "endmodule\n"
+    verilog.append("endmodule\n")
 
     # Trailer.
-    verilog += _generate_trailer()
+    verilog.append(_generate_trailer())
 
-    r.set_main_source(verilog)
+    r.set_main_source("".join(verilog))
     r.ns = ns
 
     return r
@@ -7,18 +7,32 @@
 from migen import *
 
 from functools import reduce
-from operator import and_, or_, not_, xor, add
+from operator import and_, or_, xor, add
 
 # Reduction ----------------------------------------------------------------------------------------
 
-def Reduce(operator, value):
-    # List of supported Operators.
+def _reduce_level(operator, values):
+    # Reduce values by pairs (an odd value is passed to the next level).
+    return [operator(*values[i:i+2]) if (i + 1) < len(values) else values[i]
+        for i in range(0, len(values), 2)]
+
+def Reduce(operator, value, mode="chain", stages=1, module=None, clock_domain="sys"):
+    """Reduce value (Signal/Constant bits or list of values) with operator.
+
+    Modes:
+    - "chain"     : Linear chain of N-1 operators (Python's reduction, default).
+    - "tree"      : Balanced binary tree of operators (log2(N) levels).
+    - "pipelined" : Balanced binary tree with stages register layers spread over the levels; the
+                    result is delayed by stages cycles and the registers are added to module (in
+                    clock_domain).
+    """
+    # List of supported Operators (and output inversion).
     operators = {
-        "AND"  : and_,
-        "OR"   : or_,
-        "NOR"  : not_,
-        "XOR"  : xor,
-        "ADD"  : add,
+        "AND"  : (and_, False),
+        "OR"   : (or_,  False),
+        "NOR"  : (or_,  True),
+        "XOR"  : (xor,  False),
+        "ADD"  : (add,  False),
     }
 
     # Switch to upper-case.
@@ -28,6 +42,40 @@ def Reduce(operator, value):
     if operator not in operators.keys():
         supported = ", ".join(operators.keys())
         raise ValueError(f"Reduce does not support {operator} operator; supported: {supported}.")
+    operator, invert = operators[operator]
+
+    # Check mode.
+    if mode not in ["chain", "tree", "pipelined"]:
+        raise ValueError(f"Reduce does not support {mode} mode; supported: chain, tree, pipelined.")
+    if mode == "pipelined" and module is None:
+        raise ValueError("Reduce pipelined mode requires a module to add the registers to.")
+
+    values = list(value)
+
+    # Chain: Return Python's reduction.
+    if mode == "chain":
+        r = reduce(operator, values)
+
+    # Tree: Reduce level by level.
+    elif mode == "tree":
+        while len(values) > 1:
+            values = _reduce_level(operator, values)
+        r = values[0]
+
+    # Pipelined: Reduce level by level and register the values after the selected levels.
+    else:
+        levels = log2_int(len(values), need_pow2=False)
+        def register(values):
+            values_r = [Signal.like(v) for v in values]
+            sync = getattr(module.sync, clock_domain)
+            sync += [v_r.eq(v) for v_r, v in zip(values_r, values)]
+            return values_r
+        for level in range(levels + 1):
+            if level:
+                values = _reduce_level(operator, values)
+            for stage in range(1, stages + 1):
+                if (levels*stage + stages - 1)//stages == level:
+                    values = register(values)
+        r = values[0]
 
-    # Return Python's reduction.
-    return reduce(operators[operator], value)
+    return ~r if invert else r
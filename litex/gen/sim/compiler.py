@@ -0,0 +1,408 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import collections
+
+from migen.fhdl.structure import *
+from migen.fhdl.structure import _Operator, _Slice, _ArrayProxy, _Assign
+from migen.fhdl.bitcontainer import value_bits_sign
+from migen.fhdl.specials import _MemoryLocation
+
+# Helpers ------------------------------------------------------------------------------------------
+
+str2pyop = {
+    "+"   : "+",
+    "-"   : "-",
+    "*"   : "*",
+
+    ">>>" : ">>",
+    "<<<" : "<<",
+
+    "&"   : "&",
+    "^"   : "^",
+    "|"   : "|",
+
+    "<"   : "<",
+    "<="  : "<=",
+    "=="  : "==",
+    "!="  : "!=",
+    ">"   : ">",
+    ">="  : ">=",
+}
+
+
+def _unsupported(node):
+    raise NotImplementedError(node)
+
+
+def _raise(exception):
+    raise exception
+
+
+def _nop():
+    pass
+
+
+def _mask(nbits):
+    return 2**nbits - 1
+
+
+def _choice_template(choices):
+    # Return the Signal of each choice when all choices only differ by their Signal (Array of
+    # Signals, or identical Slices of Arrays of Signals), None otherwise.
+    def shape(choice):
+        if isinstance(choice, Signal) and not choice.variable:
+            return (choice, (choice.nbits, choice.signed))
+        if isinstance(choice, _Slice) and isinstance(choice.value, Signal):
+            signal = choice.value
+            if not signal.variable:
+                return (signal, (signal.nbits, signal.signed, choice.start, choice.stop))
+        return (None, None)
+    signals = []
+    template = None
+    for choice in choices:
+        signal, key = shape(choice)
+        if signal is None or (template is not None and key != template):
+            return None
+        template = key
+        signals.append(signal)
+    return signals
+
+# Function Context ---------------------------------------------------------------------------------
+
+class _Function:
+    def __init__(self, name, args=""):
+        self.name   = name
+        self.lines  = ["def {}({}v=_v, m=_m):".format(name, args)]
+        self.indent = 1
+        self.ntemps = 0
+
+    def emit(self, line):
+        self.lines.append("    "*self.indent + line)
+
+    def temp(self):
+        self.ntemps += 1
+        return "_t{}".format(self.ntemps)
+
+    def source(self):
+        if len(self.lines) == 1:
+            self.emit("pass")
+        return "\n".join(self.lines)
+
+# Statement Compiler -------------------------------------------------------------------------------
+
+class StatementCompiler:
+    """Compile FHDL statements to Python functions.
+
+    Signals are mapped to integer slots (given by ``slot``) in the ``values`` list (committed
+    values) and the ``modifications`` dict (pending values), which lets the generated code access
+    them without hashing Signals. The generated code follows the semantics of ``Evaluator``:
+    statements read committed values and write pending ones.
+    """
+    max_expression_depth = 24
+    max_block_depth      = 24
+    max_inline_cases     = 8
+
+    def __init__(self, slot, values, modifications, clock_domains, replaced_memories):
+        self.slot              = slot
+        self.clock_domains     = clock_domains
+        self.replaced_memories = replaced_memories
+        self.namespace = {
+            "_v"           : values,
+            "_m"           : modifications,
+            "_unsupported" : _unsupported,
+            "_raise"       : _raise,
+            "_nop"         : _nop,
+        }
+        self.nnames         = 0
+        self.sources        = []
+        self.functions      = []
+        self.slot_overrides = {}
+
+    def compile(self, statements):
+        """Compile a list of statements into a function taking no argument."""
+        name = self._function(lambda: self._statements(statements))
+        source, self.sources = "\n\n".join(self.sources), []
+        exec(compile(source, "<litex.gen.sim.compiler>", "exec"), self.namespace)
+        return self.namespace[name]
+
+    # Names/Functions ------------------------------------------------------------------------------
+
+    def _name(self, prefix):
+        self.nnames += 1
+        return "_{}{}".format(prefix, self.nnames)
+
+    def _constant(self, value):
+        name = self._name("c")
+        self.namespace[name] = value
+        return name
+
+    def _function(self, body, args=""):
+        function = _Function(self._name("f"), args)
+        self.functions.append(function)
+        body()
+        self.functions.pop()
+        self.sources.append(function.source())
+        return function.name
+
+    @property
+    def _current(self):
+        return self.functions[-1]
+
+    def _emit(self, line):
+        self._current.emit(line)
+
+    def _temp(self, code):
+        if code.isidentifier():
+            return code
+        temp = self._current.temp()
+        self._emit("{} = {}".format(temp, code))
+        return temp
+
+    def _slot_code(self, signal):
+        try:
+            return self.slot_overrides[signal]
+        except KeyError:
+            return str(self.slot(signal))
+
+    # Expressions ----------------------------------------------------------------------------------
+
+    def _expr(self, node, postcommit=False, depth=0):
+        if depth > self.max_expression_depth:
+            # Keep generated expressions shallow enough for the Python parser.
+            return self._temp(self._expr(node, postcommit))
+
+        if isinstance(node, Constant):
+            return "({})".format(node.value) if node.value < 0 else str(node.value)
+        elif isinstance(node, Signal):
+            slot = self._slot_code(node)
+            if postcommit:
+                return "m.get({0}, v[{0}])".format(slot)
+            return "v[{}]".format(slot)
+        elif isinstance(node, _Operator):
+            operands = [self._expr(o, postcommit, depth + 1) for o in node.operands]
+            if node.op == "-" and len(operands) == 1:
+                return "(-{})".format(*operands)
+            elif node.op == "~":
+                return "(~{})".format(*operands)
+            elif node.op == "m":
+                return "({1} if {0} else {2})".format(*operands)
+            elif node.op in str2pyop and len(operands) == 2:
+                return "({} {} {})".format(operands[0], str2pyop[node.op], operands[1])
+            else:
+                return "_unsupported({})".format(self._constant(node))
+        elif isinstance(node, _Slice):
+            value = self._expr(node.value, postcommit, depth + 1)
+            mask  = _mask(node.stop - node.start)
+            if node.start:
+                return "(({} >> {}) & {})".format(value, node.start, mask)
+            return "({} & {})".format(value, mask)
+        elif isinstance(node, Cat):
+            shift = 0
+            parts = []
+            for element in node.l:
+                nbits = len(element)
+                if nbits:
+                    value = self._expr(element, postcommit, depth + 1)
+                    part  = "({} & {})".format(value, _mask(nbits))
+                    if shift:
+                        part = "({} << {})".format(part, shift)
+                    parts.append(part)
+                shift += nbits
+            if not parts:
+                return "0"
+            return "({})".format(" | ".join(parts))
+        elif isinstance(node, Replicate):
+            nbits = len(node.v)
+            if not nbits or not node.n:
+                return "0"
+            value = self._expr(node.v, postcommit, depth + 1)
+            # No carry can occur between the copies: multiplying replicates the value.
+            factor = sum(1 << i*nbits for i in range(node.n))
+            return "(({} & {}) * {})".format(value, _mask(nbits), factor)
+        elif isinstance(node, _ArrayProxy):
+            key = self._expr(node.key, postcommit, depth + 1)
+            idx = "min({}, {})".format(len(node.choices) - 1, key)
+            return self._expr_choice(node.choices, idx, postcommit)
+        elif isinstance(node, _MemoryLocation):
+            array = self.replaced_memories[node.memory]
+            idx   = self._expr(node.index, postcommit, depth + 1)
+            return self._expr_choice(array, idx, postcommit)
+        elif isinstance(node, ClockSignal):
+            return self._expr(self.clock_domains[node.cd].clk, postcommit, depth)
+        elif isinstance(node, ResetSignal):
+            rst = self.clock_domains[node.cd].rst
+            if rst is None:
+                if node.allow_reset_less:
+                    return "0"
+                else:
+                    exception = ValueError("Attempted to get reset signal of resetless"
+                                           " domain '{}'".format(node.cd))
+                    return "_raise({})".format(self._constant(exception))
+            else:
+                return self._expr(rst, postcommit, depth)
+        else:
+            return "_unsupported({})".format(self._constant(node))
+
+    def _expr_choice(self, choices, idx, postcommit):
+        signals = _choice_template(choices)
+        if signals is not None:
+            slots = self._constant(tuple(self.slot(s) for s in signals))
+            slot  = self._temp("{}[{}]".format(slots, idx))
+            self.slot_overrides[signals[0]] = slot
+            try:
+                return self._expr(choices[0], postcommit)
+            finally:
+                del self.slot_overrides[signals[0]]
+        else:
+            def choice_function(choice):
+                return self._function(lambda: self._emit("return " + self._expr(choice, postcommit)))
+            functions = self._tuple([choice_function(c) for c in choices])
+            return "{}[{}]()".format(functions, idx)
+
+    def _tuple(self, names):
+        # Tuple of generated functions, defined once the functions themselves have been defined.
+        name = self._name("c")
+        self.sources.append("{} = ({},)".format(name, ", ".join(names)))
+        return name
+
+    # Assignments ----------------------------------------------------------------------------------
+
+    def _assign(self, node, value):
+        if isinstance(node, Signal):
+            assert not node.variable
+            slot = self._slot_code(node)
+            mask = _mask(node.nbits)
+            try:
+                # Constant values are truncated at compile time.
+                value = int(value.strip("()")) & mask
+                if node.signed and node.nbits:
+                    value -= (value & 2**(node.nbits - 1)) << 1
+                value = str(value)
+            except ValueError:
+                value = self._temp("{} & {}".format(value, mask))
+                if node.signed and node.nbits:
+                    self._emit("{0} -= ({0} & {1}) << 1".format(value, 2**(node.nbits - 1)))
+            # Only keep modifications of the committed value pending: this lets the commit
+            # skip the Signals that are re-assigned their current value.
+            self._emit("if {} != v[{}]:".format(value, slot))
+            self._emit("    m[{}] = {}".format(slot, value))
+            self._emit("elif {} in m:".format(slot))
+            self._emit("    del m[{}]".format(slot))
+        elif isinstance(node, Cat):
+            value = self._temp(value)
+            shift = 0
+            for element in node.l:
+                nbits = len(element)
+                if shift:
+                    self._assign(element, "(({} >> {}) & {})".format(value, shift, _mask(nbits)))
+                else:
+                    self._assign(element, "({} & {})".format(value, _mask(nbits)))
+                shift += nbits
+        elif isinstance(node, _Slice):
+            value = self._temp(value)
+            full  = self._expr(node.value, postcommit=True)
+            clear = ~(_mask(node.stop) - _mask(node.start))
+            self._assign(node.value, "(({} & ({})) | (({} & {}) << {}))".format(
+                full, clear, value, _mask(node.stop - node.start), node.start))
+        elif isinstance(node, _ArrayProxy):
+            value = self._temp(value)
+            key   = self._expr(node.key)
+            idx   = "min({}, {})".format(len(node.choices) - 1, key)
+            self._assign_choice(node.choices, idx, value)
+        elif isinstance(node, _MemoryLocation):
+            value = self._temp(value)
+            array = self.replaced_memories[node.memory]
+            self._assign_choice(array, self._expr(node.index), value)
+        else:
+            self._emit("_unsupported({})".format(self._constant(node)))
+
+    def _assign_choice(self, choices, idx, value):
+        signals = _choice_template(choices)
+        if signals is not None:
+            slots = self._constant(tuple(self.slot(s) for s in signals))
+            slot  = self._temp("{}[{}]".format(slots, idx))
+            self.slot_overrides[signals[0]] = slot
+            try:
+                self._assign(choices[0], value)
+            finally:
+                del self.slot_overrides[signals[0]]
+        else:
+            def choice_function(choice):
+                return self._function(lambda: self._assign(choice, "x"), args="x, ")
+            functions = self._tuple([choice_function(c) for c in choices])
+            self._emit("{}[{}]({})".format(functions, idx, value))
+
+    # Statements -----------------------------------------------------------------------------------
+
+    def _block(self, statements):
+        self._current.indent += 1
+        n = len(self._current.lines)
+        self._statements(statements)
+        if len(self._current.lines) == n:
+            self._emit("pass")
+        self._current.indent -= 1
+
+    def _statements(self, statements):
+        for s in statements:
+            if self._current.indent > self.max_block_depth:
+                # Keep generated code shallow enough for the Python tokenizer.
+                self._emit("{}()".format(self._function(lambda: self._statement(s))))
+            else:
+                self._statement(s)
+
+    def _statement(self, s):
+        if isinstance(s, _Assign):
+            self._assign(s.l, self._expr(s.r))
+        elif isinstance(s, If):
+            cond = self._expr(s.cond)
+            self._emit("if {} & {}:".format(cond, _mask(len(s.cond))))
+            self._block(s.t)
+            if s.f:
+                self._emit("else:")
+                self._block(s.f)
+        elif isinstance(s, Case):
+            nbits, signed = value_bits_sign(s.test)
+            test = self._temp("{} & {}".format(self._expr(s.test), _mask(nbits)))
+            if signed and nbits:
+                self._emit("{0} = {0} - (({0} & {1}) << 1)".format(test, 2**(nbits - 1)))
+            cases = collections.OrderedDict()
+            for k, v in s.cases.items():
+                if isinstance(k, Constant):
+                    cases.setdefault(k.value, v)
+            default = s.cases.get("default", None)
+            if len(cases) <= self.max_inline_cases:
+                keyword = "if"
+                for k, v in cases.items():
+                    self._emit("{} {} == {}:".format(keyword, test, k))
+                    self._block(v)
+                    keyword = "elif"
+                if default is not None:
+                    if cases:
+                        self._emit("else:")
+                        self._block(default)
+                    else:
+                        self._statements(default)
+            else:
+                functions = {k: self._function(lambda v=v: self._statements(v))
+                    for k, v in cases.items()}
+                name = self._name("c")
+                self.sources.append("{} = {{{}}}".format(name,
+                    ", ".join("{}: {}".format(k, f) for k, f in functions.items())))
+                if default is not None:
+                    default = self._function(lambda: self._statements(default))
+                else:
+                    default = "_nop"
+                self._emit("{}.get({}, {})()".format(name, test, default))
+        elif isinstance(s, collections.abc.Iterable):
+            self._statements(s)
+        elif isinstance(s, Display):
+            args = []
+            for arg in s.args:
+                assert isinstance(arg, Signal)
+                args.append(self._expr(arg))
+            self._emit("print({} % ({},))".format(self._constant(s.s), ", ".join(args)))
+        else:
+            self._emit("_unsupported({})".format(self._constant(s)))
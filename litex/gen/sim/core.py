@@ -12,21 +12,25 @@
 import operator
 import collections
 import inspect
+import weakref
 from functools import wraps
 
 from migen.fhdl.structure import *
 from migen.fhdl.structure import (_Value, _Statement,
                                   _Operator, _Slice, _ArrayProxy,
-                                  _Assign, _Fragment)
+                                  _Assign, _Fragment, DUID)
 from migen.fhdl.bitcontainer import value_bits_sign
 from migen.fhdl.tools import (list_targets, list_signals,
                               insert_resets, lower_specials)
 from migen.fhdl.simplify import MemoryToArray
-from migen.fhdl.specials import _MemoryLocation
+from migen.fhdl.specials import Memory, _MemoryLocation, WRITE_FIRST, NO_CHANGE
 from migen.fhdl.module import Module
+from migen.fhdl.visit import NodeVisitor
 from migen.genlib.resetsync import AsyncResetSynchronizer
 
+from litex.gen.fhdl.analysis import list_statements_targets, group_by_targets
 from litex.gen.sim.vcd import VCDWriter, DummyVCDWriter
+from litex.gen.sim.compiler import StatementCompiler
 
 
 class ClockState:
@@ -106,6 +110,42 @@ class Evaluator:
         self.replaced_memories = replaced_memories
         self.signal_values = dict()
         self.modifications = dict()
+        self.layouts = dict()
+
+    def _layout(self, node):
+        # masks/shifts of Cat/Replicate nodes and widths of If/Case tests, computed once per node
+        # since len() walks the expression
+        key = id(node)
+        try:
+            cached, layout = self.layouts[key]
+            if cached() is node:
+                return layout
+        except KeyError:
+            pass
+        if isinstance(node, Cat):
+            layout = []
+            shift = 0
+            for element in node.l:
+                nbits = len(element)
+                layout.append((element, shift, 2**nbits - 1))
+                shift += nbits
+        elif isinstance(node, Replicate):
+            nbits = len(node.v)
+            layout = (2**nbits - 1, sum(1 << i*nbits for i in range(node.n)))
+        elif isinstance(node, If):
+            layout = 2**len(node.cond) - 1
+        else:
+            layout = value_bits_sign(node.test)
+        # nodes created by the generators are short-lived: forget them with the node
+        self.layouts[key] = (weakref.ref(node, lambda r: self.layouts.pop(key, None)), layout)
+        return layout
+
+    # Signals are identified by keys in commit/scheduling (the Signals themselves here).
+    def key(self, signal):
+        return signal
+
+    def signal(self, key):
+        return key
 
     def commit(self):
         r = set()
@@ -142,21 +182,17 @@ class Evaluator:
                 return str2op[node.op](*operands)
         elif isinstance(node, _Slice):
             v = self.eval(node.value, postcommit)
-            idx = range(node.start, node.stop)
-            return sum(((v >> i) & 1) << j for j, i in enumerate(idx))
+            return (v >> node.start) & ((1 << (node.stop - node.start)) - 1)
         elif isinstance(node, Cat):
-            shift = 0
             r = 0
-            for element in node.l:
-                nbits = len(element)
+            for element, shift, mask in self._layout(node):
                 # make value always positive
-                r |= (self.eval(element, postcommit) & (2**nbits-1)) << shift
-                shift += nbits
+                r |= (self.eval(element, postcommit) & mask) << shift
             return r
         elif isinstance(node, Replicate):
-            nbits = len(node.v)
-            v = self.eval(node.v, postcommit) & (2**nbits - 1)
-            return sum(v << i*nbits for i in range(node.n))
+            mask, factor = self._layout(node)
+            # no carry between the copies: multiplying replicates the value
+            return (self.eval(node.v, postcommit) & mask)*factor
         elif isinstance(node, _ArrayProxy):
             idx = min(len(node.choices) - 1, self.eval(node.key, postcommit))
             return self.eval(node.choices[idx], postcommit)
@@ -184,17 +220,13 @@ class Evaluator:
             self.modifications[node] = _truncate(value,
                                                  node.nbits, node.signed)
         elif isinstance(node, Cat):
-            for element in node.l:
-                nbits = len(element)
-                self.assign(element, value & (2**nbits-1))
-                value >>= nbits
+            for element, shift, mask in self._layout(node):
+                self.assign(element, (value >> shift) & mask)
         elif isinstance(node, _Slice):
             full_value = self.eval(node.value, True)
-            # clear bits assigned to by the slice
-            full_value &= ~((2**node.stop-1) - (2**node.start-1))
-            # set them to the new value
-            value &= 2**(node.stop - node.start)-1
-            full_value |= value << node.start
+            mask = ((1 << (node.stop - node.start)) - 1) << node.start
+            # replace bits assigned to by the slice with the new value
+            full_value = (full_value & ~mask) | ((value << node.start) & mask)
             self.assign(node.value, full_value)
         elif isinstance(node, _ArrayProxy):
             idx = min(len(node.choices) - 1, self.eval(node.key))
@@ -205,17 +237,20 @@ class Evaluator:
         else:
             raise NotImplementedError(node)
 
+    def compile(self, statements):
+        return lambda: self.execute(statements)
+
     def execute(self, statements):
         for s in statements:
             if isinstance(s, _Assign):
                 self.assign(s.l, self.eval(s.r))
             elif isinstance(s, If):
-                if self.eval(s.cond) & (2**len(s.cond) - 1):
+                if self.eval(s.cond) & self._layout(s):
                     self.execute(s.t)
                 else:
                     self.execute(s.f)
             elif isinstance(s, Case):
-                nbits, signed = value_bits_sign(s.test)
+                nbits, signed = self._layout(s)
                 test = _truncate(self.eval(s.test), nbits, signed)
                 found = False
                 for k, v in s.cases.items():
@@ -240,6 +275,220 @@ class Evaluator:
                 raise NotImplementedError
 
 
+class _SignalValues(collections.abc.Mapping):
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+
+    def __getitem__(self, signal):
+        return self.evaluator.values[self.evaluator.slots[signal]]
+
+    def __iter__(self):
+        return iter(self.evaluator.slots)
+
+    def __len__(self):
+        return len(self.evaluator.slots)
+
+
+class CompiledEvaluator(Evaluator):
+    """Evaluator compiling statements to Python functions.
+
+    Signal values are stored in a list indexed by slot, statements passed to ``compile`` are
+    translated once to Python code by ``StatementCompiler``. ``eval``/``assign``/``execute`` remain
+    available for the generators.
+    """
+    def __init__(self, clock_domains, replaced_memories):
+        Evaluator.__init__(self, clock_domains, replaced_memories)
+        self.slots         = dict()
+        self.signals       = []
+        self.values        = []
+        self.signal_values = _SignalValues(self)
+        self.compiler      = StatementCompiler(self.slot, self.values, self.modifications,
+                                               clock_domains, replaced_memories)
+
+    def slot(self, signal):
+        try:
+            return self.slots[signal]
+        except KeyError:
+            slot = len(self.values)
+            self.slots[signal] = slot
+            self.signals.append(signal)
+            self.values.append(signal.reset.value)
+            return slot
+
+    # Signals are identified by their slot in commit/scheduling (no Signal hashing).
+    def key(self, signal):
+        return self.slot(signal)
+
+    def signal(self, key):
+        return self.signals[key]
+
+    def commit(self):
+        r = []
+        values = self.values
+        for k, v in self.modifications.items():
+            if values[k] != v:
+                values[k] = v
+                r.append(k)
+        self.modifications.clear()
+        return r
+
+    def eval(self, node, postcommit=False):
+        if isinstance(node, Signal):
+            slot = self.slot(node)
+            if postcommit:
+                try:
+                    return self.modifications[slot]
+                except KeyError:
+                    pass
+            return self.values[slot]
+        return Evaluator.eval(self, node, postcommit)
+
+    def assign(self, node, value):
+        if isinstance(node, Signal):
+            assert not node.variable
+            self.modifications[self.slot(node)] = _truncate(value,
+                                                            node.nbits, node.signed)
+        else:
+            Evaluator.assign(self, node, value)
+
+    def compile(self, statements):
+        return self.compiler.compile(statements)
+
+
+class _ReadLister(NodeVisitor):
+    def __init__(self, clock_domains, replaced_memories):
+        self.clock_domains = clock_domains
+        self.replaced_memories = replaced_memories
+        self.output_list = set()
+
+    def visit_Signal(self, node):
+        self.output_list.add(node)
+
+    def visit_ClockSignal(self, node):
+        self.visit(self.clock_domains[node.cd].clk)
+
+    def visit_ResetSignal(self, node):
+        rst = self.clock_domains[node.cd].rst
+        if rst is not None:
+            self.visit(rst)
+
+    def visit_Assign(self, node):
+        self.visit_target(node.l)
+        self.visit(node.r)
+
+    def visit_target(self, node):
+        # Assigned Signals are not read, but Array keys and Memory indexes are.
+        if isinstance(node, Cat):
+            for element in node.l:
+                self.visit_target(element)
+        elif isinstance(node, _Slice):
+            self.visit_target(node.value)
+        elif isinstance(node, _ArrayProxy):
+            for choice in node.choices:
+                self.visit_target(choice)
+            self.visit(node.key)
+        elif isinstance(node, _MemoryLocation):
+            self.visit(node.index)
+
+    def visit_unknown(self, node):
+        if isinstance(node, _MemoryLocation):
+            for signal in self.replaced_memories[node.memory]:
+                self.visit(signal)
+            self.visit(node.index)
+        elif isinstance(node, Display):
+            for arg in node.args:
+                self.visit(arg)
+
+
+def _list_reads(statements, clock_domains, replaced_memories):
+    lister = _ReadLister(clock_domains, replaced_memories)
+    lister.visit(statements)
+    return lister.output_list
+
+
+def _memory_storage(memory):
+    # Memory words Signals. Creating them with Signal() traces back the creation of each word
+    # (for naming), which dominates the Simulator construction on large memories: words are
+    # copies of a first Signal instead (with their own DUID/reset/name).
+    init  = list(memory.init or [])
+    init += [0]*(memory.depth - len(init))
+    name  = lambda n: "%s_data_%d" % (memory.name_override, n)
+    first = Signal(memory.width, name_override=name(0))
+    storage = Array()
+    for n, value in enumerate(init):
+        if n == 0:
+            signal = first
+        else:
+            signal = Signal.__new__(Signal)
+            signal.__dict__.update(first.__dict__)
+            DUID.__init__(signal)
+            signal.name_override = name(n)
+            signal.attr          = set()
+        signal.reset = Constant(value, (memory.width, False))
+        storage.append(signal)
+    return storage
+
+
+class _MemoryToArray(MemoryToArray):
+    # migen.fhdl.simplify.MemoryToArray with faster memory words Signals creation.
+    def transform_fragment(self, i, f):
+        newspecials = set()
+        processed_ports = set()
+
+        for mem in f.specials:
+            if not isinstance(mem, Memory):
+                newspecials.add(mem)
+                continue
+
+            storage = _memory_storage(mem)
+            self.replacements[mem] = storage
+
+            for port in mem.ports:
+                try:
+                    sync = f.sync[port.clock.cd]
+                except KeyError:
+                    sync = f.sync[port.clock.cd] = []
+
+                # read
+                if port.async_read:
+                    f.comb.append(port.dat_r.eq(storage[port.adr]))
+                else:
+                    if port.mode == WRITE_FIRST:
+                        adr_reg = Signal.like(port.adr)
+                        rd_stmt = adr_reg.eq(port.adr)
+                        f.comb.append(port.dat_r.eq(storage[adr_reg]))
+                    elif port.mode == NO_CHANGE and port.we is not None:
+                        rd_stmt = If(~port.we, port.dat_r.eq(storage[port.adr]))
+                    else: # NO_CHANGE without write capability reduces to READ_FIRST
+                        rd_stmt = port.dat_r.eq(storage[port.adr])
+                    if port.re is None:
+                        sync.append(rd_stmt)
+                    else:
+                        sync.append(If(port.re, rd_stmt))
+
+                # write
+                if port.we is not None:
+                    if port.we_granularity:
+                        # single masked write (instead of a write per lane on slices of all the
+                        # memory words)
+                        n = mem.width//port.we_granularity
+                        mask = [Replicate(port.we[i], port.we_granularity) for i in range(n)]
+                        if mem.width > n*port.we_granularity:
+                            mask.append(Constant(0, mem.width - n*port.we_granularity))
+                        mask = Cat(*mask)
+                        word = storage[port.adr]
+                        sync.append(If(port.we != 0,
+                                       word.eq((word & ~mask) | (port.dat_w & mask))))
+                    else:
+                        sync.append(If(port.we,
+                                       storage[port.adr].eq(port.dat_w)))
+
+                processed_ports.add(port)
+
+        newspecials -= processed_ports
+        f.specials = newspecials
+
+
 class DummyAsyncResetSynchronizerImpl(Module):
     def __init__(self, cd, async_reset):
         # TODO: asynchronous set
@@ -257,13 +506,14 @@ class DummyAsyncResetSynchronizer:
 # TODO: instances via Iverilog/VPI
 class Simulator:
     def __init__(self, fragment_or_module, generators, clocks={"sys": 10}, vcd_name=None,
-                 special_overrides={}):
+                 special_overrides={}, engine="interpreted",
+                 vcd_include=None, vcd_exclude=None, vcd_window=None, vcd_threaded=False):
         if isinstance(fragment_or_module, _Fragment):
             self.fragment = fragment_or_module
         else:
             self.fragment = fragment_or_module.get_fragment()
 
-        mta = MemoryToArray()
+        mta = _MemoryToArray()
         mta.transform_fragment(None, self.fragment)
 
         overrides = {AsyncResetSynchronizer: DummyAsyncResetSynchronizer}
@@ -296,13 +546,44 @@ class Simulator:
         # comb signals return to their reset value if nothing assigns them
         self.fragment.comb[0:0] = [s.eq(s.reset)
                                    for s in list_targets(self.fragment.comb)]
-        self.evaluator = Evaluator(self.fragment.clock_domains,
-                                   mta.replacements)
-
+        engines = {
+            "interpreted" : Evaluator,
+            "compiled"    : CompiledEvaluator,
+        }
+        if engine not in engines:
+            raise ValueError("Unknown simulator engine: '{}'".format(engine))
+        self.evaluator = engines[engine](self.fragment.clock_domains,
+                                         mta.replacements)
+
+        # Comb statements are grouped by targets and only executed when a Signal they read has
+        # been modified (or when one of their targets has been modified by sync/generators).
+        self.comb_groups  = []
+        self.comb_readers = collections.defaultdict(list)
+        self.comb_drivers = dict()
+        key = self.evaluator.key
+        for i, (targets, statements) in enumerate(group_by_targets(list_statements_targets(self.fragment.comb))):
+            self.comb_groups.append(self.evaluator.compile(statements))
+            for signal in _list_reads(statements, self.fragment.clock_domains, mta.replacements):
+                self.comb_readers[key(signal)].append(i)
+            for signal in targets:
+                self.comb_drivers[key(signal)] = i
+        self.sync = {cd: self.evaluator.compile(statements)
+                     for cd, statements in self.fragment.sync.items()}
+
+        self.trace = vcd_name is not None
         if vcd_name is None:
             self.vcd = DummyVCDWriter()
         else:
-            self.vcd = VCDWriter(vcd_name)
+            # the dump window is given in cycles of the sys clock (or of the first clock)
+            start, stop = (0, None) if vcd_window is None else vcd_window
+            clock = "sys" if "sys" in self.time.clocks else next(iter(self.time.clocks))
+            period = 2*self.time.clocks[clock].half_period
+            self.vcd = VCDWriter(vcd_name,
+                include  = vcd_include,
+                exclude  = vcd_exclude,
+                start    = start*period,
+                stop     = None if stop is None else stop*period,
+                threaded = vcd_threaded)
 
             signals = list_signals(self.fragment)
             for cd in self.fragment.clock_domains:
@@ -325,15 +606,27 @@ class Simulator:
         self.vcd.close()
 
     def _commit_and_comb_propagate(self):
-        # TODO: optimize
+        # modified Signals are identified by their evaluator key
         all_modified = set()
         modified = self.evaluator.commit()
-        all_modified |= modified
+        if self.trace:
+            all_modified.update(modified)
+        # comb signals modified outside of the comb logic are driven again by their group
+        comb_drivers = self.comb_drivers
+        comb_readers = self.comb_readers
+        groups = {comb_drivers[k] for k in modified if k in comb_drivers}
         while modified:
-            self.evaluator.execute(self.fragment.comb)
+            for k in modified:
+                if k in comb_readers:
+                    groups.update(comb_readers[k])
+            for group in sorted(groups):
+                self.comb_groups[group]()
+            groups = set()
             modified = self.evaluator.commit()
-            all_modified |= modified
-        for signal in all_modified:
+            if self.trace:
+                all_modified.update(modified)
+        for k in all_modified:
+            signal = self.evaluator.signal(k)
             self.vcd.set(signal, self.evaluator.signal_values[signal])
 
     def _evalexec_nested_lists(self, x):
@@ -379,7 +672,8 @@ class Simulator:
         return False
 
     def run(self):
-        self.evaluator.execute(self.fragment.comb)
+        for group in self.comb_groups:
+            group()
         self._commit_and_comb_propagate()
 
         while True:
@@ -387,8 +681,8 @@ class Simulator:
             self.vcd.delay(dt)
             for cd in rising:
                 self.evaluator.assign(self.fragment.clock_domains[cd].clk, 1)
-                if cd in self.fragment.sync:
-                    self.evaluator.execute(self.fragment.sync[cd])
+                if cd in self.sync:
+                    self.sync[cd]()
                 if cd in self.generators:
                     self._process_generators(cd)
             for cd in falling:
@@ -7,10 +7,17 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 from itertools import count
-import tempfile
-import os
+from fnmatch import fnmatchcase
 from collections import OrderedDict
+import os
+import gzip
+import queue
 import shutil
+import tempfile
+import threading
+import subprocess
+
+from migen.fhdl.structure import Signal
 
 from litex.gen.fhdl.namer import build_signal_namespace
 
@@ -25,85 +32,201 @@ def vcd_codes():
         yield code
 
 
+class _ThreadedWriter:
+    """Write chunks to a file from a background thread."""
+    def __init__(self, out_file, depth=16):
+        self.out_file  = out_file
+        self.queue     = queue.Queue(maxsize=depth)
+        self.exception = None
+        self.thread    = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            try:
+                self.out_file.write(chunk)
+            except Exception as e:
+                self.exception = e
+
+    def write(self, chunk):
+        self.queue.put(chunk)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.out_file.close()
+        if self.exception is not None:
+            raise self.exception
+
+
 class VCDWriter:
-    def __init__(self, filename):
-        self.filename = filename
-        self.out_file = None
-        self.buffer_file = tempfile.TemporaryFile(
-            dir=os.path.dirname(filename), mode="w+")
-        self.initialized = False
-        self.codegen = vcd_codes()
-        self.codes = OrderedDict()
+    """Buffered VCD writer.
+
+    Parameters
+    ----------
+    filename : str
+        Output file. Files ending with ``.gz`` are gzip-compressed, files ending with ``.fst`` are
+        converted from VCD on close with ``vcd2fst`` (from GTKWave).
+    include : list of str/Signal, optional
+        Only trace these Signals. Strings are fnmatch patterns on hierarchical Signal names, ie
+        ``"gearbox0_*"`` selects all the Signals of the ``gearbox0`` module.
+    exclude : list of str/Signal, optional
+        Do not trace these Signals (same format as ``include``).
+    start, stop : int, optional
+        Only dump changes between ``start`` (included) and ``stop`` (excluded) times.
+    buffer_size : int
+        Characters buffered before writing to the file.
+    threaded : bool
+        Write (and compress) the buffers from a background thread.
+    """
+    def __init__(self, filename, include=None, exclude=None, start=0, stop=None,
+                 buffer_size=2**20, threaded=False):
+        self.filename      = filename
+        self.include       = include
+        self.exclude       = exclude
+        self.start         = start
+        self.stop          = stop
+        self.buffer_size   = buffer_size
+        self.threaded      = threaded
+        self.out_file      = None
+        self.initialized   = False
+        self.dumping       = False
+        self.stopped       = False
+        self.codegen       = vcd_codes()
+        self.codes         = OrderedDict()
         self.signal_values = dict()
-        self.t = 0
+        self.buffer        = []
+        self.buffered      = 0
+        self.t             = 0
+        self.t_written     = None
+
+    def _match(self, patterns, signal, name):
+        for pattern in patterns:
+            if isinstance(pattern, Signal):
+                if pattern is signal:
+                    return True
+            elif fnmatchcase(name, pattern):
+                return True
+        return False
+
+    def _traced(self, signal, name):
+        if self.include is not None and not self._match(self.include, signal, name):
+            return False
+        if self.exclude is not None and self._match(self.exclude, signal, name):
+            return False
+        return True
+
+    def _open(self):
+        if self.filename.endswith(".gz"):
+            out_file = gzip.open(self.filename, "wt")
+        elif self.filename.endswith(".fst"):
+            if shutil.which("vcd2fst") is None:
+                raise OSError("Unable to find vcd2fst (from GTKWave) for FST output")
+            fd, self.vcd_filename = tempfile.mkstemp(suffix=".vcd",
+                dir=os.path.dirname(self.filename) or None)
+            out_file = os.fdopen(fd, "w")
+        else:
+            out_file = open(self.filename, "w")
+        if self.threaded:
+            out_file = _ThreadedWriter(out_file)
+        return out_file
+
+    def _write(self, s):
+        self.buffer.append(s)
+        self.buffered += len(s)
+        if self.buffered >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.out_file.write("".join(self.buffer))
+            self.buffer   = []
+            self.buffered = 0
+
+    def _write_time(self):
+        if self.t_written != self.t:
+            self._write("#{}\n".format(self.t))
+            self.t_written = self.t
 
     def _write_value(self, signal, value):
-        l = len(signal)
+        code, l = self.codes[signal]
         if value < 0:
             value += 2**l
         if l > 1:
-            fmtstr = "b{:0" + str(l) + "b} {}\n"
+            return "b{:0{}b} {}\n".format(value, l, code)
         else:
-            fmtstr = "{}{}\n"
-        try:
-            code = self.codes[signal]
-        except KeyError:
-            code = next(self.codegen)
-            self.codes[signal] = code
-            self.init(self.codes.keys())
-
-        return fmtstr.format(value, code)
-
-    def _write(self, s):
-        self.out_file.write(s)
-        self.buffer_file.write(s)
+            return "{}{}\n".format(value, code)
 
     def init(self, signals):
-        self.out_file = open(self.filename, "w")
+        assert not self.initialized
+        self.out_file = self._open()
 
-        # generate codes
-        for signal in signals:
-            try:
-                code = self.codes[signal]
-            except KeyError:
-                code = next(self.codegen)
-                self.codes[signal] = code
+        # generate codes (names are built from all the signals, tracing or not)
+        ns = build_signal_namespace(signals)
+        names = dict()
+        for signal in sorted(signals, key=lambda x: x.duid):
+            name = ns.get_name(signal)
+            if self._traced(signal, name):
+                self.codes[signal] = (next(self.codegen), len(signal))
+                names[signal] = name
 
         # write vcd header
-        header = ""
-        ns = build_signal_namespace(self.codes.keys())
-        for signal, code in self.codes.items():
-            name = ns.get_name(signal)
-            header += "$var wire {len} {code} {name} $end\n".format(name=name, code=code, len=len(signal))
-        header += "$dumpvars\n"
-        for signal in self.codes.keys():
-            header += self._write_value(signal, signal.reset.value)
-        header += "$end\n"
-        self.out_file.write(header)
-
-        if self.initialized:
-            self.buffer_file.seek(0)
-            shutil.copyfileobj(self.buffer_file, self.out_file)
-            self.buffer_file.seek(0, 2)
-        else:
-            # init time
-            self._write("#0\n")
+        header = []
+        for signal, (code, l) in self.codes.items():
+            header.append("$var wire {len} {code} {name} $end\n".format(
+                name=names[signal], code=code, len=l))
+        header.append("$enddefinitions $end\n")
+        self._write("".join(header))
 
         self.initialized = True
+        self._update_window()
+
+    def _update_window(self):
+        if self.stopped:
+            return
+        if not self.dumping:
+            if self.t >= self.start and (self.stop is None or self.t < self.stop):
+                # dump all values when entering the window
+                self.dumping = True
+                self._write_time()
+                self._write("$dumpvars\n")
+                for signal in self.codes.keys():
+                    value = self.signal_values.setdefault(signal, signal.reset.value)
+                    self._write(self._write_value(signal, value))
+                self._write("$end\n")
+        elif self.stop is not None and self.t >= self.stop:
+            self._write_time()
+            self.dumping = False
+            self.stopped = True
 
     def set(self, signal, value):
+        # signals not registered on init are not traced
+        if signal not in self.codes:
+            return
         if (signal not in self.signal_values
                 or self.signal_values[signal] != value):
-            self._write(self._write_value(signal, value))
             self.signal_values[signal] = value
+            if self.dumping:
+                self._write_time()
+                self._write(self._write_value(signal, value))
 
     def delay(self, delay):
         self.t += delay
-        self._write("#{}\n".format(self.t))
+        self._update_window()
 
     def close(self):
+        if self.out_file is None:
+            return
+        if self.dumping:
+            self._write_time()
+        self._flush()
         self.out_file.close()
-        self.buffer_file.close()
+        if self.filename.endswith(".fst"):
+            subprocess.check_call(["vcd2fst", self.vcd_filename, self.filename])
+            os.remove(self.vcd_filename)
 
 
 class DummyVCDWriter:
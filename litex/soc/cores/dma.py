@@ -7,6 +7,7 @@
 """Direct Memory Access (DMA) reader and writer modules."""
 
 from migen import *
+from migen.genlib.fifo import SyncFIFO
 
 from litex.gen import *
 from litex.gen.common import reverse_bytes
@@ -20,6 +21,81 @@ from litex.soc.interconnect import wishbone
 def format_bytes(s, endianness):
     return {"big": s, "little": reverse_bytes(s)}[endianness]
 
+# WishboneDMADescriptorReader ----------------------------------------------------------------------
+
+class WishboneDMADescriptorReader(LiteXModule):
+    """Read Scatter-Gather descriptors from Wishbone MMAP memory.
+
+    Descriptors are stored in a table, each descriptor using 2 bus words:
+    - Word 0: Buffer address (in bytes).
+    - Word 1: Buffer length (in bytes, bits 0-30) and last descriptor of the table (bit 31).
+
+    For every descriptor address (in words) written to the sink, the descriptor will be produced
+    on the source (with last set on the last descriptor of the table).
+    """
+    def __init__(self, bus):
+        assert isinstance(bus, wishbone.Interface)
+        self.bus    = bus
+        self.sink   = sink   = stream.Endpoint([("address", bus.adr_width)])
+        self.source = source = stream.Endpoint([("address", bus.adr_width), ("length", bus.adr_width)])
+
+        # # #
+
+        shift = log2_int(bus.data_width//8)
+        word  = Signal()
+        data  = Signal(2*bus.data_width)
+
+        self.comb += [
+            bus.we.eq(0),
+            bus.sel.eq(2**(bus.data_width//8)-1),
+            bus.adr.eq(sink.address + word),
+            source.address.eq(data[shift:bus.data_width]),
+            source.length.eq(data[bus.data_width + shift:bus.data_width + 31]),
+            source.last.eq(data[bus.data_width + 31]),
+        ]
+
+        store = [
+            NextValue(data, Cat(data[bus.data_width:], bus.dat_r)),
+            NextValue(word, 1),
+            If(word,
+                NextState("OUTPUT")
+            ).Else(
+                NextState("READ")
+            )
+        ]
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            NextValue(word, 0),
+            If(sink.valid,
+                NextState("READ")
+            )
+        )
+        if bus.mode == "pipelined":
+            fsm.act("READ",
+                bus.cyc.eq(1),
+                bus.stb.eq(1),
+                If(~bus.stall,
+                    NextState("WAIT")
+                )
+            )
+            fsm.act("WAIT",
+                bus.cyc.eq(1),
+                If(bus.ack, *store)
+            )
+        else:
+            fsm.act("READ",
+                bus.cyc.eq(1),
+                bus.stb.eq(1),
+                If(bus.ack, *store)
+            )
+        fsm.act("OUTPUT",
+            source.valid.eq(1),
+            If(source.ready,
+                sink.ready.eq(1),
+                NextState("IDLE")
+            )
+        )
+
 # WishboneDMAReader --------------------------------------------------------------------------------
 
 class WishboneDMAReader(LiteXModule):
@@ -27,6 +103,9 @@ class WishboneDMAReader(LiteXModule):
 
     For every address written to the sink, one word will be produced on the source.
 
+    Sequential addresses are read with incrementing bursts when the bus is bursting. On Pipelined
+    buses, up to max_pending reads are kept in flight, limited by the space left in the FIFO.
+
     Parameters
     ----------
     bus : bus
@@ -40,7 +119,7 @@ class WishboneDMAReader(LiteXModule):
     source : Record("data")
         Source for MMAP word results from reading.
     """
-    def __init__(self, bus, endianness="little", fifo_depth=16, with_csr=False):
+    def __init__(self, bus, endianness="little", fifo_depth=16, max_pending=4, with_csr=False):
         assert isinstance(bus, wishbone.Interface)
         self.bus    = bus
         self.sink   = sink   = stream.Endpoint([("address", bus.adr_width, ("last", 1))])
@@ -48,23 +127,76 @@ class WishboneDMAReader(LiteXModule):
 
         # # #
 
+        # Bus ports (shared with the descriptors reads in Scatter-Gather mode).
+        self.ports = [wishbone.Interface.like(bus)]
+        port = self.ports[0]
+
+        # Request (the next address is known when the request is issued).
+        self.pipe = pipe = stream.PipeValid(sink.description)
+        self.comb += sink.connect(pipe.sink)
+        request = pipe.source
+
         # FIFO..
         self.fifo = fifo = stream.SyncFIFO([("data", bus.data_width)], depth=fifo_depth)
 
+        # Status (ack: read completed, idle: no read in flight).
+        self.ack  = Signal()
+        self.idle = Signal()
+
         # Reads -> FIFO.
         self.comb += [
-            bus.stb.eq(sink.valid & fifo.sink.ready),
-            bus.cyc.eq(sink.valid & fifo.sink.ready),
-            bus.we.eq(0),
-            bus.sel.eq(2**(bus.data_width//8)-1),
-            bus.adr.eq(sink.address),
-            fifo.sink.last.eq(sink.last),
-            fifo.sink.data.eq(format_bytes(bus.dat_r, endianness)),
-            If(bus.stb & bus.ack,
-                sink.ready.eq(1),
-                fifo.sink.valid.eq(1),
-            ),
+            port.we.eq(0),
+            port.sel.eq(2**(bus.data_width//8)-1),
+            port.adr.eq(request.address),
+            fifo.sink.data.eq(format_bytes(port.dat_r, endianness)),
         ]
+        if bus.mode == "pipelined":
+            # Pipelined: Issue requests while FIFO credits are available, last flags of the pending
+            # requests are queued until their ack.
+            pending = Signal(max=max_pending + 1)
+            credit  = Signal()
+            self.pending_last = pending_last = SyncFIFO(1, max_pending)
+            self.comb += [
+                credit.eq((pending < max_pending) & ((pending + fifo.level) < fifo_depth)),
+                port.stb.eq(request.valid & credit),
+                port.cyc.eq(port.stb | (pending != 0)),
+                request.ready.eq(port.stb & ~port.stall),
+                pending_last.we.eq(request.ready),
+                pending_last.din.eq(request.last),
+                pending_last.re.eq(port.ack),
+                fifo.sink.valid.eq(port.ack),
+                fifo.sink.last.eq(pending_last.dout),
+            ]
+            self.sync += pending.eq(pending + request.ready - port.ack)
+            self.comb += [
+                self.ack.eq(port.ack),
+                self.idle.eq(~request.valid & (pending == 0)),
+            ]
+        else:
+            # Classic: Incrementing bursts while the next address is sequential and FIFO has space.
+            burst      = Signal()
+            burst_next = Signal()
+            if bus.bursting:
+                self.comb += burst_next.eq(sink.valid &
+                    (sink.address == (request.address + 1)) &
+                    (fifo.level < (fifo_depth - 1)))
+                self.sync += If(port.stb & port.ack, burst.eq(burst_next))
+            self.comb += [
+                port.stb.eq(request.valid & fifo.sink.ready),
+                port.cyc.eq(request.valid & fifo.sink.ready),
+                If(burst_next,
+                    port.cti.eq(wishbone.CTI_BURST_INCREMENTING)
+                ).Elif(burst,
+                    port.cti.eq(wishbone.CTI_BURST_END)
+                ),
+                fifo.sink.last.eq(request.last),
+                If(port.stb & port.ack,
+                    request.ready.eq(1),
+                    fifo.sink.valid.eq(1),
+                ),
+                self.ack.eq(port.stb & port.ack),
+                self.idle.eq(~request.valid),
+            ]
 
         # FIFO -> Output.
         self.comb += fifo.source.connect(source)
@@ -73,53 +205,149 @@ class WishboneDMAReader(LiteXModule):
         if with_csr:
             self.add_csr()
 
-    def add_csr(self, default_base=0, default_length=0, default_enable=0, default_loop=0):
+    def add_csr(self, default_base=0, default_length=0, default_enable=0, default_loop=0, with_scatter_gather=False):
         self._base   = CSRStorage(64, reset=default_base)
         self._length = CSRStorage(32, reset=default_length)
         self._enable = CSRStorage(reset=default_enable)
         self._done   = CSRStatus()
         self._loop   = CSRStorage(reset=default_loop)
         self._offset = CSRStatus(32)
+        self._words  = CSRStatus(32, description="Number of words read since enable.")
+        self._cycles = CSRStatus(32, description="Number of cycles since enable (until done).")
+        if with_scatter_gather:
+            self._scatter_gather = CSRStorage(description="Scatter-Gather mode (base is the descriptors table address).")
 
         # # #
 
         shift   = log2_int(self.bus.data_width//8)
         base    = Signal(self.bus.adr_width)
         offset  = Signal(self.bus.adr_width)
+        issued  = Signal(self.bus.adr_width)
         length  = Signal(self.bus.adr_width)
         self.comb += base.eq(self._base.storage[shift:])
         self.comb += length.eq(self._length.storage[shift:])
 
         self.comb += self._offset.status.eq(offset)
 
+        # Throughput counters.
+        self.sync += [
+            If(~self._enable.storage,
+                self._words.status.eq(0),
+                self._cycles.status.eq(0),
+            ).Else(
+                If(self.fifo.sink.valid & self.fifo.sink.ready,
+                    self._words.status.eq(self._words.status + 1)
+                ),
+                If(~self._done.status,
+                    self._cycles.status.eq(self._cycles.status + 1)
+                )
+            )
+        ]
+
+        # Scatter-Gather: Buffers from the descriptors table (at base).
+        restart = Signal()
+        start   = [NextState("RUN")]
+        end     = [NextState("RUN")]
+        self.comb += restart.eq(self._loop.storage)
+        if with_scatter_gather:
+            self.descriptors = descriptors = WishboneDMADescriptorReader(wishbone.Interface.like(self.bus))
+            self.ports.append(descriptors.bus)
+            table       = Signal(self.bus.adr_width)
+            desc_base   = Signal(self.bus.adr_width)
+            desc_length = Signal(self.bus.adr_width)
+            desc_last   = Signal()
+            self.comb += [
+                descriptors.sink.address.eq(table),
+                If(self._scatter_gather.storage,
+                    base.eq(desc_base),
+                    length.eq(desc_length),
+                    restart.eq(self._loop.storage | ~desc_last),
+                )
+            ]
+            start = [
+                NextValue(table, self._base.storage[shift:]),
+                If(self._scatter_gather.storage,
+                    NextState("DESCRIPTOR")
+                ).Else(
+                    NextState("RUN")
+                )
+            ]
+            end = [
+                If(self._scatter_gather.storage,
+                    NextValue(table, table + 2),
+                    If(desc_last,
+                        NextValue(table, self._base.storage[shift:])
+                    ),
+                    NextState("DESCRIPTOR")
+                ).Else(
+                    NextState("RUN")
+                )
+            ]
+
         self.fsm = fsm = ResetInserter()(FSM(reset_state="IDLE"))
         self.comb += fsm.reset.eq(~self._enable.storage)
         fsm.act("IDLE",
             NextValue(offset, 0),
-            NextState("RUN"),
+            NextValue(issued, 0),
+            *start
         )
+        if with_scatter_gather:
+            fsm.act("DESCRIPTOR",
+                descriptors.sink.valid.eq(1),
+                descriptors.source.ready.eq(1),
+                If(descriptors.source.valid,
+                    NextValue(desc_base,   descriptors.source.address),
+                    NextValue(desc_length, descriptors.source.length),
+                    NextValue(desc_last,   descriptors.source.last),
+                    NextState("RUN")
+                )
+            )
         fsm.act("RUN",
             self.sink.valid.eq(1),
-            self.sink.last.eq(offset == (length - 1)),
-            self.sink.address.eq(base + offset),
+            self.sink.last.eq(issued == (length - 1)),
+            self.sink.address.eq(base + issued),
+            If(self.ack,
+                NextValue(offset, offset + 1)
+            ),
             If(self.sink.ready,
-                NextValue(offset, offset + 1),
+                NextValue(issued, issued + 1),
                 If(self.sink.last,
-                    If(self._loop.storage,
-                        NextValue(offset, 0)
-                    ).Else(
-                        NextState("DONE")
-                    )
+                    NextState("DRAIN")
+                )
+            )
+        )
+        fsm.act("DRAIN",
+            If(self.ack,
+                NextValue(offset, offset + 1)
+            ),
+            # Wait for the reads in flight before ending the buffer.
+            If(self.idle,
+                If(restart,
+                    NextValue(offset, 0),
+                    NextValue(issued, 0),
+                    *end
+                ).Else(
+                    NextState("DONE")
                 )
             )
         )
         fsm.act("DONE", self._done.status.eq(1))
 
+    def do_finalize(self):
+        # Connect/Arbitrate bus ports.
+        if len(self.ports) > 1:
+            self.arbiter = wishbone.Arbiter(self.ports, self.bus)
+        else:
+            self.comb += self.ports[0].connect(self.bus)
+
 # WishboneDMAWriter --------------------------------------------------------------------------------
 
 class WishboneDMAWriter(LiteXModule):
     """Write data to Wishbone MMAP memory.
 
+    Sequential addresses are written with incrementing bursts when the bus is bursting. On Pipelined
+    buses, up to max_pending writes are kept in flight.
+
     Parameters
     ----------
     bus : bus
@@ -130,30 +358,71 @@ class WishboneDMAWriter(LiteXModule):
     sink : Record("address", "data")
         Sink for MMAP addresses/datas to be written.
     """
-    def __init__(self, bus, endianness="little", with_csr=False):
+    def __init__(self, bus, endianness="little", max_pending=4, with_csr=False):
         assert isinstance(bus, wishbone.Interface)
         self.bus  = bus
         self.sink = sink = stream.Endpoint([("address", bus.adr_width), ("data", bus.data_width)])
 
         # # #
 
+        # Bus ports (shared with the descriptors reads in Scatter-Gather mode).
+        self.ports = [wishbone.Interface.like(bus)]
+        port = self.ports[0]
+
+        # Request (the next address is known when the request is issued).
+        self.pipe = pipe = stream.PipeValid(sink.description)
+        self.comb += sink.connect(pipe.sink)
+        request = pipe.source
+
+        # Status (ack: write completed, idle: no write in flight).
+        self.ack  = Signal()
+        self.idle = Signal()
+
         # Writes.
-        data = Signal(bus.data_width)
         self.comb += [
-            bus.stb.eq(sink.valid),
-            bus.cyc.eq(sink.valid),
-            bus.we.eq(1),
-            bus.sel.eq(2**(bus.data_width//8)-1),
-            bus.adr.eq(sink.address),
-            bus.dat_w.eq(format_bytes(sink.data, endianness)),
-            sink.ready.eq(bus.ack),
+            port.we.eq(1),
+            port.sel.eq(2**(bus.data_width//8)-1),
+            port.adr.eq(request.address),
+            port.dat_w.eq(format_bytes(request.data, endianness)),
         ]
+        if bus.mode == "pipelined":
+            # Pipelined: Issue requests while less than max_pending writes are waiting for their ack.
+            pending = Signal(max=max_pending + 1)
+            self.comb += [
+                port.stb.eq(request.valid & (pending < max_pending)),
+                port.cyc.eq(port.stb | (pending != 0)),
+                request.ready.eq(port.stb & ~port.stall),
+            ]
+            self.sync += pending.eq(pending + request.ready - port.ack)
+            self.comb += [
+                self.ack.eq(port.ack),
+                self.idle.eq(~request.valid & (pending == 0)),
+            ]
+        else:
+            # Classic: Incrementing bursts while the next address is sequential.
+            burst      = Signal()
+            burst_next = Signal()
+            if bus.bursting:
+                self.comb += burst_next.eq(sink.valid & (sink.address == (request.address + 1)))
+                self.sync += If(port.stb & port.ack, burst.eq(burst_next))
+            self.comb += [
+                port.stb.eq(request.valid),
+                port.cyc.eq(request.valid),
+                If(burst_next,
+                    port.cti.eq(wishbone.CTI_BURST_INCREMENTING)
+                ).Elif(burst,
+                    port.cti.eq(wishbone.CTI_BURST_END)
+                ),
+                request.ready.eq(port.ack),
+                self.ack.eq(port.stb & port.ack),
+                self.idle.eq(~request.valid),
+            ]
 
         # CSRs.
         if with_csr:
             self.add_csr()
 
-    def add_csr(self, default_base=0, default_length=0, default_enable=0, default_loop=0, ready_on_idle=1):
+    def add_csr(self, default_base=0, default_length=0, default_enable=0, default_loop=0, ready_on_idle=1, with_scatter_gather=False):
         self._sink = self.sink
         self.sink  = stream.Endpoint([("data", self.bus.data_width)])
 
@@ -163,40 +432,133 @@ class WishboneDMAWriter(LiteXModule):
         self._done   = CSRStatus()
         self._loop   = CSRStorage(reset=default_loop)
         self._offset = CSRStatus(32)
+        self._words  = CSRStatus(32, description="Number of words written since enable.")
+        self._cycles = CSRStatus(32, description="Number of cycles since enable (until done).")
+        if with_scatter_gather:
+            self._scatter_gather = CSRStorage(description="Scatter-Gather mode (base is the descriptors table address).")
 
         # # #
 
         shift   = log2_int(self.bus.data_width//8)
         base    = Signal(self.bus.adr_width)
         offset  = Signal(self.bus.adr_width)
+        issued  = Signal(self.bus.adr_width)
         length  = Signal(self.bus.adr_width)
         self.comb += base.eq(self._base.storage[shift:])
         self.comb += length.eq(self._length.storage[shift:])
 
         self.comb += self._offset.status.eq(offset)
 
+        # Throughput counters.
+        self.sync += [
+            If(~self._enable.storage,
+                self._words.status.eq(0),
+                self._cycles.status.eq(0),
+            ).Else(
+                If(self.ack,
+                    self._words.status.eq(self._words.status + 1)
+                ),
+                If(~self._done.status,
+                    self._cycles.status.eq(self._cycles.status + 1)
+                )
+            )
+        ]
+
+        # Scatter-Gather: Buffers from the descriptors table (at base).
+        restart = Signal()
+        start   = [NextState("RUN")]
+        end     = [NextState("RUN")]
+        self.comb += restart.eq(self._loop.storage)
+        if with_scatter_gather:
+            self.descriptors = descriptors = WishboneDMADescriptorReader(wishbone.Interface.like(self.bus))
+            self.ports.append(descriptors.bus)
+            table       = Signal(self.bus.adr_width)
+            desc_base   = Signal(self.bus.adr_width)
+            desc_length = Signal(self.bus.adr_width)
+            desc_last   = Signal()
+            self.comb += [
+                descriptors.sink.address.eq(table),
+                If(self._scatter_gather.storage,
+                    base.eq(desc_base),
+                    length.eq(desc_length),
+                    restart.eq(self._loop.storage | ~desc_last),
+                )
+            ]
+            start = [
+                NextValue(table, self._base.storage[shift:]),
+                If(self._scatter_gather.storage,
+                    NextState("DESCRIPTOR")
+                ).Else(
+                    NextState("RUN")
+                )
+            ]
+            end = [
+                If(self._scatter_gather.storage,
+                    NextValue(table, table + 2),
+                    If(desc_last,
+                        NextValue(table, self._base.storage[shift:])
+                    ),
+                    NextState("DESCRIPTOR")
+                ).Else(
+                    NextState("RUN")
+                )
+            ]
+
         self.fsm = fsm = ResetInserter()(FSM(reset_state="IDLE"))
         self.comb += fsm.reset.eq(~self._enable.storage)
         fsm.act("IDLE",
             self.sink.ready.eq(ready_on_idle),
             NextValue(offset, 0),
-            NextState("RUN"),
+            NextValue(issued, 0),
+            *start
         )
+        if with_scatter_gather:
+            fsm.act("DESCRIPTOR",
+                descriptors.sink.valid.eq(1),
+                descriptors.source.ready.eq(1),
+                If(descriptors.source.valid,
+                    NextValue(desc_base,   descriptors.source.address),
+                    NextValue(desc_length, descriptors.source.length),
+                    NextValue(desc_last,   descriptors.source.last),
+                    NextState("RUN")
+                )
+            )
         fsm.act("RUN",
             self._sink.valid.eq(self.sink.valid),
-            self._sink.last.eq(self.sink.last | (offset + 1 == length)),
-            self._sink.address.eq(base + offset),
+            self._sink.last.eq(self.sink.last | (issued + 1 == length)),
+            self._sink.address.eq(base + issued),
             self._sink.data.eq(self.sink.data),
             self.sink.ready.eq(self._sink.ready),
+            If(self.ack,
+                NextValue(offset, offset + 1)
+            ),
             If(self.sink.valid & self.sink.ready,
-                NextValue(offset, offset + 1),
+                NextValue(issued, issued + 1),
                 If(self._sink.last,
-                    If(self._loop.storage,
-                        NextValue(offset, 0)
-                    ).Else(
-                        NextState("DONE")
-                    )
+                    NextState("DRAIN")
+                )
+            )
+        )
+        fsm.act("DRAIN",
+            If(self.ack,
+                NextValue(offset, offset + 1)
+            ),
+            # Wait for the writes in flight before ending the buffer.
+            If(self.idle,
+                If(restart,
+                    NextValue(offset, 0),
+                    NextValue(issued, 0),
+                    *end
+                ).Else(
+                    NextState("DONE")
                 )
             )
         )
         fsm.act("DONE", self._done.status.eq(1))
+
+    def do_finalize(self):
+        # Connect/Arbitrate bus ports.
+        if len(self.ports) > 1:
+            self.arbiter = wishbone.Arbiter(self.ports, self.bus)
+        else:
+            self.comb += self.ports[0].connect(self.bus)
@@ -8,6 +8,8 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 from math import log2
+from functools import reduce
+from operator import xor
 
 from migen import *
 from migen.genlib.record import Record
@@ -303,8 +305,38 @@ CMD_READ_BURST_INCR   = 0x02
 CMD_WRITE_BURST_FIXED = 0x03
 CMD_READ_BURST_FIXED  = 0x04
 
+# Framed commands (CMD_FRAMED | CMD_XXX): 16-bit length and CRC-8 (0x07) of the command appended by
+# the host, status byte returned by the core (followed for reads by the datas and their CRC-8).
+CMD_FRAMED            = 0x10
+
+STATUS_OK             = 0x00
+STATUS_CRC_ERROR      = 0x01
+
+def _crc8_next(crc, data, poly=0x07):
+    # Each bit of the next CRC is the XOR of a set of crc/data bits (computed on the bit indexes).
+    bits = [{("crc", n)} for n in range(8)]
+    for i in reversed(range(8)):
+        feedback = bits[7] ^ {("data", i)}
+        bits     = [(bits[n-1] if n else set()) ^ (feedback if (poly >> n) & 0b1 else set()) for n in range(8)]
+    signals = {"crc": crc, "data": data}
+    return Cat(*[reduce(xor, [signals[name][n] for name, n in sorted(bit)]) for bit in bits])
+
 class Stream2Wishbone(LiteXModule):
-    def __init__(self, phy=None, clk_freq=None, data_width=32, address_width=32):
+    """Stream (bytes) to Wishbone bridge (UARTBone protocol).
+
+    Commands: cmd (1 byte), length in words (1 byte), address in words and datas for writes (big
+    endian). Read datas are returned on the source.
+
+    With framed=True, framed commands (cmd | CMD_FRAMED) are also supported: length on 2 bytes (up
+    to 65535 words) and a CRC-8 of the command at its end. A status byte is returned for each
+    framed command, followed for reads by the datas and their CRC-8. Framed writes are buffered
+    (up to write_buffer_depth words) and only done when the CRC of the command is valid, reads are
+    only done when the CRC of the command is valid. An RX FIFO of rx_fifo_depth bytes is also
+    added to receive the following commands while a response is sent (allowing the host to send
+    up to rx_fifo_depth bytes of commands in advance).
+    """
+    def __init__(self, phy=None, clk_freq=None, data_width=32, address_width=32, framed=False,
+        rx_fifo_depth=64, write_buffer_depth=64):
         self.sink     = sink   = stream.Endpoint([("data", 8)]) if phy is None else phy.source
         self.source   = source = stream.Endpoint([("data", 8)]) if phy is None else phy.sink
         self.wishbone = wishbone.Interface(data_width=data_width, address_width=address_width, addressing="word")
@@ -313,55 +345,111 @@ class Stream2Wishbone(LiteXModule):
         assert data_width    in [8, 16, 32]
         assert address_width in [8, 16, 32, 64]
 
+        # Framed mode: RX FIFO and Write Buffer.
+        if framed:
+            self.rx_fifo = rx_fifo = _get_uart_fifo(rx_fifo_depth)
+            self.comb += sink.connect(rx_fifo.sink)
+            sink = rx_fifo.source
+            self.write_buffer = write_buffer = ResetInserter()(stream.SyncFIFO([("data", data_width)], write_buffer_depth))
+
+        length_width     = 16 if framed else 8
         cmd              = Signal(8,                           reset_less=True)
         incr             = Signal()
-        length           = Signal(8,                           reset_less=True)
+        length           = Signal(length_width,                reset_less=True)
         address          = Signal(address_width,               reset_less=True)
         data             = Signal(data_width,                  reset_less=True)
         data_bytes_count = Signal(int(log2(data_width//8)),    reset_less=True)
         addr_bytes_count = Signal(int(log2(address_width//8)), reset_less=True)
-        words_count      = Signal(8,                           reset_less=True)
+        words_count      = Signal(length_width,                reset_less=True)
 
         data_bytes_count_done  = (data_bytes_count == (data_width//8 - 1))
         addr_bytes_count_done  = (addr_bytes_count == (address_width//8 - 1))
         words_count_done  = (words_count == (length - 1))
 
+        # Framed commands.
+        cmd_framed   = Signal()
+        cmd_write    = Signal()
+        length_count = Signal()
+        overflow     = Signal()
+        crc          = Signal(8, reset_less=True)
+        status       = Signal(8, reset_less=True)
+        if framed:
+            self.comb += cmd_framed.eq(cmd[4])
+        self.comb += cmd_write.eq((cmd[:4] == CMD_WRITE_BURST_INCR) | (cmd[:4] == CMD_WRITE_BURST_FIXED))
+        crc_first = [NextValue(crc, _crc8_next(Constant(0, 8), sink.data))] if framed else []
+        crc_rx    = [NextValue(crc, _crc8_next(crc, sink.data))] if framed else []
+        crc_tx    = [NextValue(crc, _crc8_next(crc, source.data))] if framed else []
+        receive_done = [NextState("WRITE-DATA")]
+        write_next   = [NextState("RECEIVE-DATA")]
+        read_done    = [NextState("RECEIVE-CMD")]
+        if framed:
+            receive_done = [If(cmd_framed, NextState("BUFFER-DATA")).Else(NextState("WRITE-DATA"))]
+            write_next   = [If(cmd_framed, NextState("POP-DATA")).Else(NextState("RECEIVE-DATA"))]
+            read_done    = [If(cmd_framed, NextState("SEND-CRC")).Else(NextState("RECEIVE-CMD"))]
+
         self.fsm   = fsm   = ResetInserter()(FSM(reset_state="RECEIVE-CMD"))
         self.timer = timer = WaitTimer(100e-3*clk_freq)
-        self.comb += timer.wait.eq(~fsm.ongoing("RECEIVE-CMD"))
+        if framed:
+            # Timeout on inactivity (framed bursts can be longer than the timeout).
+            self.comb += timer.wait.eq(~fsm.ongoing("RECEIVE-CMD") &
+                ~(sink.valid & sink.ready) & ~(source.valid & source.ready))
+        else:
+            self.comb += timer.wait.eq(~fsm.ongoing("RECEIVE-CMD"))
         self.comb += fsm.reset.eq(timer.done)
+        if framed:
+            # Discard the buffered datas of aborted/erroneous commands.
+            self.comb += write_buffer.reset.eq(fsm.ongoing("RECEIVE-CMD"))
         fsm.act("RECEIVE-CMD",
             sink.ready.eq(1),
             NextValue(data_bytes_count, 0),
             NextValue(addr_bytes_count, 0),
             NextValue(words_count, 0),
+            NextValue(length_count, 0),
+            NextValue(length, 0),
+            NextValue(overflow, 0),
             If(sink.valid,
                 NextValue(cmd, sink.data),
+                *crc_first,
                 NextState("RECEIVE-LENGTH")
             )
         )
         fsm.act("RECEIVE-LENGTH",
             sink.ready.eq(1),
             If(sink.valid,
-                NextValue(length, sink.data),
-                NextState("RECEIVE-ADDRESS")
+                NextValue(length, Cat(sink.data, length)),
+                NextValue(length_count, 1),
+                *crc_rx,
+                If(~cmd_framed | length_count,
+                    NextState("RECEIVE-ADDRESS")
+                )
+            )
+        )
+        cmd_decode = If((cmd == CMD_WRITE_BURST_INCR) | (cmd == CMD_WRITE_BURST_FIXED),
+            NextValue(incr, cmd == CMD_WRITE_BURST_INCR),
+            NextState("RECEIVE-DATA")
+        ).Elif((cmd == CMD_READ_BURST_INCR) | (cmd == CMD_READ_BURST_FIXED),
+            NextValue(incr, cmd == CMD_READ_BURST_INCR),
+            NextState("READ-DATA")
+        )
+        if framed:
+            cmd_decode.Elif(cmd_framed & cmd_write,
+                NextValue(incr, cmd[:4] == CMD_WRITE_BURST_INCR),
+                NextState("RECEIVE-DATA")
+            ).Elif(cmd_framed & ((cmd[:4] == CMD_READ_BURST_INCR) | (cmd[:4] == CMD_READ_BURST_FIXED)),
+                NextValue(incr, cmd[:4] == CMD_READ_BURST_INCR),
+                NextState("RECEIVE-CRC")
             )
+        cmd_decode.Else(
+            NextState("RECEIVE-CMD")
         )
         fsm.act("RECEIVE-ADDRESS",
             sink.ready.eq(1),
             If(sink.valid,
                 NextValue(address, Cat(sink.data, address)),
                 NextValue(addr_bytes_count, addr_bytes_count + 1),
+                *crc_rx,
                 If(addr_bytes_count_done,
-                    If((cmd == CMD_WRITE_BURST_INCR) | (cmd == CMD_WRITE_BURST_FIXED),
-                        NextValue(incr, cmd == CMD_WRITE_BURST_INCR),
-                        NextState("RECEIVE-DATA")
-                    ).Elif((cmd == CMD_READ_BURST_INCR) | (cmd == CMD_READ_BURST_FIXED),
-                        NextValue(incr, cmd == CMD_READ_BURST_INCR),
-                        NextState("READ-DATA")
-                    ).Else(
-                        NextState("RECEIVE-CMD")
-                    )
+                    cmd_decode
                 )
             )
         )
@@ -370,8 +458,9 @@ class Stream2Wishbone(LiteXModule):
             If(sink.valid,
                 NextValue(data, Cat(sink.data, data)),
                 NextValue(data_bytes_count, data_bytes_count + 1),
+                *crc_rx,
                 If(data_bytes_count_done,
-                    NextState("WRITE-DATA")
+                    *receive_done
                 )
             )
         )
@@ -391,7 +480,7 @@ class Stream2Wishbone(LiteXModule):
                 If(words_count_done,
                     NextState("RECEIVE-CMD")
                 ).Else(
-                    NextState("RECEIVE-DATA")
+                    *write_next
                 )
             )
         )
@@ -414,11 +503,12 @@ class Stream2Wishbone(LiteXModule):
             source.valid.eq(1),
             If(source.ready,
                 NextValue(data_bytes_count, data_bytes_count + 1),
+                *crc_tx,
                 If(data_bytes_count_done,
                     NextValue(words_count, words_count + 1),
                     NextValue(address, address + incr),
                     If(words_count_done,
-                        NextState("RECEIVE-CMD")
+                        *read_done
                     ).Else(
                         NextState("READ-DATA")
                     )
@@ -429,26 +519,80 @@ class Stream2Wishbone(LiteXModule):
         if hasattr(source, "length"):
             self.comb += source.length.eq((data_width//8)*length)
 
+        if framed:
+            # Writes: Datas are buffered until the CRC is checked, then written from the buffer.
+            fsm.act("BUFFER-DATA",
+                sink.ready.eq(0),
+                write_buffer.sink.valid.eq(1),
+                write_buffer.sink.data.eq(data),
+                If(~write_buffer.sink.ready,
+                    NextValue(overflow, 1)
+                ),
+                NextValue(words_count, words_count + 1),
+                If(words_count_done,
+                    NextState("RECEIVE-CRC")
+                ).Else(
+                    NextState("RECEIVE-DATA")
+                )
+            )
+            fsm.act("POP-DATA",
+                sink.ready.eq(0),
+                write_buffer.source.ready.eq(1),
+                NextValue(data, write_buffer.source.data),
+                NextState("WRITE-DATA")
+            )
+            fsm.act("RECEIVE-CRC",
+                sink.ready.eq(1),
+                If(sink.valid,
+                    NextValue(status, Mux((sink.data == crc) & ~overflow, STATUS_OK, STATUS_CRC_ERROR)),
+                    NextState("SEND-STATUS")
+                )
+            )
+            fsm.act("SEND-STATUS",
+                source.valid.eq(1),
+                source.data.eq(status),
+                source.last.eq(cmd_write | (status != STATUS_OK)),
+                If(source.ready,
+                    NextValue(crc, 0),
+                    NextValue(words_count, 0),
+                    If(status != STATUS_OK,
+                        NextState("RECEIVE-CMD")
+                    ).Elif(cmd_write,
+                        NextState("POP-DATA")
+                    ).Else(
+                        NextState("READ-DATA")
+                    )
+                )
+            )
+            fsm.act("SEND-CRC",
+                source.valid.eq(1),
+                source.data.eq(crc),
+                source.last.eq(1),
+                If(source.ready,
+                    NextState("RECEIVE-CMD")
+                )
+            )
+
 
 class UARTBone(Stream2Wishbone):
-    def __init__(self, phy, clk_freq, cd="sys", address_width=32):
+    def __init__(self, phy, clk_freq, cd="sys", address_width=32, framed=False):
         if cd == "sys":
             self.phy = phy
-            Stream2Wishbone.__init__(self, self.phy, clk_freq=clk_freq, address_width=address_width)
+            Stream2Wishbone.__init__(self, self.phy, clk_freq=clk_freq, address_width=address_width, framed=framed)
         else:
             self.phy = ClockDomainsRenamer(cd)(phy)
             self.tx_cdc = stream.ClockDomainCrossing([("data", 8)], cd_from="sys", cd_to=cd)
             self.rx_cdc = stream.ClockDomainCrossing([("data", 8)], cd_from=cd,    cd_to="sys")
             self.comb += self.phy.source.connect(self.rx_cdc.sink)
             self.comb += self.tx_cdc.source.connect(self.phy.sink)
-            Stream2Wishbone.__init__(self, clk_freq=clk_freq, address_width=address_width)
+            Stream2Wishbone.__init__(self, clk_freq=clk_freq, address_width=address_width, framed=framed)
             self.comb += self.rx_cdc.source.connect(self.sink)
             self.comb += self.source.connect(self.tx_cdc.sink)
 
 class UARTWishboneBridge(UARTBone):
-    def __init__(self, pads, clk_freq, baudrate=115200, cd="sys"):
+    def __init__(self, pads, clk_freq, baudrate=115200, cd="sys", framed=False):
         self.phy = RS232PHY(pads, clk_freq, baudrate)
-        UARTBone.__init__(self, self.phy, clk_freq, cd)
+        UARTBone.__init__(self, self.phy, clk_freq, cd, framed=framed)
 
 # UART Multiplexer ---------------------------------------------------------------------------------
 
@@ -13,17 +13,23 @@
 
 
 import os
+import re
+import json
+import time
+import hashlib
 import argparse
 import subprocess
 import struct
 import shutil
 
+from concurrent.futures import ThreadPoolExecutor
+
 from packaging.version import Version
 
 from litex import get_data_mod
 from litex.gen import colorer
 
-from litex.build.tools import write_to_file
+from litex.build.tools import write_to_file, write_to_file_with_digest
 
 from litex.soc.cores import cpu
 from litex.soc.integration import export, soc_core
@@ -39,6 +45,45 @@ def _create_dir(d, remove_if_exists=False):
         shutil.rmtree(dir_path)
     os.makedirs(dir_path, exist_ok=True)
 
+def _hash_directory(h, d, exclude=[], ignore_banner=False):
+    for root, dirs, files in os.walk(d):
+        dirs.sort()
+        for f in sorted(files):
+            if f in exclude:
+                continue
+            filename = os.path.join(root, f)
+            h.update(os.path.relpath(filename, d).encode())
+            with open(filename, "rb") as f:
+                contents = f.read()
+            # Ignore generated_banner lines (generation date).
+            if ignore_banner:
+                contents = re.sub(rb".* Auto-generated by LiteX .*\n", b"", contents)
+            h.update(contents)
+
+def _rewrite_dependencies(d, directories):
+    # Rewrite the directories of the Makefile dependencies (.d) of a build tree copied from another
+    # build, directories is a {old: new} dict.
+    directories = {old: new for old, new in directories.items() if old != new}
+    if not directories:
+        return
+    pattern = re.compile("|".join(re.escape(old) for old in sorted(directories, key=len, reverse=True)) + r"(?=[/\s:]|$)")
+    for root, dirs, files in os.walk(d):
+        for f in files:
+            if not f.endswith(".d"):
+                continue
+            filename = os.path.join(root, f)
+            with open(filename) as f:
+                contents = f.read()
+            with open(filename, "w") as f:
+                f.write(pattern.sub(lambda m: directories[m.group(0)], contents))
+
+def _touch_directory(d):
+    # Give all the files of a build tree the same (current) modification time.
+    now = time.time()
+    for root, dirs, files in os.walk(d):
+        for f in files:
+            os.utime(os.path.join(root, f), (now, now))
+
 # Software Packages --------------------------------------------------------------------------------
 
 soc_software_packages = [
@@ -83,12 +128,17 @@ class Builder:
         csr_csv          = None,
         csr_svd          = None,
         memory_x         = None,
+        skip_unchanged_exports = False,
 
         # BIOS.
         bios_lto         = False,
         bios_format      = "integer",
         bios_console     = "full",
 
+        # Software build.
+        software_jobs      = 1,
+        software_cache_dir = None,
+
         # Documentation.
         generate_doc     = False):
 
@@ -111,12 +161,19 @@ class Builder:
         self.csr_json = csr_json
         self.csr_svd  = csr_svd
         self.memory_x = memory_x
+        self.skip_unchanged_exports = skip_unchanged_exports
+        self.csr_model              = None
 
         # BIOS.
         self.bios_lto     = bios_lto
         self.bios_format  = bios_format
         self.bios_console = bios_console
 
+        # Software build.
+        self.software_jobs      = software_jobs
+        self.software_cache_dir = software_cache_dir
+        self.software_compiler  = None
+
         # Documentation.
         self.generate_doc = generate_doc
 
@@ -175,6 +232,22 @@ class Builder:
 
         return "\n".join(variables_contents)
 
+    def _get_csr_model(self):
+        # Build CSR Register Model (once, on the finalized SoC) shared by the CSR exports.
+        if self.csr_model is None:
+            self.csr_model = export.CSRModel(
+                regions     = self.soc.csr_regions,
+                constants   = self.soc.constants,
+                mem_regions = self.soc.mem_regions)
+        return self.csr_model
+
+    def _write_export(self, filename, contents, *args):
+        # Write CSR export, skipping its generation when unchanged (if enabled).
+        digest = None
+        if self.skip_unchanged_exports:
+            digest = self._get_csr_model().get_digest(os.path.basename(filename), *args)
+        write_to_file_with_digest(filename, contents, digest)
+
     def _generate_includes(self, with_bios=True):
         # Generate Include/Generated directories.
         _create_dir(self.include_dir)
@@ -215,11 +288,13 @@ class Builder:
         write_to_file(os.path.join(self.generated_dir, "soc.h"), soc_contents)
 
         # Generate CSR registers definitions/access functions to csr.h.
-        csr_contents = export.get_csr_header(
+        csr_base = self.soc.mem_regions["csr"].origin
+        csr_contents = lambda: export.get_csr_header(
             regions   = self.soc.csr_regions,
             constants = self.soc.constants,
-            csr_base  = self.soc.mem_regions["csr"].origin)
-        write_to_file(os.path.join(self.generated_dir, "csr.h"), csr_contents)
+            csr_base  = csr_base,
+            model     = self._get_csr_model())
+        self._write_export(os.path.join(self.generated_dir, "csr.h"), csr_contents, csr_base)
 
         # Generate Git SHA1 of tools to git.h
         git_contents = export.get_git_header()
@@ -237,21 +312,15 @@ class Builder:
     def _generate_csr_map(self):
         # JSON Export.
         if self.csr_json is not None:
-            csr_json_contents = export.get_csr_json(
-                csr_regions = self.soc.csr_regions,
-                constants   = self.soc.constants,
-                mem_regions = self.soc.mem_regions)
-            write_to_file(os.path.realpath(self.csr_json), csr_json_contents)
+            csr_json_contents = lambda: export.get_csr_json(model=self._get_csr_model())
+            self._write_export(os.path.realpath(self.csr_json), csr_json_contents)
 
         # CSV Export.
         if self.csr_csv is not None:
-            csr_csv_contents = export.get_csr_csv(
-                csr_regions = self.soc.csr_regions,
-                constants   = self.soc.constants,
-                mem_regions = self.soc.mem_regions)
-            write_to_file(os.path.realpath(self.csr_csv), csr_csv_contents)
+            csr_csv_contents = lambda: export.get_csr_csv(model=self._get_csr_model())
+            self._write_export(os.path.realpath(self.csr_csv), csr_csv_contents)
 
-        # SVD Export.
+        # SVD Export (always generated: also depends on the SoC documentation).
         if self.csr_svd is not None:
             csr_svd_contents = export.get_csr_svd(self.soc)
             write_to_file(os.path.realpath(self.csr_svd), csr_svd_contents)
@@ -277,18 +346,150 @@ class Builder:
         for name, src_dir in self.software_packages:
             _create_dir(os.path.join(self.software_dir, name))
 
+    def _get_software_stages(self, compile_bios=True):
+        # libc is built first (its build directory provides the picolibc headers to the other
+        # packages), then the other libraries in parallel and the remaining packages in order.
+        packages  = [(name, src_dir) for name, src_dir in self.software_packages
+            if not (name == "bios" and not compile_bios)]
+        libraries = [(name, src_dir) for name, src_dir in packages
+            if (name in self.software_libraries) and (name != "libc")]
+        stages  = [[(name, src_dir)] for name, src_dir in packages if name == "libc"]
+        stages += [libraries] if libraries else []
+        stages += [[(name, src_dir)] for name, src_dir in packages
+            if (name not in self.software_libraries)]
+        return stages
+
+    def _get_software_package_variables(self, name):
+        # Only keep the variables affecting the package: Package lists are only used to link the
+        # BIOS, BIOS/Picolibc configurations only used by the BIOS/libc.
+        packages_dirs = [n.upper() + "_DIRECTORY" for n, _ in self.software_packages]
+        variables     = []
+        for line in self._get_variables_contents().splitlines():
+            k = line.split("=")[0]
+            if name != "bios":
+                if k in ["PACKAGES", "PACKAGE_DIRS", "LIBS"] or k.startswith("BIOS_"):
+                    continue
+                if k in packages_dirs and k not in [name.upper() + "_DIRECTORY", "LIBBASE_DIRECTORY"]:
+                    continue
+            if (name != "libc") and (k == "PICOLIBC_FORMAT"):
+                continue
+            variables.append(line)
+        return "\n".join(variables)
+
+    def _get_software_compiler_version(self, variables):
+        # Version of the compiler selected by common.mak (computed once).
+        if self.software_compiler is None:
+            triple = variables.get("TRIPLE", "--native--")
+            prefix = "" if triple == "--native--" else f"{triple}-"
+            if variables.get("CLANG", "0") == "1":
+                command = ["clang", "-target", triple, "--version"]
+            else:
+                command = [f"{prefix}gcc", "--version"]
+            try:
+                self.software_compiler = subprocess.check_output(command, stderr=subprocess.DEVNULL).decode()
+            except (OSError, subprocess.CalledProcessError):
+                self.software_compiler = ""
+        return self.software_compiler
+
+    def _get_software_package_hashes(self, name, src_dir, dependencies):
+        # Variables hash: Changes require a clean re-build of the package.
+        variables_contents = self._get_software_package_variables(name)
+        variables_hash     = hashlib.sha256(variables_contents.encode()).hexdigest()
+        variables = dict(line.split("=", 1) for line in variables_contents.splitlines() if "=" in line)
+
+        # Inputs hash: Variables + Compiler + Package/Common/CPU sources + Generated files +
+        # Dependencies, identifies the build outputs of the package (in the cache). Build directories
+        # are not part of it to share the cache between builds (the generated files are hashed).
+        h = hashlib.sha256()
+        for line in variables_contents.splitlines():
+            if line.split("=")[0] not in ["BUILDINC_DIRECTORY"]:
+                h.update(line.encode() + b"\n")
+        h.update(self._get_software_compiler_version(variables).encode())
+        _hash_directory(h, src_dir)
+        h.update(b"common.mak")
+        with open(os.path.join(soc_directory, "software", "common.mak"), "rb") as f:
+            h.update(f.read())
+        _hash_directory(h, os.path.join(soc_directory, "software", "include"))
+        directories = ["CPU_DIRECTORY"]
+        directories += {
+            "libc"           : ["PICOLIBC_DIRECTORY"],
+            "libcompiler_rt" : ["COMPILER_RT_DIRECTORY"],
+        }.get(name, [])
+        for directory in directories:
+            if os.path.isdir(variables.get(directory, "")):
+                _hash_directory(h, variables[directory])
+        _hash_directory(h, self.generated_dir, exclude=["variables.mak"], ignore_banner=True)
+        for dependency in dependencies:
+            h.update(dependency.encode())
+        return variables_hash, h.hexdigest()
+
+    def _build_software_package(self, name, src_dir, dependencies, jobs):
+        dst_dir    = os.path.join(self.software_dir, name)
+        stamp_file = os.path.join(dst_dir, ".litex_build.json")
+        makefile   = os.path.join(src_dir, "Makefile")
+
+        # Get package hashes and previous ones.
+        variables_hash, inputs_hash = self._get_software_package_hashes(name, src_dir, dependencies)
+        stamp = {}
+        if os.path.exists(stamp_file):
+            with open(stamp_file) as f:
+                stamp = json.load(f)
+
+        # Clean package when variables have changed (not tracked by make).
+        if stamp.get("variables") != variables_hash:
+            _create_dir(dst_dir, remove_if_exists=True)
+
+        # Get package from cache when available (and not already built with the same inputs).
+        cache_dir = None
+        if self.software_cache_dir is not None:
+            cache_dir = os.path.join(os.path.realpath(self.software_cache_dir), f"{name}-{inputs_hash}")
+        directories = {
+            "software"  : self.software_dir,
+            "include"   : self.include_dir,
+            "generated" : self.generated_dir,
+        }
+        if cache_dir is not None and os.path.exists(cache_dir) and stamp.get("inputs") != inputs_hash:
+            _create_dir(dst_dir, remove_if_exists=True)
+            shutil.copytree(cache_dir, dst_dir, dirs_exist_ok=True)
+            # Make the restored dependencies point to this build's directories and the restored
+            # files up to date with this build's generated files (same inputs).
+            with open(stamp_file) as f:
+                cache_directories = json.load(f).get("directories", {})
+            _rewrite_dependencies(dst_dir, {cache_directories[k]: v for k, v in directories.items() if k in cache_directories})
+            _touch_directory(dst_dir)
+
+        # Always run make (incremental, only re-builds the outdated targets).
+        subprocess.check_call(["make", "-C", dst_dir, "-f", makefile, f"-j{jobs}"])
+
+        # Update stamp.
+        with open(stamp_file, "w") as f:
+            json.dump({"variables": variables_hash, "inputs": inputs_hash, "directories": directories}, f)
+
+        # Add package to cache.
+        if cache_dir is not None and not os.path.exists(cache_dir):
+            # Copy to a temporary directory first to only expose complete entries.
+            tmp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+            shutil.copytree(dst_dir, tmp_dir, dirs_exist_ok=True)
+            try:
+                os.rename(tmp_dir, cache_dir)
+            except OSError:
+                # Entry already added by a concurrent build.
+                shutil.rmtree(tmp_dir)
+        return inputs_hash
+
     def _generate_rom_software(self, compile_bios=True):
         # Compile all software packages.
-         for name, src_dir in self.software_packages:
-
-            # Skip BIOS compilation when disabled.
-            if name == "bios" and not compile_bios:
-                continue
-            # Compile software package.
-            dst_dir  = os.path.join(self.software_dir, name)
-            makefile = os.path.join(src_dir, "Makefile")
-            if self.compile_software:
-                subprocess.check_call(["make", "-C", dst_dir, "-f", makefile])
+        if not self.compile_software:
+            return
+        jobs         = max(self.software_jobs or os.cpu_count(), 1)
+        dependencies = []
+        for stage in self._get_software_stages(compile_bios=compile_bios):
+            # Compile the packages of the stage in parallel (sharing the jobs).
+            stage_jobs = max(jobs//len(stage), 1)
+            with ThreadPoolExecutor(max_workers=min(jobs, len(stage))) as executor:
+                futures = [executor.submit(self._build_software_package, name, src_dir, list(dependencies), stage_jobs)
+                    for name, src_dir in stage]
+                dependencies += [future.result() for future in futures]
 
     def _initialize_rom_software(self):
         # Get BIOS data from compiled BIOS binary.
@@ -321,15 +522,10 @@ class Builder:
             self.soc.platform.sources[i] = (f, language, library)
 
         # Create Software directory.
-        # First check if software needs a full re-build and remove software dir if so.
+        # Software packages are re-built individually when their inputs change (see
+        # _build_software_package).
         if with_bios:
-            software_full_rebuild  = False
-            software_variables_mak = os.path.join(self.generated_dir, "variables.mak")
-            if self.compile_software and os.path.exists(software_variables_mak):
-                old_variables_contents = open(software_variables_mak).read()
-                new_variables_contents = self._get_variables_contents()
-                software_full_rebuild  = (old_variables_contents != new_variables_contents)
-            _create_dir(self.software_dir, remove_if_exists=software_full_rebuild)
+            _create_dir(self.software_dir)
 
         # Finalize the SoC.
         self.soc.finalize()
@@ -406,7 +602,10 @@ def builder_args(parser):
     builder_group.add_argument("--soc-json","--csr-json", default=None,        help="Write SoC mapping to the specified JSON file.")
     builder_group.add_argument("--soc-svd", "--csr-svd",  default=None,        help="Write SoC mapping to the specified SVD file.")
     builder_group.add_argument("--memory-x",              default=None,        help="Write SoC Memory Regions to the specified Memory-X file.")
+    builder_group.add_argument("--skip-unchanged-exports", action="store_true", help="Skip generation of CSR exports (csr.h, JSON, CSV) unchanged since last build.")
     builder_group.add_argument("--doc",                   action="store_true", help="Generate SoC Documentation.")
+    builder_group.add_argument("--software-jobs",         default=1, type=int, help="Number of parallel Software compilation jobs (0: Number of CPUs).")
+    builder_group.add_argument("--software-cache-dir",    default=None,        help="Shared cache directory for compiled Software packages.")
     bios_group = parser.add_argument_group(title="BIOS options") # FIXME: Move?
     bios_group.add_argument("--bios-lto",     action="store_true", help="Enable BIOS LTO (Link Time Optimization) compilation.")
     bios_group.add_argument("--bios-format",  default="integer",   help="Select BIOS printf format.",  choices=["integer", "float", "double"])
@@ -426,8 +625,11 @@ def builder_argdict(args):
         "csr_json"         : args.soc_json,
         "csr_svd"          : args.soc_svd,
         "memory_x"         : args.memory_x,
+        "skip_unchanged_exports" : args.skip_unchanged_exports,
         "generate_doc"     : args.doc,
         "bios_lto"         : args.bios_lto,
         "bios_format"      : args.bios_format,
         "bios_console"     : args.bios_console,
+        "software_jobs"      : args.software_jobs,
+        "software_cache_dir" : args.software_cache_dir,
     }
@@ -5,10 +5,11 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 import os
+import sys
 import math
+import array
 import json
 import time
-import struct
 import datetime
 
 from migen import *
@@ -64,29 +65,51 @@ def get_mem_data(filename_or_regions, data_width=32, endianness="big", mem_size=
 
     # Fill data.
     bytes_per_data = data_width//8
-    data           = [0]*math.ceil(data_size/bytes_per_data)
+    data_length    = math.ceil(data_size/bytes_per_data)
+    data           = None
     for filename, base in regions.items():
         base = int(base, 16)
         with open(filename, "rb") as f:
-            i = 0
-            while True:
-                w = f.read(bytes_per_data)
-                if not w:
-                    break
-                if len(w) != bytes_per_data:
-                    for _ in range(len(w), bytes_per_data):
-                        w += b'\x00'
-                unpack_order = {
-                    "little": "<I",
-                    "big":    ">I"
-                }[endianness]
-                data[(base - offset)//bytes_per_data + i] = 0
-                for filled_data_width in range(0, data_width, 32):
-                    cur_byte = filled_data_width//8
-                    data[(base - offset)//bytes_per_data + i] |= (struct.unpack(unpack_order, w[cur_byte:cur_byte+4])[0] << filled_data_width)
-                i += 1
+            words = _read_words(f, data_width, endianness)
+        start = (base - offset)//bytes_per_data
+        assert (start >= 0) and (start + len(words) <= data_length), (
+            "{} does not fit in memory data: {}/{} words at {}".format(
+             filename, len(words), data_length, start))
+        # Single region covering the whole data: use the words directly.
+        if data is None and start == 0 and len(words) == data_length:
+            data = words
+        else:
+            if data is None:
+                data = [0]*data_length
+            data[start:start + len(words)] = words
     return data
 
+def _read_words(f, data_width=32, endianness="big"):
+    # Read a binary image as data_width-bit words in a few bulk operations (instead of per-word
+    # reads/unpacks): the image is read as 32-bit words in an array (zero-padded), wider words are
+    # assembled from their 32-bit words (least significant first).
+    words = array.array("I")
+    assert words.itemsize == 4
+    words.fromfile(f, os.fstat(f.fileno()).st_size//4)
+    remainder = f.read()
+    if remainder:
+        words.frombytes(remainder + bytes(4 - len(remainder)))
+    words.extend([0]*(-len(words) % (data_width//32)))
+
+    # 32-bit words.
+    if endianness != sys.byteorder:
+        words.byteswap()
+    if data_width == 32:
+        return words.tolist()
+
+    # Wider words (from 32-bit words as little-endian bytes).
+    if sys.byteorder != "little":
+        words.byteswap()
+    bytes_per_data = data_width//8
+    view = memoryview(words).cast("B")
+    return [int.from_bytes(view[i:i + bytes_per_data], "little")
+        for i in range(0, len(view), bytes_per_data)]
+
 def get_boot_address(filename_or_regions, offset=0):
     # Create memory regions.
     regions = get_mem_regions(filename_or_regions, offset)
@@ -20,6 +20,8 @@
 import os
 import re
 import json
+import hashlib
+import collections
 import time
 import datetime
 import inspect
@@ -192,6 +194,73 @@ def get_soc_header(constants, with_access_functions=True):
     r += "\n#endif\n"
     return r
 
+# CSR Register Model -------------------------------------------------------------------------------
+
+CSRModelField    = collections.namedtuple("CSRModelField",    ["name", "offset", "size", "reset", "description"])
+CSRModelRegister = collections.namedtuple("CSRModelRegister", ["name", "addr", "nwords", "size", "type", "read_only", "reset", "description", "fields"])
+CSRModelRegion   = collections.namedtuple("CSRModelRegion",   ["name", "origin", "busword", "registers"])
+CSRModelMemory   = collections.namedtuple("CSRModelMemory",   ["name", "base", "size", "type"])
+
+def _get_csr_reset(csr):
+    if hasattr(csr, "fields"):
+        return sum(field.reset_value << field.offset for field in csr.fields.fields)
+    for name in ["storage", "status"]:
+        if hasattr(csr, name):
+            return int(getattr(csr, name).reset.value)
+    return 0
+
+class CSRModel:
+    """Pre-computed CSR register model of a (finalized) SoC.
+
+    Registers addresses/sizes/access modes and fields are computed once from the CSR regions and
+    shared by the exporters (C header, JSON, CSV). get_digest() allows skipping the generation of
+    exports whose inputs did not change.
+    """
+    def __init__(self, regions, constants={}, mem_regions={}):
+        self.alignment = constants.get("CONFIG_CSR_ALIGNMENT", 32)
+        self.constants = dict(constants)
+        self.regions   = []
+        self._digest   = None
+        self.memories  = [CSRModelMemory(name, region.origin, region.length, region.type)
+            for name, region in mem_regions.items()]
+        stride = self.alignment//8
+        for name, region in regions.items():
+            registers = None
+            if not isinstance(region.obj, Memory):
+                registers = []
+                addr      = region.origin
+                for csr in region.obj:
+                    nwords = (csr.size + region.busword - 1)//region.busword
+                    fields = None
+                    if hasattr(csr, "fields"):
+                        fields = [CSRModelField(f.name, f.offset, f.size, f.reset_value, f.description)
+                            for f in csr.fields.fields]
+                    registers.append(CSRModelRegister(
+                        name        = csr.name,
+                        addr        = addr,
+                        nwords      = nwords,
+                        size        = csr.size,
+                        type        = "ro" if isinstance(csr, CSRStatus) and not hasattr(csr, "r") else "rw",
+                        read_only   = getattr(csr, "read_only", False),
+                        reset       = _get_csr_reset(csr),
+                        description = getattr(csr, "description", None),
+                        fields      = fields,
+                    ))
+                    addr += stride*nwords
+            self.regions.append(CSRModelRegion(name, region.origin, region.busword, registers))
+
+    def get_digest(self, *args):
+        # Digest of the model and exporters (computed once), combined with the export arguments.
+        if self._digest is None:
+            h = hashlib.sha256()
+            with open(__file__, "rb") as f:
+                h.update(f.read())
+            h.update(repr((self.regions, self.memories, self.constants)).encode())
+            self._digest = h.hexdigest()
+        return hashlib.sha256(repr((self._digest, args)).encode()).hexdigest()
+
+# CSR Header Export --------------------------------------------------------------------------------
+
 def _get_csr_addr(csr_base, addr, with_csr_base_define=True):
     if with_csr_base_define:
         return f"(CSR_BASE + {hex(addr)}L)"
@@ -199,18 +268,16 @@ def _get_csr_addr(csr_base, addr, with_csr_base_define=True):
         return f"{hex(csr_base + addr)}L"
 
 def _get_rw_functions_c(reg_name, reg_base, nwords, busword, alignment, read_only, csr_base, with_csr_base_define, with_access_functions):
-    r = ""
-
-    addr_str = f"CSR_{reg_name.upper()}_ADDR"
-    size_str = f"CSR_{reg_name.upper()}_SIZE"
-    r += f"#define {addr_str} {_get_csr_addr(csr_base, reg_base, with_csr_base_define)}\n"
+    r = []
 
-    r += f"#define {size_str} {nwords}\n"
+    addrs = [_get_csr_addr(csr_base, reg_base + sub*alignment//8, with_csr_base_define) for sub in range(nwords)]
+    r.append(f"#define CSR_{reg_name.upper()}_ADDR {addrs[0]}\n")
+    r.append(f"#define CSR_{reg_name.upper()}_SIZE {nwords}\n")
 
     size = nwords*busword//8
     if size > 8:
         # Downstream should select appropriate `csr_[rd|wr]_buf_uintX()` pair!
-        return r
+        return "".join(r)
     elif size > 4:
         ctype = "uint64_t"
     elif size > 2:
@@ -220,96 +287,102 @@ def _get_rw_functions_c(reg_name, reg_base, nwords, busword, alignment, read_onl
     else:
         ctype = "uint8_t"
 
-    stride = alignment//8;
     if with_access_functions:
-        r += f"static inline {ctype} {reg_name}_read(void) {{\n"
+        r.append(f"static inline {ctype} {reg_name}_read(void) {{\n")
         if nwords > 1:
-            r += f"\t{ctype} r = csr_read_simple({_get_csr_addr(csr_base, reg_base, with_csr_base_define)});\n"
-            for sub in range(1, nwords):
-                r += f"\tr <<= {busword};\n"
-                r += f"\tr |= csr_read_simple({_get_csr_addr(csr_base, reg_base+sub*stride, with_csr_base_define)});\n"
-            r += "\treturn r;\n}\n"
+            r.append(f"\t{ctype} r = csr_read_simple({addrs[0]});\n")
+            for addr in addrs[1:]:
+                r.append(f"\tr <<= {busword};\n")
+                r.append(f"\tr |= csr_read_simple({addr});\n")
+            r.append("\treturn r;\n}\n")
         else:
-            r += f"\treturn csr_read_simple({_get_csr_addr(csr_base, reg_base, with_csr_base_define)});\n}}\n"
+            r.append(f"\treturn csr_read_simple({addrs[0]});\n}}\n")
 
         if not read_only:
-            r += f"static inline void {reg_name}_write({ctype} v) {{\n"
-            for sub in range(nwords):
+            r.append(f"static inline void {reg_name}_write({ctype} v) {{\n")
+            for sub, addr in enumerate(addrs):
                 shift = (nwords-sub-1)*busword
-                if shift:
-                    v_shift = "v >> {}".format(shift)
-                else:
-                    v_shift = "v"
-                r += f"\tcsr_write_simple({v_shift}, {_get_csr_addr(csr_base, reg_base+sub*stride, with_csr_base_define)});\n"
-            r += "}\n"
+                v_shift = f"v >> {shift}" if shift else "v"
+                r.append(f"\tcsr_write_simple({v_shift}, {addr});\n")
+            r.append("}\n")
+    return "".join(r)
+
+def _get_field_functions_c(reg_name, field_name, offset, size, read_only):
+    mask = f"0x{(1<<size)-1:x}"
+    r = (
+        f"static inline uint32_t {field_name}_extract(uint32_t oldword) {{\n"
+        f"\tuint32_t mask = {mask};\n"
+        f"\treturn ( (oldword >> {offset}) & mask );\n}}\n"
+        f"static inline uint32_t {field_name}_read(void) {{\n"
+        f"\tuint32_t word = {reg_name}_read();\n"
+        f"\treturn {field_name}_extract(word);\n"
+        f"}}\n"
+    )
+    if not read_only:
+        r += (
+            f"static inline uint32_t {field_name}_replace(uint32_t oldword, uint32_t plain_value) {{\n"
+            f"\tuint32_t mask = {mask};\n"
+            f"\treturn (oldword & (~(mask << {offset}))) | (mask & plain_value)<< {offset} ;\n}}\n"
+            f"static inline void {field_name}_write(uint32_t plain_value) {{\n"
+            f"\tuint32_t oldword = {reg_name}_read();\n"
+            f"\tuint32_t newword = {field_name}_replace(oldword, plain_value);\n"
+            f"\t{reg_name}_write(newword);\n"
+            f"}}\n"
+        )
     return r
 
-
-def get_csr_header(regions, constants, csr_base=None, with_csr_base_define=True, with_access_functions=True):
-    alignment = constants.get("CONFIG_CSR_ALIGNMENT", 32)
-    r = generated_banner("//")
+def get_csr_header(regions, constants, csr_base=None, with_csr_base_define=True, with_access_functions=True, model=None):
+    if model is None:
+        model = CSRModel(regions, constants)
+    alignment = model.alignment
+    r = [generated_banner("//")]
     if with_access_functions: # FIXME
-        r += "#include <generated/soc.h>\n"
-    r += "#ifndef __GENERATED_CSR_H\n#define __GENERATED_CSR_H\n"
+        r.append("#include <generated/soc.h>\n")
+    r.append("#ifndef __GENERATED_CSR_H\n#define __GENERATED_CSR_H\n")
     if with_access_functions:
-        r += "#include <stdint.h>\n"
-        r += "#include <system.h>\n"
-        r += "#ifndef CSR_ACCESSORS_DEFINED\n"
-        r += "#include <hw/common.h>\n"
-        r += "#endif /* ! CSR_ACCESSORS_DEFINED */\n"
-    _csr_base = regions[next(iter(regions))].origin
+        r.append("#include <stdint.h>\n")
+        r.append("#include <system.h>\n")
+        r.append("#ifndef CSR_ACCESSORS_DEFINED\n")
+        r.append("#include <hw/common.h>\n")
+        r.append("#endif /* ! CSR_ACCESSORS_DEFINED */\n")
+    _csr_base = model.regions[0].origin
     csr_base = csr_base if csr_base is not None else _csr_base
     if with_csr_base_define:
-        r += "\n#ifndef CSR_BASE\n"
-        r += f"#define CSR_BASE {hex(csr_base)}L\n"
-        r += "#endif\n"
-    for name, region in regions.items():
-        origin = region.origin - _csr_base
-        r += "\n/* "+name+" */\n"
-        r += f"#define CSR_{name.upper()}_BASE {_get_csr_addr(csr_base, origin, with_csr_base_define)}\n"
-        if not isinstance(region.obj, Memory):
-            for csr in region.obj:
-                nr = (csr.size + region.busword - 1)//region.busword
-                r += _get_rw_functions_c(
-                    reg_name              = name + "_" + csr.name,
-                    reg_base              = origin,
-                    nwords                = nr,
-                    busword               = region.busword,
-                    alignment             = alignment,
-                    read_only             = getattr(csr, "read_only", False),
-                    csr_base              = csr_base,
-                    with_csr_base_define  = with_csr_base_define,
-                    with_access_functions = with_access_functions,
-                )
-                origin += alignment//8*nr
-                if hasattr(csr, "fields"):
-                    for field in csr.fields.fields:
-                        offset = str(field.offset)
-                        size = str(field.size)
-                        r += f"#define CSR_{name.upper()}_{csr.name.upper()}_{field.name.upper()}_OFFSET {offset}\n"
-                        r += f"#define CSR_{name.upper()}_{csr.name.upper()}_{field.name.upper()}_SIZE {size}\n"
-                        if with_access_functions and csr.size <= 32: # FIXME: Implement extract/read functions for csr.size > 32-bit.
-                            reg_name   = name + "_" + csr.name.lower()
-                            field_name = reg_name + "_" + field.name.lower()
-                            r += "static inline uint32_t " + field_name + "_extract(uint32_t oldword) {\n"
-                            r += f"\tuint32_t mask = 0x{(1<<int(size))-1:x};\n"
-                            r += "\treturn ( (oldword >> " + offset + ") & mask );\n}\n"
-                            r += "static inline uint32_t " + field_name + "_read(void) {\n"
-                            r += "\tuint32_t word = " + reg_name + "_read();\n"
-                            r += "\treturn " + field_name + "_extract(word);\n"
-                            r += "}\n"
-                            if not getattr(csr, "read_only", False):
-                                r += "static inline uint32_t " + field_name + "_replace(uint32_t oldword, uint32_t plain_value) {\n"
-                                r += f"\tuint32_t mask = 0x{(1<<int(size))-1:x};\n"
-                                r += "\treturn (oldword & (~(mask << " + offset + "))) | (mask & plain_value)<< " + offset + " ;\n}\n"
-                                r += "static inline void " + field_name + "_write(uint32_t plain_value) {\n"
-                                r += "\tuint32_t oldword = " + reg_name + "_read();\n"
-                                r += "\tuint32_t newword = " + field_name + "_replace(oldword, plain_value);\n"
-                                r += "\t" + reg_name + "_write(newword);\n"
-                                r += "}\n"
-
-    r += "\n#endif\n"
-    return r
+        r.append("\n#ifndef CSR_BASE\n")
+        r.append(f"#define CSR_BASE {hex(csr_base)}L\n")
+        r.append("#endif\n")
+    for region in model.regions:
+        name = region.name
+        r.append(f"\n/* {name} */\n")
+        r.append(f"#define CSR_{name.upper()}_BASE {_get_csr_addr(csr_base, region.origin - _csr_base, with_csr_base_define)}\n")
+        for csr in (region.registers or []):
+            r.append(_get_rw_functions_c(
+                reg_name              = name + "_" + csr.name,
+                reg_base              = csr.addr - _csr_base,
+                nwords                = csr.nwords,
+                busword               = region.busword,
+                alignment             = alignment,
+                read_only             = csr.read_only,
+                csr_base              = csr_base,
+                with_csr_base_define  = with_csr_base_define,
+                with_access_functions = with_access_functions,
+            ))
+            for field in (csr.fields or []):
+                define = f"CSR_{name.upper()}_{csr.name.upper()}_{field.name.upper()}"
+                r.append(f"#define {define}_OFFSET {field.offset}\n")
+                r.append(f"#define {define}_SIZE {field.size}\n")
+                if with_access_functions and csr.size <= 32: # FIXME: Implement extract/read functions for csr.size > 32-bit.
+                    reg_name = name + "_" + csr.name.lower()
+                    r.append(_get_field_functions_c(
+                        reg_name   = reg_name,
+                        field_name = reg_name + "_" + field.name.lower(),
+                        offset     = field.offset,
+                        size       = field.size,
+                        read_only  = csr.read_only,
+                    ))
+
+    r.append("\n#endif\n")
+    return "".join(r)
 
 def get_i2c_header(i2c_init_values):
     i2c_devs, i2c_init = i2c_init_values
@@ -372,8 +445,9 @@ def get_i2c_header(i2c_init_values):
 
 # JSON Export --------------------------------------------------------------------------------------
 
-def get_csr_json(csr_regions={}, constants={}, mem_regions={}):
-    alignment = constants.get("CONFIG_CSR_ALIGNMENT", 32)
+def get_csr_json(csr_regions={}, constants={}, mem_regions={}, model=None):
+    if model is None:
+        model = CSRModel(csr_regions, constants, mem_regions)
 
     d = {
         "csr_bases":     {},
@@ -382,30 +456,23 @@ def get_csr_json(csr_regions={}, constants={}, mem_regions={}):
         "memories":      {},
     }
 
-    for name, region in csr_regions.items():
-        d["csr_bases"][name] = region.origin
-        region_origin = region.origin
-        if not isinstance(region.obj, Memory):
-            for csr in region.obj:
-                _size = (csr.size + region.busword - 1)//region.busword
-                _type = "rw"
-                if isinstance(csr, CSRStatus) and not hasattr(csr, "r"):
-                    _type = "ro"
-                d["csr_registers"][name + "_" + csr.name] = {
-                    "addr": region_origin,
-                    "size": _size,
-                    "type": _type
-                }
-                region_origin += alignment//8*_size
+    for region in model.regions:
+        d["csr_bases"][region.name] = region.origin
+        for csr in (region.registers or []):
+            d["csr_registers"][region.name + "_" + csr.name] = {
+                "addr": csr.addr,
+                "size": csr.nwords,
+                "type": csr.type
+            }
 
-    for name, value in constants.items():
+    for name, value in model.constants.items():
         d["constants"][name.lower()] = value.lower() if isinstance(value, str) else value
 
-    for name, region in mem_regions.items():
-        d["memories"][name.lower()] = {
-            "base": region.origin,
-            "size": region.length,
-            "type": region.type,
+    for memory in model.memories:
+        d["memories"][memory.name.lower()] = {
+            "base": memory.base,
+            "size": memory.size,
+            "type": memory.type,
         }
 
     return json.dumps(d, indent=4)
@@ -413,25 +480,22 @@ def get_csr_json(csr_regions={}, constants={}, mem_regions={}):
 
 # CSV Export --------------------------------------------------------------------------------------
 
-def get_csr_csv(csr_regions={}, constants={}, mem_regions={}):
-    d = json.loads(get_csr_json(csr_regions, constants, mem_regions))
-    r = generated_banner("#")
-    for name, value in d["csr_bases"].items():
-        r += "csr_base,{},0x{:08x},,\n".format(name, value)
-    for name in d["csr_registers"].keys():
-        r += "csr_register,{},0x{:08x},{},{}\n".format(name,
-            d["csr_registers"][name]["addr"],
-            d["csr_registers"][name]["size"],
-            d["csr_registers"][name]["type"])
-    for name, value in d["constants"].items():
-        r += "constant,{},{},,\n".format(name, value)
-    for name in d["memories"].keys():
-        r += "memory_region,{},0x{:08x},{:d},{:s}\n".format(name,
-            d["memories"][name]["base"],
-            d["memories"][name]["size"],
-            d["memories"][name]["type"],
-            )
-    return r
+def get_csr_csv(csr_regions={}, constants={}, mem_regions={}, model=None):
+    if model is None:
+        model = CSRModel(csr_regions, constants, mem_regions)
+    r = [generated_banner("#")]
+    for region in model.regions:
+        r.append(f"csr_base,{region.name},0x{region.origin:08x},,\n")
+    for region in model.regions:
+        for csr in (region.registers or []):
+            r.append(f"csr_register,{region.name}_{csr.name},0x{csr.addr:08x},{csr.nwords},{csr.type}\n")
+    for name, value in model.constants.items():
+        # Same value formatting as the JSON export.
+        value = json.loads(json.dumps(value.lower() if isinstance(value, str) else value))
+        r.append(f"constant,{name.lower()},{value},,\n")
+    for memory in model.memories:
+        r.append(f"memory_region,{memory.name.lower()},0x{memory.base:08x},{memory.size:d},{memory.type:s}\n")
+    return "".join(r)
 
 # SVD Export --------------------------------------------------------------------------------------
 
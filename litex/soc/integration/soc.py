@@ -109,6 +109,11 @@ class SoCBusHandler(LiteXModule):
     supported_standard      = ["wishbone", "axi-lite", "axi"]
     supported_data_width    = [32, 64, 128, 256, 512]
     supported_address_width = [32]
+    supported_interconnect  = {
+        "wishbone" : ["shared", "crossbar", "pipelined", "pipelined-crossbar"],
+        "axi-lite" : ["shared", "crossbar"],
+        "axi"      : ["shared", "crossbar"],
+    }
 
     # Creation -------------------------------------------------------------------------------------
     def __init__(self, name="SoCBusHandler",
@@ -147,6 +152,14 @@ class SoCBusHandler(LiteXModule):
                 colorer(", ".join(str(x) for x in self.supported_address_width))))
             raise SoCError()
 
+        # Check Bus Interconnect.
+        if interconnect not in self.supported_interconnect[standard]:
+            self.logger.error("Unsupported {} {}, supported are: {:s}".format(
+                colorer("Interconnect", color="red"),
+                colorer(interconnect),
+                colorer(", ".join(self.supported_interconnect[standard]))))
+            raise SoCError()
+
         # Create Bus
         self.standard              = standard
         self.data_width            = data_width
@@ -517,6 +530,12 @@ class SoCBusHandler(LiteXModule):
             "axi-lite": axi.AXILiteCrossbar,
             "axi"     : axi.AXICrossbar,
         }[self.standard]
+        interconnect_pipelined_cls = {
+            "wishbone": wishbone.InterconnectPipelined,
+        }.get(self.standard, None)
+        interconnect_pipelined_crossbar_cls = {
+            "wishbone": wishbone.CrossbarPipelined,
+        }.get(self.standard, None)
 
         self._interconnect = None
         if len(self.masters) and len(self.slaves):
@@ -541,14 +560,28 @@ class SoCBusHandler(LiteXModule):
                             raise SoCError()
                 # Interconnect Logic.
                 interconnect_cls = {
-                    "shared"  : interconnect_shared_cls,
-                    "crossbar": interconnect_crossbar_cls,
+                    "shared"             : interconnect_shared_cls,
+                    "crossbar"           : interconnect_crossbar_cls,
+                    "pipelined"          : interconnect_pipelined_cls,
+                    "pipelined-crossbar" : interconnect_pipelined_crossbar_cls,
                 }[self.interconnect]
+                interconnect_kwargs = {}
+                if self.interconnect in ["pipelined", "pipelined-crossbar"]:
+                    # Only read ahead of Classic masters in Cached Regions (IO Regions reads can have
+                    # side effects).
+                    decoders = [r.decoder(self) for r in self.regions.values() if r.cached]
+                    def read_ahead(a):
+                        cached = 0
+                        for decoder in decoders:
+                            cached = cached | decoder(a)
+                        return cached
+                    interconnect_kwargs["read_ahead"] = read_ahead
                 self._interconnect = interconnect_cls(
                     masters        = list(self.masters.values()),
                     slaves         = [(self.regions[n].decoder(self), s) for n, s in self.slaves.items()],
                     register       = self.interconnect_register,
-                    timeout_cycles = self.timeout
+                    timeout_cycles = self.timeout,
+                    **interconnect_kwargs
                 )
             self.logger.info("Interconnect: {} ({} <-> {}).".format(
                 colorer(self._interconnect.__class__.__name__),
@@ -653,9 +686,11 @@ class SoCCSRHandler(SoCLocHandler):
     supported_alignment     = [32]
     supported_paging        = [0x800*2**i for i in range(4)]
     supported_ordering      = ["big", "little"]
+    supported_interconnect  = ["shared", "tree"]
 
     # Creation -------------------------------------------------------------------------------------
-    def __init__(self, data_width=32, address_width=14, alignment=32, paging=0x800, ordering="big", reserved_csrs={}):
+    def __init__(self, data_width=32, address_width=14, alignment=32, paging=0x800, ordering="big",
+        interconnect="shared", interconnect_stages=1, pipelined_bridge=False, reserved_csrs={}):
         SoCLocHandler.__init__(self, "CSR", n_locs=alignment//8*(2**address_width)//paging)
         self.logger = logging.getLogger("SoCCSRHandler")
         self.logger.info("Creating CSR Handler...")
@@ -706,12 +741,23 @@ class SoCCSRHandler(SoCLocHandler):
                 colorer(", ".join("{}".format(x) for x in self.supported_ordering))))
             raise SoCError()
 
+        # Check CSR Interconnect.
+        if interconnect not in self.supported_interconnect:
+            self.logger.error("Unsupported {} {}, supported are: {:s}".format(
+                colorer("Interconnect", color="red"),
+                colorer(interconnect),
+                colorer(", ".join(self.supported_interconnect))))
+            raise SoCError()
+
         # Create CSR Handler.
         self.data_width    = data_width
         self.address_width = address_width
         self.alignment     = alignment
         self.paging        = paging
         self.ordering      = ordering
+        self.interconnect  = interconnect
+        self.interconnect_stages = interconnect_stages
+        self.pipelined_bridge    = pipelined_bridge
         self.masters       = {}
         self.regions       = {}
         self.logger.info("{}-bit CSR Bus, {}-bit Aligned, {}KiB Address Space, {}B Paging, {} Ordering (Up to {} Locations).".format(
@@ -729,6 +775,15 @@ class SoCCSRHandler(SoCLocHandler):
 
         self.logger.info("CSR Handler {}.".format(colorer("created", color="green")))
 
+    # Latency ----------------------------------------------------------------------------------------
+    @property
+    def latency(self):
+        # Extra read latency of the CSR Interconnect (request/response register stages).
+        return {
+            "shared" : 0,
+            "tree"   : 2*self.interconnect_stages,
+        }[self.interconnect]
+
     # Add Master -----------------------------------------------------------------------------------
     def add_master(self, name=None, master=None):
         if name is None:
@@ -773,6 +828,10 @@ class SoCCSRHandler(SoCLocHandler):
             colorer(self.paging),
             colorer(self.ordering),
             colorer(self.n_locs))
+        if self.interconnect != "shared":
+            r += "{} Interconnect ({} cycles read latency).\n".format(
+                colorer(self.interconnect),
+                colorer(self.latency))
         r += SoCLocHandler.__str__(self)
         r = r[:-1]
         return r
@@ -875,6 +934,9 @@ class SoC(LiteXModule, SoCCoreCompat):
         csr_address_width    = 14,
         csr_paging           = 0x800,
         csr_ordering         = "big",
+        csr_interconnect     = "shared",
+        csr_interconnect_stages = 1,
+        csr_pipelined_bridge = False,
         csr_reserved_csrs    = {},
 
         irq_n_irqs           = 32,
@@ -923,6 +985,9 @@ class SoC(LiteXModule, SoCCoreCompat):
             alignment     = 32,
             paging        = csr_paging,
             ordering      = csr_ordering,
+            interconnect  = csr_interconnect,
+            interconnect_stages = csr_interconnect_stages,
+            pipelined_bridge    = csr_pipelined_bridge,
             reserved_csrs = csr_reserved_csrs,
         )
 
@@ -1041,11 +1106,33 @@ class SoC(LiteXModule, SoCCoreCompat):
         }[self.bus.standard]
         csr_bridge_name = f"{name}_bridge"
         self.check_if_exists(csr_bridge_name)
+        csr_bridge_kwargs = {}
+        if self.csr.latency:
+            # Only the Wishbone bridge supports extra CSR read latency.
+            if self.bus.standard != "wishbone":
+                self.logger.error("{} CSR Interconnect {} with {} Bus Standard.".format(
+                    colorer(self.csr.interconnect),
+                    colorer("not supported", color="red"),
+                    colorer(self.bus.standard)))
+                raise SoCError()
+            csr_bridge_kwargs["latency"] = self.csr.latency
+        if self.csr.pipelined_bridge:
+            # Only the Wishbone bridge supports pipelined accesses.
+            if self.bus.standard != "wishbone":
+                self.logger.error("Pipelined CSR Bridge {} with {} Bus Standard.".format(
+                    colorer("not supported", color="red"),
+                    colorer(self.bus.standard)))
+                raise SoCError()
+            csr_bridge_kwargs["pipelined"] = True
+            # Directly connect the pipelined bridge to pipelined interconnects.
+            if self.bus.interconnect in ["pipelined", "pipelined-crossbar"]:
+                csr_bridge_kwargs["bus_wishbone"] = wishbone.Interface(mode="pipelined")
         csr_bridge = csr_bridge_cls(
             bus_csr = csr_bus.Interface(
                 address_width = self.csr.address_width,
                 data_width    = self.csr.data_width),
-            register = register)
+            register = register,
+            **csr_bridge_kwargs)
         self.logger.info("CSR Bridge {} {}.".format(
             colorer(name, color="underline"),
             colorer("added", color="green")))
@@ -1270,11 +1357,20 @@ class SoC(LiteXModule, SoCCoreCompat):
             address_width      = self.csr.address_width,
             alignment          = self.csr.alignment,
             paging             = self.csr.paging,
-            ordering           = self.csr.ordering)
+            ordering           = self.csr.ordering,
+            decode             = (self.csr.interconnect == "shared"))
         if len(self.csr.masters):
-            self.csr_interconnect = csr_bus.InterconnectShared(
-                masters = list(self.csr.masters.values()),
-                slaves  = self.csr_bankarray.get_buses())
+            if self.csr.interconnect == "tree":
+                self.csr_interconnect = csr_bus.InterconnectTree(
+                    masters         = list(self.csr.masters.values()),
+                    slaves          = self.csr_bankarray.get_slaves(),
+                    paging          = self.csr.paging,
+                    request_stages  = self.csr.interconnect_stages,
+                    response_stages = self.csr.interconnect_stages)
+            else:
+                self.csr_interconnect = csr_bus.InterconnectShared(
+                    masters = list(self.csr.masters.values()),
+                    slaves  = self.csr_bankarray.get_buses())
 
         # Add CSRs regions.
         for name, csrs, mapaddr, rmap in self.csr_bankarray.banks:
@@ -1483,7 +1579,7 @@ class LiteXSoC(SoC):
             self.add_constant("UART_POLLING")
 
     # Add UARTbone ---------------------------------------------------------------------------------
-    def add_uartbone(self, name="uartbone", uart_name="serial", clk_freq=None, baudrate=115200, cd="sys"):
+    def add_uartbone(self, name="uartbone", uart_name="serial", clk_freq=None, baudrate=115200, cd="sys", framed=False):
         # Imports.
         from litex.soc.cores import uart
 
@@ -1496,7 +1592,8 @@ class LiteXSoC(SoC):
             phy           = uartbone_phy,
             clk_freq      = clk_freq,
             cd            = cd,
-            address_width = self.bus.address_width)
+            address_width = self.bus.address_width,
+            framed        = framed)
         self.add_module(name=f"{name}_phy", module=uartbone_phy)
         self.add_module(name=name,          module=uartbone)
         self.bus.add_master(name=name, master=uartbone.wishbone)
@@ -1532,6 +1629,9 @@ class LiteXSoC(SoC):
         l2_cache_min_data_width = 128,
         l2_cache_reverse        = False,
         l2_cache_full_memory_we = True,
+        l2_cache_ways           = 1,
+        l2_cache_replacement    = "lru",
+        l2_cache_with_csr       = False,
         **kwargs):
 
         # Imports.
@@ -1687,14 +1787,17 @@ class LiteXSoC(SoC):
             # L2 Cache
             if l2_cache_size != 0:
                 # Insert L2 cache inbetween Wishbone bus and LiteDRAM
-                l2_cache_size = max(l2_cache_size, int(2*port.data_width/8)) # Use minimal size if lower
-                l2_cache_size = 2**int(log2(l2_cache_size))                  # Round to nearest power of 2
+                l2_cache_size = max(l2_cache_size, int(2*l2_cache_ways*port.data_width/8)) # Use minimal size if lower
+                l2_cache_size = 2**int(log2(l2_cache_size))                                # Round to nearest power of 2
                 l2_cache_data_width = max(port.data_width, l2_cache_min_data_width)
                 l2_cache = wishbone.Cache(
-                    cachesize = l2_cache_size//4,
-                    master    = wb_sdram,
-                    slave     = wishbone.Interface(data_width=l2_cache_data_width, address_width=32, addressing="word"),
-                    reverse   = l2_cache_reverse)
+                    cachesize   = l2_cache_size//4,
+                    master      = wb_sdram,
+                    slave       = wishbone.Interface(data_width=l2_cache_data_width, address_width=32, addressing="word"),
+                    reverse     = l2_cache_reverse,
+                    ways        = l2_cache_ways,
+                    replacement = l2_cache_replacement,
+                    with_csr    = l2_cache_with_csr)
                 if l2_cache_full_memory_we:
                     l2_cache = FullMemoryWE()(l2_cache)
                 self.l2_cache = l2_cache
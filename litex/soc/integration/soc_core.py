@@ -87,6 +87,8 @@ class SoCCore(LiteXSoC):
         csr_address_width        = 14,
         csr_paging               = 0x800,
         csr_ordering             = "big",
+        csr_interconnect         = "shared",
+        csr_pipelined_bridge     = False,
 
         # Interrupt parameters
         irq_n_irqs               = 32,
@@ -132,6 +134,8 @@ class SoCCore(LiteXSoC):
             csr_address_width    = csr_address_width,
             csr_paging           = csr_paging,
             csr_ordering         = csr_ordering,
+            csr_interconnect     = csr_interconnect,
+            csr_pipelined_bridge = csr_pipelined_bridge,
             csr_reserved_csrs    = self.csr_map,
 
             irq_n_irqs           = irq_n_irqs,
@@ -292,7 +296,7 @@ def soc_core_args(parser):
     soc_group.add_argument("--bus-address-width", default=32,         type=auto_int, help="Bus address-width.")
     soc_group.add_argument("--bus-timeout",       default=int(1e6),   type=float,    help="Bus timeout in cycles.")
     soc_group.add_argument("--bus-bursting",      action="store_true",               help="Enable burst cycles on the bus if supported.")
-    soc_group.add_argument("--bus-interconnect",  default="shared",                  help="Select bus interconnect: shared (default) or crossbar.")
+    soc_group.add_argument("--bus-interconnect",  default="shared",                  help="Select bus interconnect: shared (default), crossbar, pipelined or pipelined-crossbar.")
 
     # CPU parameters
     soc_group.add_argument("--cpu-type",          default="vexriscv",               help="Select CPU: {}.".format(", ".join(iter(cpu.CPUS.keys()))))
@@ -318,6 +322,8 @@ def soc_core_args(parser):
     soc_group.add_argument("--csr-address-width", default=14,    type=auto_int, help="CSR bus address-width.")
     soc_group.add_argument("--csr-paging",        default=0x800, type=auto_int, help="CSR bus paging.")
     soc_group.add_argument("--csr-ordering",      default="big",                help="CSR registers ordering (big or little).")
+    soc_group.add_argument("--csr-interconnect",  default="shared",             help="Select CSR interconnect: shared (default) or tree (hierarchical/registered).")
+    soc_group.add_argument("--csr-pipelined-bridge", action="store_true",       help="Use pipelined CSR bridge (one access per cycle with a pipelined bus interconnect).")
 
     # Identifier parameters
     soc_group.add_argument("--ident",             default=None,  type=str, help="SoC identifier.")
@@ -467,34 +467,22 @@ def _sort_gathered_items(items):
 
     # Create list of variable items and sort it by DUID.
     # --------------------------------------------------
-    variable_items = []
-    for item in items:
-        if not item.fixed:
-            variable_items.append(item)
-    variable_items = sorted(variable_items, key=lambda x: x.duid)
+    variable_items = sorted([item for item in items if not item.fixed], key=lambda x: x.duid)
 
     # Create list of fixed items:
     # ---------------------------
-    fixed_items = []
-    for item in items:
-        if item.fixed:
-            fixed_items.append(item)
+    fixed_items = [item for item in items if item.fixed]
 
     # Determine items length.
     # -----------------------
-    # Set to length of provided items.
-    items_length = len(items)
-
-    # Eventually extend with fixed items:
-    for item in fixed_items:
-        if item.n > items_length:
-            items_length = (item.n + 1)
+    # Set to length of provided items and eventually extend with fixed items.
+    items_length = max([len(items)] + [item.n + 1 for item in fixed_items])
 
     # Create list of sorted items:
     # ----------------------------
 
     # Create empty list.
-    sorted_items = [None for _ in range(items_length)]
+    sorted_items = [None]*items_length
 
     # Fill fixed items.
     for item in fixed_items:
@@ -504,49 +492,84 @@ def _sort_gathered_items(items):
             raise ValueError(f"CSR conflict on location {item.n} between {csr0} and {csr1}.")
         sorted_items[item.n] = item
 
-    # Fill variable items in empty locations.
-    while len(variable_items):
-        item = variable_items.pop(0)
-        for i in range(items_length):
-            if sorted_items[i] is None:
-                sorted_items[i] = item
-                break
-
-    # Fill remaining location with reserved CSR.
+    # Fill variable items in empty locations (in a single pass) and remaining locations with
+    # reserved CSRs.
+    variable_items = iter(variable_items)
     for i in range(items_length):
         if sorted_items[i] is None:
-            sorted_items[i] = CSR(name=f"reserved{i}")
-
-
-    # Verify all locations are filled.
-    assert None not in sorted_items
+            item = next(variable_items, None)
+            sorted_items[i] = CSR(name=f"reserved{i}") if item is None else item
 
     # Return.
     return sorted_items
 
+# Gathered items are cached on the objects and revalidated on each call: the cache is valid when the
+# object's attributes are unchanged and its children return the same items. Caches built once the
+# object is finalized are frozen.
+
+class _GatherCache:
+    def __init__(self, scan, children, items, frozen):
+        self.scan         = scan
+        self.children     = children
+        self.items        = items
+        self.frozen       = frozen
+        self.sorted_items = None
+
+def _same_items(a, b):
+    return (len(a) == len(b)) and all(x is y for x, y in zip(a, b))
+
+def _gather_scan(obj):
+    # Scan of the object's attributes (shared by the gatherers), re-done when attributes change.
+    signature = [(k, v) for k, v in vars(obj).items() if not k.startswith("_autocsr_")]
+    scan      = obj.__dict__.get("_autocsr_scan", None)
+    if (scan is None or
+        [k for k, v in signature] != [k for k, v in scan[0]] or
+        not _same_items([v for k, v in signature], [v for k, v in scan[0]])):
+        exclude = getattr(obj, "autocsr_exclude", {})
+        scan = obj._autocsr_scan = (signature, [(k, v) for k, v in xdir(obj, True) if k not in exclude])
+    return scan
+
 def _make_gatherer(method, cls, prefix_cb):
-    def gatherer(self, sort=False):
-        try:
-            exclude = self.autocsr_exclude
-        except AttributeError:
-            exclude = {}
+    def gather(self):
+        caches = self.__dict__.setdefault("_autocsr_cache", {})
+        cache  = caches.get(method, None)
+
+        # Return cached items when frozen or still valid.
+        if cache is not None:
+            if cache.frozen:
+                return cache
+            if (_gather_scan(self) is cache.scan and
+                all(_same_items(getattr(v, method)(), items) for v, items in cache.children)):
+                return cache
+
+        # Gather items.
         try:
-            prefixed = self.__prefixed
+            prefixed = self._autocsr_prefixed
         except AttributeError:
-            prefixed = self.__prefixed = set()
-        r = []
-        for k, v in xdir(self, True):
-            if k not in exclude:
-                if isinstance(v, cls):
-                    r.append(v)
-                elif hasattr(v, method) and callable(getattr(v, method)):
-                    items = getattr(v, method)()
-                    prefix_cb(k + "_", items, prefixed)
-                    r += items
+            prefixed = self._autocsr_prefixed = set()
+        scan     = _gather_scan(self)
+        r        = []
+        children = []
+        for k, v in scan[1]:
+            if isinstance(v, cls):
+                r.append(v)
+            elif hasattr(v, method) and callable(getattr(v, method)):
+                items = getattr(v, method)()
+                children.append((v, items))
+                prefix_cb(k + "_", items, prefixed)
+                r += items
         r = sorted(r, key=lambda x: x.duid)
+        cache = caches[method] = _GatherCache(scan, children, r,
+            frozen = self.__dict__.get("finalized", False))
+        return cache
+
+    def gatherer(self, sort=False):
+        cache = gather(self)
         if sort:
-            r = _sort_gathered_items(r)
-        return r
+            if cache.sorted_items is None:
+                cache.sorted_items = _sort_gathered_items(cache.items)
+            return list(cache.sorted_items)
+        return list(cache.items)
     return gatherer
 
 
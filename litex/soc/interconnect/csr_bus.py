@@ -79,10 +79,12 @@ class Interface(Record):
         yield
         yield self.we.eq(0)
 
-    def read(self, adr):
+    def read(self, adr, latency=0):
         yield self.adr.eq(adr)
         yield
         yield
+        for i in range(latency):
+            yield
         return (yield self.dat_r)
 
 # CSR Interconnect ---------------------------------------------------------------------------------
@@ -93,7 +95,10 @@ class Interconnect(Module):
 
 
 class InterconnectShared(Module):
-    def __init__(self, masters, slaves):
+    # reduce_mode selects the reduction of the slaves dat_r ("chain", "tree" or "pipelined"); with
+    # "pipelined", dat_r is returned reduce_stages cycles later (see latency).
+    def __init__(self, masters, slaves, reduce_mode="chain", reduce_stages=1):
+        self.latency = reduce_stages if reduce_mode == "pipelined" else 0
         intermediate = Interface.like(masters[0])
         self.comb += [
             intermediate.adr.eq(  Reduce("OR", [masters[i].adr   for i in range(len(masters))])),
@@ -102,12 +107,90 @@ class InterconnectShared(Module):
         ]
         for i in range(len(masters)):
             self.comb += masters[i].dat_r.eq(intermediate.dat_r)
-        self.comb += intermediate.connect(*slaves)
+        for slave in slaves:
+            self.comb += [
+                slave.adr.eq(intermediate.adr),
+                slave.we.eq(intermediate.we),
+                slave.dat_w.eq(intermediate.dat_w),
+            ]
+        self.comb += intermediate.dat_r.eq(Reduce("OR", [slave.dat_r for slave in slaves],
+            mode   = reduce_mode,
+            stages = reduce_stages,
+            module = self))
+
+
+class InterconnectTree(Module):
+    """Tree-structured CSR Interconnect.
+
+    slaves is a list of (mapaddr, slave) with slave a CSRBank/SRAM created with decode=False. Slaves
+    are grouped by address prefix (2**group_bits locations per group) and the one-hot slave select
+    is decoded once from the masters' address. Requests (adr/we/dat_w/select) are registered
+    request_stages times for each group and the groups' dat_r are reduced over response_stages
+    register stages: Reads are returned latency cycles later than with InterconnectShared.
+    """
+    def __init__(self, masters, slaves, paging=0x800, group_bits=3, request_stages=1, response_stages=1):
+        self.latency = request_stages + response_stages
+        aligned_paging = paging//4
+        intermediate   = Interface.like(masters[0])
+        self.comb += [
+            intermediate.adr.eq(  Reduce("OR", [masters[i].adr   for i in range(len(masters))])),
+            intermediate.we.eq(   Reduce("OR", [masters[i].we    for i in range(len(masters))])),
+            intermediate.dat_w.eq(Reduce("OR", [masters[i].dat_w for i in range(len(masters))]))
+        ]
+        for i in range(len(masters)):
+            self.comb += masters[i].dat_r.eq(intermediate.dat_r)
+
+        # Group slaves by address prefix.
+        location = intermediate.adr[log2_int(aligned_paging):]
+        groups   = {}
+        for mapaddr, slave in slaves:
+            groups.setdefault(mapaddr >> group_bits, []).append((mapaddr, slave))
+
+        groups_dat_r = []
+        for prefix, group in sorted(groups.items()):
+            # Decode one-hot slave select (group prefix, then location in group).
+            group_sel = Signal()
+            sel       = Signal(len(group))
+            self.comb += group_sel.eq(location[group_bits:] == prefix)
+            for i, (mapaddr, slave) in enumerate(group):
+                offset = mapaddr & (2**group_bits - 1)
+                self.comb += sel[i].eq(group_sel & ((location[:group_bits] == offset) if group_bits else 1))
+
+            # Register requests.
+            adr, we, dat_w = intermediate.adr, intermediate.we, intermediate.dat_w
+            for n in range(request_stages):
+                adr_r   = Signal.like(adr)
+                we_r    = Signal()
+                dat_w_r = Signal.like(dat_w)
+                sel_r   = Signal(len(group))
+                self.sync += [
+                    adr_r.eq(adr),
+                    we_r.eq(we),
+                    dat_w_r.eq(dat_w),
+                    sel_r.eq(sel),
+                ]
+                adr, we, dat_w, sel = adr_r, we_r, dat_w_r, sel_r
+
+            # Connect group's slaves.
+            for i, (mapaddr, slave) in enumerate(group):
+                self.comb += [
+                    slave.bus.adr.eq(adr),
+                    slave.bus.we.eq(we),
+                    slave.bus.dat_w.eq(dat_w),
+                    slave.sel.eq(sel[i]),
+                ]
+
+            # Reduce group's dat_r.
+            groups_dat_r.append(Reduce("OR", [slave.bus.dat_r for mapaddr, slave in group],
+                mode   = "pipelined" if response_stages else "tree",
+                stages = response_stages,
+                module = self))
+        self.comb += intermediate.dat_r.eq(Reduce("OR", groups_dat_r))
 
 # CSR SRAM -----------------------------------------------------------------------------------------
 
 class SRAM(Module):
-    def __init__(self, mem_or_size, address, read_only=None, init=None, bus=None, paging=0x800):
+    def __init__(self, mem_or_size, address, read_only=None, init=None, bus=None, paging=0x800, decode=True):
         if bus is None:
             bus = Interface()
         self.bus = bus
@@ -137,10 +220,11 @@ class SRAM(Module):
         port = mem.get_port(write_capable=not read_only)
         self.specials += mem, port
 
-        sel = Signal()
+        self.sel = sel = Signal()
         sel_r = Signal()
         self.sync += sel_r.eq(sel)
-        self.comb += sel.eq(self.bus.adr[log2_int(aligned_paging):] == address)
+        if decode:
+            self.comb += sel.eq(self.bus.adr[log2_int(aligned_paging):] == address)
 
         if word_bits:
             word_index    = Signal(word_bits, reset_less=True)
@@ -186,7 +270,7 @@ class SRAM(Module):
 # CSR Bank -----------------------------------------------------------------------------------------
 
 class CSRBank(csr.GenericBank):
-    def __init__(self, description, address=0, bus=None, paging=0x800, ordering="big"):
+    def __init__(self, description, address=0, bus=None, paging=0x800, ordering="big", decode=True):
         if bus is None:
             bus = Interface()
         self.bus = bus
@@ -200,8 +284,10 @@ class CSRBank(csr.GenericBank):
             ordering    = ordering,
         )
 
-        sel = Signal()
-        self.comb += sel.eq(self.bus.adr[log2_int(aligned_paging):] == address)
+        # Bank select (decoded from address or driven by the interconnect when decode=False).
+        self.sel = sel = Signal()
+        if decode:
+            self.comb += sel.eq(self.bus.adr[log2_int(aligned_paging):] == address)
 
         for i, c in enumerate(self.simple_csrs):
             self.comb += [
@@ -227,11 +313,12 @@ class CSRBank(csr.GenericBank):
 # scan(), so it can have side effects.
 
 class CSRBankArray(Module):
-    def __init__(self, source, address_map, *ifargs, paging=0x800, ordering="big", **ifkwargs):
+    def __init__(self, source, address_map, *ifargs, paging=0x800, ordering="big", decode=True, **ifkwargs):
         self.source             = source
         self.address_map        = address_map
         self.paging             = paging
         self.ordering           = ordering
+        self.decode             = decode
         self.scan(ifargs, ifkwargs)
 
     def scan(self, ifargs, ifkwargs):
@@ -267,7 +354,8 @@ class CSRBankArray(Module):
                     mmap = SRAM(memory, mapaddr,
                         read_only = read_only,
                         bus       = sram_bus,
-                        paging    = self.paging)
+                        paging    = self.paging,
+                        decode    = self.decode)
                     self.submodules += mmap
                     csrs += mmap.get_csrs()
                     self.srams.append((name, memory, mapaddr, mmap))
@@ -293,7 +381,8 @@ class CSRBankArray(Module):
                 rmap = CSRBank(csrs, mapaddr,
                     bus                = bank_bus,
                     paging             = self.paging,
-                    ordering           = self.ordering)
+                    ordering           = self.ordering,
+                    decode             = self.decode)
                 self.submodules += rmap
                 self.banks.append((name, csrs, mapaddr, rmap))
 
@@ -305,3 +394,7 @@ class CSRBankArray(Module):
 
     def get_buses(self):
         return [i.bus for i in self.get_rmaps() + self.get_mmaps()]
+
+    def get_slaves(self):
+        return ([(mapaddr, rmap) for name, csrs,   mapaddr, rmap in self.banks] +
+                [(mapaddr, mmap) for name, memory, mapaddr, mmap in self.srams])
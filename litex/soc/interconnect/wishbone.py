@@ -10,10 +10,13 @@
 """Wishbone Classic support for LiteX (Standard HandShaking/Synchronous Feedback)"""
 
 from math import log2
+from functools import reduce
+from operator import and_
 
 from migen import *
 from migen.genlib import roundrobin
 from migen.genlib.record import *
+from migen.genlib.fifo import SyncFIFO
 
 from litex.gen import *
 from litex.gen.genlib.misc import split, displacer, chooser, WaitTimer
@@ -38,6 +41,11 @@ _layout = [
     ("err",              1, DIR_S_TO_M)
 ]
 
+# Pipelined mode (Wishbone B4): Slave accepts a request when stb & ~stall, acks it later (in order).
+_layout_pipelined = _layout + [
+    ("stall",            1, DIR_S_TO_M)
+]
+
 CTI_BURST_NONE         = 0b000
 CTI_BURST_CONSTANT     = 0b001
 CTI_BURST_INCREMENTING = 0b010
@@ -45,7 +53,7 @@ CTI_BURST_END          = 0b111
 
 
 class Interface(Record):
-    def __init__(self, data_width=32, adr_width=30, bursting=False, addressing="word", **kwargs):
+    def __init__(self, data_width=32, adr_width=30, bursting=False, addressing="word", mode="classic", **kwargs):
         self.data_width = data_width
         if kwargs.get("address_width", False):
             # FIXME: Improve or switch Wishbone to byte addressing instead of word addressing.
@@ -55,7 +63,10 @@ class Interface(Record):
         self.bursting      = bursting
         assert addressing in ["word", "byte"]
         self.addressing    = addressing
-        Record.__init__(self, set_layout_parameters(_layout,
+        assert mode in ["classic", "pipelined"]
+        self.mode          = mode
+        layout = {"classic": _layout, "pipelined": _layout_pipelined}[mode]
+        Record.__init__(self, set_layout_parameters(layout,
             adr_width  = self.adr_width,
             data_width = self.data_width,
             sel_width  = self.data_width//8,
@@ -67,12 +78,17 @@ class Interface(Record):
 
     @staticmethod
     def like(other):
-        return Interface(data_width=other.data_width, address_width=other.address_width, addressing=other.addressing)
+        return Interface(data_width=other.data_width, address_width=other.address_width, addressing=other.addressing, mode=other.mode)
 
     def _do_transaction(self):
         yield self.cyc.eq(1)
         yield self.stb.eq(1)
         yield
+        if self.mode == "pipelined":
+            while (yield self.stall):
+                yield
+            yield self.stb.eq(0)
+            yield
         while not (yield self.ack):
             yield
         yield self.cyc.eq(0)
@@ -129,15 +145,18 @@ class Interface(Record):
 # Wishbone Timeout ---------------------------------------------------------------------------------
 
 class Timeout(LiteXModule):
-    def __init__(self, master, cycles):
+    def __init__(self, master, cycles, pending=None):
         self.error = Signal()
 
         # # #
 
+        # Wait on the current access (Classic) or on the pending requests (Pipelined).
+        waiting = master.stb if pending is None else (pending != 0)
+
         timer = WaitTimer(cycles)
         self.submodules += timer
         self.comb += [
-            timer.wait.eq(master.stb & master.cyc & ~master.ack),
+            timer.wait.eq(waiting & master.cyc & ~master.ack),
             If(timer.done,
                 master.dat_r.eq((2**len(master.dat_w))-1),
                 master.ack.eq(1),
@@ -173,19 +192,21 @@ class Arbiter(LiteXModule):
         self.rr = roundrobin.RoundRobin(len(masters))
 
         # mux master->slave signals
-        for name, size, direction in _layout:
+        for name, size, direction in target.layout:
             if direction == DIR_M_TO_S:
                 choices = Array(getattr(m, name) for m in masters)
                 self.comb += getattr(target, name).eq(choices[self.rr.grant])
 
         # connect slave->master signals
-        for name, size, direction in _layout:
+        for name, size, direction in target.layout:
             if direction == DIR_S_TO_M:
                 source = getattr(target, name)
                 for i, m in enumerate(masters):
                     dest = getattr(m, name)
                     if name == "ack" or name == "err":
                         self.comb += dest.eq(source & (self.rr.grant == i))
+                    elif name == "stall":
+                        self.comb += dest.eq(source | (self.rr.grant != i))
                     else:
                         self.comb += dest.eq(source)
 
@@ -201,10 +222,14 @@ class Decoder(LiteXModule):
     # 1) wishbone.Slave reference.
     # register adds flip-flops after the address comparators. Improves timing,
     # but breaks Wishbone combinatorial feedback.
-    def __init__(self, master, slaves, register=False):
+    # reduce_mode selects the reduction of the slaves responses ("chain", "tree" or "pipelined"); with
+    # "pipelined", responses are returned reduce_stages cycles later and slaves are not strobed
+    # while their responses are in flight.
+    def __init__(self, master, slaves, register=False, reduce_mode="chain", reduce_stages=1):
         ns = len(slaves)
         slave_sel = Signal(ns)
         slave_sel_r = Signal(ns)
+        pipelined = (reduce_mode == "pipelined")
 
         # decode slave addresses
         self.comb += [slave_sel[i].eq(fun(master.adr))
@@ -214,40 +239,48 @@ class Decoder(LiteXModule):
         else:
             self.comb += slave_sel_r.eq(slave_sel)
 
-        # connect master->slaves signals except cyc
+        # connect master->slaves signals except cyc (and stb when pipelined)
         for slave in slaves:
             for name, size, direction in _layout:
-                if direction == DIR_M_TO_S and name != "cyc":
+                if direction == DIR_M_TO_S and name != "cyc" and not (pipelined and name == "stb"):
                     self.comb += getattr(slave[1], name).eq(getattr(master, name))
 
+        # block slaves strobes while their responses are in the reduction pipeline
+        if pipelined:
+            for slave in slaves:
+                in_flight = Signal(reduce_stages)
+                self.sync += in_flight.eq(Cat(slave[1].ack | slave[1].err, in_flight))
+                self.comb += slave[1].stb.eq(master.stb & (in_flight == 0))
+
         # combine cyc with slave selection signals
         self.comb += [slave[1].cyc.eq(master.cyc & slave_sel[i])
             for i, slave in enumerate(slaves)]
 
         # generate master ack (resp. err) by ORing all slave acks (resp. errs)
+        reduce_kwargs = dict(mode=reduce_mode, stages=reduce_stages, module=self)
         self.comb += [
-            master.ack.eq(Reduce("OR", [slave[1].ack for slave in slaves])),
-            master.err.eq(Reduce("OR", [slave[1].err for slave in slaves]))
+            master.ack.eq(Reduce("OR", [slave[1].ack for slave in slaves], **reduce_kwargs)),
+            master.err.eq(Reduce("OR", [slave[1].err for slave in slaves], **reduce_kwargs))
         ]
 
         # mux (1-hot) slave data return
         masked = [Replicate(slave_sel_r[i], len(master.dat_r)) & slaves[i][1].dat_r for i in range(ns)]
-        self.comb += master.dat_r.eq(Reduce("OR", masked))
+        self.comb += master.dat_r.eq(Reduce("OR", masked, **reduce_kwargs))
 
 
 class InterconnectShared(LiteXModule):
-    def __init__(self, masters, slaves, register=False, timeout_cycles=1e6):
+    def __init__(self, masters, slaves, register=False, timeout_cycles=1e6, reduce_mode="chain", reduce_stages=1):
         data_width = get_check_parameters(ports=masters + [s for _, s in slaves])
         adr_width = max([m.adr_width for m in masters])
         shared = Interface(data_width=data_width, adr_width=adr_width)
         self.arbiter = Arbiter(masters, shared)
-        self.decoder = Decoder(shared, slaves, register)
+        self.decoder = Decoder(shared, slaves, register, reduce_mode=reduce_mode, reduce_stages=reduce_stages)
         if timeout_cycles is not None:
             self.timeout = Timeout(shared, timeout_cycles)
 
 
 class Crossbar(LiteXModule):
-    def __init__(self, masters, slaves, register=False, timeout_cycles=1e6):
+    def __init__(self, masters, slaves, register=False, timeout_cycles=1e6, reduce_mode="chain", reduce_stages=1):
         data_width = get_check_parameters(ports=masters + [s for _, s in slaves])
         matches, busses = zip(*slaves)
         adr_width = max([m.adr_width for m in masters])
@@ -255,7 +288,303 @@ class Crossbar(LiteXModule):
         # decode each master into its access row
         for row, master in zip(access, masters):
             row = list(zip(matches, row))
-            self.submodules += Decoder(master, row, register)
+            self.submodules += Decoder(master, row, register, reduce_mode=reduce_mode, reduce_stages=reduce_stages)
+        # arbitrate each access column onto its slave
+        for column, bus in zip(zip(*access), busses):
+            self.submodules += Arbiter(column, bus)
+
+
+# Wishbone Pipelined Interconnect ------------------------------------------------------------------
+
+class Classic2Pipelined(LiteXModule):
+    """Classic to Pipelined Wishbone bridge.
+
+    Single accesses are forwarded one at a time. When enabled with read_ahead (a function of the
+    address returning if reads can be issued ahead there, ex for memories without read side effects),
+    incrementing read bursts (CTI) are issued ahead of the master (up to max_pending requests) while
+    within read_ahead addresses, responses are buffered and returned to the master as long as it
+    follows the burst; reads issued ahead past the end of the burst are discarded. Without read_ahead
+    (default), bursts are forwarded as single accesses.
+    """
+    def __init__(self, master, slave, max_pending=4, read_ahead=None):
+        assert master.mode == "classic"
+        assert slave.mode  == "pipelined"
+        data_width = len(master.dat_r)
+        if read_ahead is None:
+            read_ahead = lambda a: False
+
+        # # #
+
+        # Signals.
+        issue      = Signal()
+        response   = Signal()
+        burst_read = Signal()
+        issue_ok   = Signal()
+        issue_adr  = Signal(len(master.adr))
+        head_adr   = Signal(len(master.adr))
+        inflight   = Signal(max=max_pending + 1)
+
+        # Burst responses FIFO (data + err).
+        self.fifo = fifo = SyncFIFO(data_width + 1, max_pending)
+
+        self.comb += [
+            issue.eq(slave.cyc & slave.stb & ~slave.stall),
+            response.eq(slave.ack | slave.err),
+            burst_read.eq(~master.we & (master.cti == CTI_BURST_INCREMENTING) & (master.bte == 0) &
+                read_ahead(master.adr)),
+            issue_ok.eq(read_ahead(issue_adr)),
+            slave.dat_w.eq(master.dat_w),
+            slave.sel.eq(master.sel),
+            slave.we.eq(master.we),
+            slave.bte.eq(master.bte),
+            fifo.din.eq(Cat(slave.dat_r, slave.err)),
+        ]
+        self.sync += inflight.eq(inflight + issue - response)
+
+        # FSM.
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            slave.cyc.eq(master.cyc),
+            slave.adr.eq(master.adr),
+            slave.cti.eq(master.cti),
+            If(master.cyc & master.stb,
+                slave.stb.eq(1),
+                If(burst_read,
+                    slave.cti.eq(CTI_BURST_INCREMENTING),
+                    NextValue(issue_adr, master.adr + Cat(~slave.stall, Replicate(0, len(issue_adr) - 1))),
+                    NextValue(head_adr,  master.adr),
+                    NextState("BURST")
+                ).Else(
+                    If(~slave.stall,
+                        NextState("SINGLE")
+                    )
+                )
+            )
+        )
+        fsm.act("SINGLE",
+            slave.cyc.eq(1),
+            master.ack.eq(slave.ack),
+            master.err.eq(slave.err),
+            master.dat_r.eq(slave.dat_r),
+            If(response,
+                NextState("IDLE")
+            )
+        )
+        fsm.act("BURST",
+            slave.cyc.eq(1),
+            slave.stb.eq(issue_ok & ((inflight + fifo.level) < max_pending)),
+            slave.adr.eq(issue_adr),
+            slave.cti.eq(CTI_BURST_INCREMENTING),
+            If(issue,
+                NextValue(issue_adr, issue_adr + 1)
+            ),
+            fifo.we.eq(response),
+            master.dat_r.eq(fifo.dout[:data_width]),
+            If(master.cyc & master.stb,
+                # Master follows the burst: return buffered responses.
+                If(~master.we & (master.adr == head_adr) &
+                   ((master.cti == CTI_BURST_INCREMENTING) | (master.cti == CTI_BURST_END)),
+                    master.ack.eq(fifo.readable & ~fifo.dout[-1]),
+                    master.err.eq(fifo.readable &  fifo.dout[-1]),
+                    fifo.re.eq(1),
+                    If(fifo.readable,
+                        NextValue(head_adr, head_adr + 1),
+                        If(master.cti == CTI_BURST_END,
+                            NextState("DRAIN")
+                        )
+                    # Burst leaves read_ahead addresses: continue with single accesses.
+                    ).Elif((inflight == 0) & ~issue_ok,
+                        NextState("DRAIN")
+                    )
+                # Master leaves the burst.
+                ).Else(
+                    NextState("DRAIN")
+                )
+            ).Elif(~master.cyc,
+                NextState("DRAIN")
+            )
+        )
+        fsm.act("DRAIN",
+            slave.cyc.eq(inflight != 0),
+            fifo.re.eq(1),
+            If((inflight == 0) & ~fifo.readable,
+                NextState("IDLE")
+            )
+        )
+
+
+class Pipelined2Classic(LiteXModule):
+    """Pipelined to Classic Wishbone bridge.
+
+    Requests are registered and presented to the Classic slave one at a time; the next request is
+    accepted when the current one is acked, so consecutive requests of a burst are presented
+    back-to-back (CTI/BTE are forwarded).
+    """
+    def __init__(self, master, slave):
+        assert master.mode == "pipelined"
+        assert slave.mode  == "classic"
+
+        # # #
+
+        valid    = Signal()
+        accept   = Signal()
+        response = Signal()
+
+        # Note: ack/err are only qualified by the presented request (burst capable slaves can
+        # generate an extra ack when stb is released).
+        self.comb += [
+            response.eq(valid & (slave.ack | slave.err)),
+            master.stall.eq(valid & ~response),
+            accept.eq(master.cyc & master.stb & ~master.stall),
+            slave.cyc.eq(valid),
+            slave.stb.eq(valid),
+            master.ack.eq(valid & slave.ack),
+            master.err.eq(valid & slave.err),
+            master.dat_r.eq(slave.dat_r),
+        ]
+        self.sync += [
+            If(accept,
+                valid.eq(1),
+                slave.adr.eq(master.adr),
+                slave.dat_w.eq(master.dat_w),
+                slave.sel.eq(master.sel),
+                slave.we.eq(master.we),
+                slave.cti.eq(master.cti),
+                slave.bte.eq(master.bte),
+            ).Elif(response,
+                valid.eq(0)
+            )
+        ]
+
+
+class PipelinedDecoder(LiteXModule):
+    # slaves is a list of pairs (see Decoder), slaves are Pipelined interfaces.
+    # Up to max_pending requests can be pending, all to the same slave (responses are then returned
+    # in order); the master is stalled when switching to another slave until responses are received.
+    # register adds flip-flops on the requests to the slaves.
+    def __init__(self, master, slaves, register=False, max_pending=4):
+        ns = len(slaves)
+        slave_sel   = Signal(ns)
+        slave_sel_r = Signal(ns)
+        block       = Signal()
+        accept      = Signal()
+        response    = Signal()
+        ready       = Signal()
+        self.pending = pending = Signal(max=max_pending + 1)
+
+        # decode slave addresses
+        self.comb += [slave_sel[i].eq(fun(master.adr))
+            for i, (fun, bus) in enumerate(slaves)]
+
+        # pending requests tracking
+        self.comb += [
+            block.eq((pending == max_pending) | ((pending != 0) & (slave_sel != slave_sel_r))),
+            accept.eq(master.cyc & master.stb & ~master.stall),
+            response.eq(master.ack | master.err),
+        ]
+        self.sync += [
+            If(accept, slave_sel_r.eq(slave_sel)),
+            pending.eq(pending + accept - response),
+        ]
+
+        # connect master->slaves signals (direct or registered)
+        if register:
+            valid = Signal()
+            self.comb += [
+                ready.eq(~valid | ~Reduce("OR", [slave_sel_r[i] & slave.stall
+                    for i, (fun, slave) in enumerate(slaves)])),
+                master.stall.eq(block | ~ready),
+            ]
+            self.sync += If(ready, valid.eq(accept))
+            for name, size, direction in _layout:
+                if direction == DIR_M_TO_S and name not in ["cyc", "stb"]:
+                    r = Signal.like(getattr(master, name))
+                    self.sync += If(accept, r.eq(getattr(master, name)))
+                    self.comb += [getattr(slave, name).eq(r) for fun, slave in slaves]
+            for i, (fun, slave) in enumerate(slaves):
+                self.comb += [
+                    slave.cyc.eq(master.cyc & slave_sel_r[i] & (pending != 0)),
+                    slave.stb.eq(valid & slave_sel_r[i]),
+                ]
+        else:
+            self.comb += master.stall.eq(block | Reduce("OR", [slave_sel[i] & slave.stall
+                for i, (fun, slave) in enumerate(slaves)]))
+            for i, (fun, slave) in enumerate(slaves):
+                for name, size, direction in _layout:
+                    if direction == DIR_M_TO_S and name not in ["cyc", "stb"]:
+                        self.comb += getattr(slave, name).eq(getattr(master, name))
+                self.comb += [
+                    slave.cyc.eq(master.cyc & (slave_sel[i] | (slave_sel_r[i] & (pending != 0)))),
+                    slave.stb.eq(master.stb & slave_sel[i] & ~block),
+                ]
+
+        # generate master ack (resp. err) by ORing all slave acks (resp. errs)
+        self.comb += [
+            master.ack.eq(Reduce("OR", [slave[1].ack for slave in slaves])),
+            master.err.eq(Reduce("OR", [slave[1].err for slave in slaves]))
+        ]
+
+        # mux (1-hot) slave data return (from the slave of the pending requests)
+        masked = [Replicate(slave_sel_r[i], len(master.dat_r)) & slaves[i][1].dat_r for i in range(ns)]
+        self.comb += master.dat_r.eq(Reduce("OR", masked))
+
+
+def add_pipelined_bridges(module, masters, slaves, max_pending=4, read_ahead=None):
+    # Bridge Classic masters/slaves to Pipelined ones (Pipelined ones are returned unchanged), Classic
+    # masters only read ahead at read_ahead addresses (see Classic2Pipelined).
+    def pipelined(bus):
+        return Interface(data_width=bus.data_width, adr_width=bus.adr_width, mode="pipelined")
+    pipelined_masters = []
+    for master in masters:
+        if master.mode == "classic":
+            pipelined_master = pipelined(master)
+            module.submodules += Classic2Pipelined(master, pipelined_master, max_pending, read_ahead)
+            master = pipelined_master
+        pipelined_masters.append(master)
+    pipelined_slaves = []
+    for fun, slave in slaves:
+        if slave.mode == "classic":
+            pipelined_slave = pipelined(slave)
+            module.submodules += Pipelined2Classic(pipelined_slave, slave)
+            slave = pipelined_slave
+        pipelined_slaves.append((fun, slave))
+    return pipelined_masters, pipelined_slaves
+
+
+class InterconnectPipelined(LiteXModule):
+    """Pipelined Wishbone Interconnect.
+
+    Shared Pipelined (Wishbone B4) bus with multiple pending requests. Classic masters/slaves are
+    bridged (Classic2Pipelined/Pipelined2Classic), Pipelined ones are directly connected.
+    """
+    def __init__(self, masters, slaves, register=False, timeout_cycles=1e6, max_pending=4, read_ahead=None):
+        data_width = get_check_parameters(ports=masters + [s for _, s in slaves])
+        adr_width = max([m.adr_width for m in masters])
+        shared = Interface(data_width=data_width, adr_width=adr_width, mode="pipelined")
+        masters, slaves = add_pipelined_bridges(self, masters, slaves, max_pending, read_ahead)
+
+        self.arbiter = Arbiter(masters, shared)
+        self.decoder = PipelinedDecoder(shared, slaves, register, max_pending)
+        if timeout_cycles is not None:
+            self.timeout = Timeout(shared, timeout_cycles, pending=self.decoder.pending)
+
+
+class CrossbarPipelined(LiteXModule):
+    """Pipelined Wishbone Crossbar.
+
+    Crossbar version of InterconnectPipelined: masters accessing different slaves are served
+    concurrently.
+    """
+    def __init__(self, masters, slaves, register=False, timeout_cycles=1e6, max_pending=4, read_ahead=None):
+        data_width = get_check_parameters(ports=masters + [s for _, s in slaves])
+        adr_width = max([m.adr_width for m in masters])
+        masters, slaves = add_pipelined_bridges(self, masters, slaves, max_pending, read_ahead)
+        matches, busses = zip(*slaves)
+        access = [[Interface(data_width=data_width, adr_width=adr_width, mode="pipelined") for j in slaves] for i in masters]
+        # decode each master into its access row
+        for row, master in zip(access, masters):
+            row = list(zip(matches, row))
+            self.submodules += PipelinedDecoder(master, row, register, max_pending)
         # arbitrate each access column onto its slave
         for column, bus in zip(zip(*access), busses):
             self.submodules += Arbiter(column, bus)
@@ -420,7 +749,10 @@ class SRAM(Module): # FIXME: Switch to LiteXModule.
         # Burst support.
         # --------------
 
-        if self.bus.bursting:
+        # Only for Classic cycles (Pipelined requests provide each address).
+        bursting = self.bus.bursting and (self.bus.mode == "classic")
+
+        if bursting:
             adr_wrap_mask = Array((0b0000, 0b0011, 0b0111, 0b1111))
             adr_wrap_max  = adr_wrap_mask[-1].bit_length()
 
@@ -498,7 +830,7 @@ class SRAM(Module): # FIXME: Switch to LiteXModule.
                 for i in range(bus_data_width//8)]
         # Address and data
         self.comb += port.adr.eq(self.bus.adr[:len(port.adr)])
-        if self.bus.bursting:
+        if bursting:
             self.comb += If(adr_burst & adr_latched,
                 port.adr.eq(adr_next[:len(port.adr)]),
             )
@@ -510,15 +842,29 @@ class SRAM(Module): # FIXME: Switch to LiteXModule.
             self.comb += port.dat_w.eq(self.bus.dat_w)
 
         # Generate Ack.
-        self.sync += [
-            self.bus.ack.eq(0),
-            If(self.bus.cyc & self.bus.stb & (~self.bus.ack | adr_burst), self.bus.ack.eq(1))
-        ]
+        if self.bus.mode == "pipelined":
+            # Pipelined: accept a request every cycle and ack it on the next one.
+            self.comb += self.bus.stall.eq(0)
+            self.sync += self.bus.ack.eq(self.bus.cyc & self.bus.stb)
+        else:
+            self.sync += [
+                self.bus.ack.eq(0),
+                If(self.bus.cyc & self.bus.stb & (~self.bus.ack | adr_burst), self.bus.ack.eq(1))
+            ]
 
 # Wishbone To CSR ----------------------------------------------------------------------------------
 
 class Wishbone2CSR(LiteXModule):
-    def __init__(self, bus_wishbone=None, bus_csr=None, register=True):
+    """Wishbone to CSR bridge.
+
+    latency adds wait cycles on reads for CSR interconnects with extra read latency.
+
+    With pipelined, accesses are issued to the CSR bus on each cycle and acked after the fixed CSR
+    read latency (register adds a register stage on the requests). Pipelined Wishbone buses get one
+    access per cycle; Classic ones one access at a time. Accesses are never issued ahead of the
+    master since CSR reads can have side effects (ex FIFO reads).
+    """
+    def __init__(self, bus_wishbone=None, bus_csr=None, register=True, latency=0, pipelined=False):
         self.csr = bus_csr
         if self.csr is None:
             # If no CSR bus provided, create it with default parameters.
@@ -535,8 +881,50 @@ class Wishbone2CSR(LiteXModule):
             "byte" : log2_int(self.wishbone.data_width//8),
         }[self.wishbone.addressing]
 
+        # Read latency.
+        count = Signal(max=max(latency, 2))
+        wait  = [NextValue(count, latency - 1), NextState("WAIT")] if latency else [NextState("ACK")]
+
+        # Pipelined Access.
+        if pipelined:
+            depth = int(register) + 1 + latency
+            bus   = self.wishbone
+
+            # Requests (one per cycle on Pipelined buses, one at a time on Classic ones).
+            accept = Signal()
+            if bus.mode == "classic":
+                busy = Signal()
+                self.sync += If(accept, busy.eq(1)).Elif(bus.ack, busy.eq(0))
+                self.comb += accept.eq(bus.cyc & bus.stb & ~busy)
+            else:
+                self.comb += [
+                    bus.stall.eq(0),
+                    accept.eq(bus.cyc & bus.stb),
+                ]
+            requests = [
+                self.csr.dat_w.eq(bus.dat_w),
+                self.csr.adr.eq(0),
+                self.csr.we.eq(0),
+                If(accept,
+                    self.csr.adr.eq(bus.adr[wishbone_adr_shift:]),
+                    self.csr.we.eq(bus.we & (bus.sel != 0))
+                )
+            ]
+            if register:
+                self.sync += requests
+            else:
+                self.comb += requests
+
+            # Responses (after the fixed CSR read latency).
+            valid = Signal(depth)
+            self.sync += valid.eq(Cat(accept, valid))
+            self.comb += [
+                bus.ack.eq(valid[-1]),
+                bus.dat_r.eq(self.csr.dat_r),
+            ]
+
         # Registered Access.
-        if register:
+        elif register:
             self.fsm = fsm = FSM(reset_state="IDLE")
             fsm.act("IDLE",
                 NextValue(self.csr.dat_w, self.wishbone.dat_w),
@@ -549,7 +937,7 @@ class Wishbone2CSR(LiteXModule):
             fsm.act("WRITE-READ",
                 NextValue(self.csr.adr, 0),
                 NextValue(self.csr.we, 0),
-                NextState("ACK")
+                *wait
             )
             fsm.act("ACK",
                 self.wishbone.ack.eq(1),
@@ -564,7 +952,7 @@ class Wishbone2CSR(LiteXModule):
                 If(self.wishbone.cyc & self.wishbone.stb,
                     self.csr.adr.eq(self.wishbone.adr[wishbone_adr_shift:]),
                     self.csr.we.eq(self.wishbone.we & (self.wishbone.sel != 0)),
-                    NextState("ACK")
+                    *wait
                 )
             )
             fsm.act("ACK",
@@ -572,6 +960,13 @@ class Wishbone2CSR(LiteXModule):
                 self.wishbone.dat_r.eq(self.csr.dat_r),
                 NextState("WRITE-READ")
             )
+        if latency and not pipelined:
+            fsm.act("WAIT",
+                NextValue(count, count - 1),
+                If(count == 0,
+                    NextState("ACK")
+                )
+            )
 
 # Wishbone Cache -----------------------------------------------------------------------------------
 
@@ -579,9 +974,18 @@ class Cache(LiteXModule):
     """Cache
 
     This module is a write-back wishbone cache that can be used as a L2 cache.
-    Cachesize (in 32-bit words) is the size of the data store and must be a power of 2
+    Cachesize (in 32-bit words) is the size of the data store and must be a power of 2.
+
+    The cache is direct-mapped by default and N-way set-associative with ways > 1: the victim is the
+    first invalid way of the set or is selected by the replacement policy ("lru", "plru" (tree
+    pseudo-LRU) or "random"). Lines spanning multiple slave words are evicted/refilled with
+    incrementing bursts when the slave is bursting. With with_write_buffer, dirty victims are moved
+    to a write buffer that is written back to the slave after the refill while hits are served. With
+    with_csr, hits/misses/evictions counters are exposed over CSRs.
     """
-    def __init__(self, cachesize, master, slave, reverse=True):
+    def __init__(self, cachesize, master, slave, reverse=True, ways=1, replacement="lru",
+        with_write_buffer = False,
+        with_csr          = False):
         self.master = master
         self.slave  = slave
 
@@ -593,21 +997,49 @@ class Cache(LiteXModule):
             raise ValueError("Slave data width must be a multiple of {dw}".format(dw=dw_from))
         if dw_to < dw_from and (dw_from % dw_to) != 0:
             raise ValueError("Master data width must be a multiple of {dw}".format(dw=dw_to))
+        if replacement not in ["lru", "plru", "random"]:
+            raise ValueError("Unsupported replacement policy: {}".format(replacement))
 
         # Split address:
-        # TAG | LINE NUMBER | LINE OFFSET
+        # TAG | SET NUMBER | LINE OFFSET
         offsetbits = log2_int(max(dw_to//dw_from, 1))
         addressbits = len(slave.adr) + offsetbits
         linebits = log2_int(cachesize) - offsetbits
-        tagbits = addressbits - linebits
+        waybits = log2_int(ways)
+        setbits = linebits - waybits
+        if setbits < 1:
+            raise ValueError("Cachesize too small for {} ways".format(ways))
+        tagbits = addressbits - setbits
         wordbits = log2_int(max(dw_from//dw_to, 1))
-        adr_offset, adr_line, adr_tag = split(master.adr, offsetbits, linebits, tagbits)
+        adr_offset, adr_set, adr_tag = split(master.adr, offsetbits, setbits, tagbits)
         word = Signal(wordbits) if wordbits else None
 
-        # Data memory
-        data_mem = Memory(dw_to*2**wordbits, 2**linebits)
-        data_port = data_mem.get_port(write_capable=True, we_granularity=8)
-        self.specials += data_mem, data_port
+        # Slave bursts (when a line spans multiple slave words).
+        burst = slave.bursting and (wordbits > 0)
+
+        # Way selection: hit way (or victim on a miss) when testing hit, victim when evicting/refilling.
+        way      = Signal(max=max(ways, 2))
+        hit_way  = Signal(max=max(ways, 2))
+        victim   = Signal(max=max(ways, 2))
+        victim_r = Signal(max=max(ways, 2))
+
+        # Data memories
+        data_ports = []
+        for i in range(ways):
+            data_mem = Memory(dw_to*2**wordbits, 2**setbits, name=f"data_mem{i}")
+            data_port = data_mem.get_port(write_capable=True, we_granularity=8)
+            self.specials += data_mem, data_port
+            data_ports.append(data_port)
+        data_dat_r = Signal(dw_to*2**wordbits)
+        data_dat_w = Signal(dw_to*2**wordbits)
+        data_we    = Signal(len(data_ports[0].we))
+        self.comb += data_dat_r.eq(Array(port.dat_r for port in data_ports)[way])
+        for i, data_port in enumerate(data_ports):
+            self.comb += [
+                data_port.adr.eq(adr_set),
+                data_port.dat_w.eq(data_dat_w),
+                If(way == i, data_port.we.eq(data_we)),
+            ]
 
         write_from_slave = Signal()
         if adr_offset is None:
@@ -617,42 +1049,99 @@ class Cache(LiteXModule):
             self.sync += adr_offset_r.eq(adr_offset)
 
         self.comb += [
-            data_port.adr.eq(adr_line),
             If(write_from_slave,
-                displacer(slave.dat_r, word, data_port.dat_w),
-                displacer(Replicate(1, dw_to//8), word, data_port.we)
+                displacer(slave.dat_r, word, data_dat_w),
+                displacer(Replicate(1, dw_to//8), word, data_we)
             ).Else(
-                data_port.dat_w.eq(Replicate(master.dat_w, max(dw_to//dw_from, 1))),
+                data_dat_w.eq(Replicate(master.dat_w, max(dw_to//dw_from, 1))),
                 If(master.cyc & master.stb & master.we & master.ack,
-                    displacer(master.sel, adr_offset, data_port.we, 2**offsetbits, reverse=reverse)
+                    displacer(master.sel, adr_offset, data_we, 2**offsetbits, reverse=reverse)
                 )
             ),
-            chooser(data_port.dat_r, word, slave.dat_w),
             slave.sel.eq(2**(dw_to//8)-1),
-            chooser(data_port.dat_r, adr_offset_r, master.dat_r, reverse=reverse)
+            chooser(data_dat_r, adr_offset_r, master.dat_r, reverse=reverse)
         ]
 
-
-        # Tag memory
-        tag_layout = [("tag", tagbits), ("dirty", 1)]
-        tag_mem = Memory(layout_len(tag_layout), 2**linebits)
-        tag_port = tag_mem.get_port(write_capable=True)
-        self.specials += tag_mem, tag_port
-        tag_do = Record(tag_layout)
-        tag_di = Record(tag_layout)
-        self.comb += [
-            tag_do.raw_bits().eq(tag_port.dat_r),
-            tag_port.dat_w.eq(tag_di.raw_bits())
-        ]
+        # Tag memories
+        tag_layout = [("tag", tagbits), ("dirty", 1), ("valid", 1)]
+        tag_dos = []
+        tag_we  = Signal()
+        tag_di  = Record(tag_layout)
+        for i in range(ways):
+            tag_mem = Memory(layout_len(tag_layout), 2**setbits, name=f"tag_mem{i}")
+            tag_port = tag_mem.get_port(write_capable=True)
+            self.specials += tag_mem, tag_port
+            tag_do = Record(tag_layout)
+            self.comb += [
+                tag_do.raw_bits().eq(tag_port.dat_r),
+                tag_port.adr.eq(adr_set),
+                tag_port.dat_w.eq(tag_di.raw_bits()),
+                tag_port.we.eq(tag_we & (way == i)),
+            ]
+            tag_dos.append(tag_do)
 
         self.comb += [
-            tag_port.adr.eq(adr_line),
-            tag_di.tag.eq(adr_tag)
+            tag_di.tag.eq(adr_tag),
+            tag_di.valid.eq(1),
         ]
+        way_tag = Signal(tagbits)
+        self.comb += way_tag.eq(Array(tag_do.tag for tag_do in tag_dos)[way])
         if word is not None:
-            self.comb += slave.adr.eq(Cat(word, adr_line, tag_do.tag))
+            slave_adr = Cat(word, adr_set, way_tag)
         else:
-            self.comb += slave.adr.eq(Cat(adr_line, tag_do.tag))
+            slave_adr = Cat(adr_set, way_tag)
+
+        # Hit detection
+        hit = Signal()
+        hits = Signal(ways)
+        for i, tag_do in enumerate(tag_dos):
+            self.comb += hits[i].eq(tag_do.valid & (tag_do.tag == adr_tag))
+            self.comb += If(hits[i], hit_way.eq(i))
+        self.comb += hit.eq(hits != 0)
+
+        # Replacement: victim selection (first invalid way of the set or replacement policy) and
+        # replacement state update on hits.
+        repl_touch = Signal()
+        if ways > 1:
+            if replacement == "random":
+                repl_counter = Signal(waybits)
+                self.sync += repl_counter.eq(repl_counter + 1)
+                self.comb += victim.eq(repl_counter)
+            else:
+                if replacement == "plru":
+                    # Binary tree, a node bit pointing to the subtree to replace (0: left, 1: right).
+                    repl_bits = ways - 1
+                    def path(w):
+                        for level in range(waybits):
+                            node = 2**level - 1 + (w >> (waybits - level))
+                            yield node, (w >> (waybits - level - 1)) & 1
+                    def victim_cond(state, w):
+                        return reduce(and_, [state[node] == bit for node, bit in path(w)])
+                    def touch(state, w):
+                        return [state[node].eq(1 - bit) for node, bit in path(w)]
+                else:
+                    # Pairwise age matrix, a bit set when way i has been used more recently than way j (i < j).
+                    pairs = [(i, j) for i in range(ways) for j in range(i + 1, ways)]
+                    repl_bits = len(pairs)
+                    def victim_cond(state, w):
+                        return reduce(and_, [state[n] == (i != w) for n, (i, j) in enumerate(pairs) if w in (i, j)])
+                    def touch(state, w):
+                        return [state[n].eq(i == w) for n, (i, j) in enumerate(pairs) if w in (i, j)]
+                repl_mem = Memory(repl_bits, 2**setbits, name="repl_mem")
+                repl_port = repl_mem.get_port(write_capable=True)
+                self.specials += repl_mem, repl_port
+                self.comb += [
+                    repl_port.adr.eq(adr_set),
+                    repl_port.dat_w.eq(repl_port.dat_r),
+                    Case(hit_way, {w: touch(repl_port.dat_w, w) for w in range(ways)}),
+                    repl_port.we.eq(repl_touch),
+                ]
+                for w in reversed(range(ways)):
+                    self.comb += If(victim_cond(repl_port.dat_r, w), victim.eq(w))
+            for w in reversed(range(ways)):
+                self.comb += If(~tag_dos[w].valid, victim.eq(w))
+        victim_do = Record(tag_layout)
+        self.comb += victim_do.raw_bits().eq(Array(tag_do.raw_bits() for tag_do in tag_dos)[victim])
 
         # slave word computation, word_clr and word_inc will be simplified
         # at synthesis when wordbits=0
@@ -672,7 +1161,39 @@ class Cache(LiteXModule):
             else:
                 return 1
 
+        # Write buffer: dirty victim line written back to the slave while hits are served (misses
+        # wait for the write buffer to be empty).
+        wbuf_load   = Signal()
+        wbuf_valid  = Signal()
+        wbuf_active = Signal()
+        if with_write_buffer:
+            wbuf_data = Signal(dw_to*2**wordbits)
+            wbuf_adr  = Signal(len(slave.adr))
+            wbuf_word = Signal(wordbits) if wordbits else None
+            wbuf_done = Signal()
+            if word is not None:
+                victim_adr = Cat(Replicate(0, wordbits), adr_set, victim_do.tag)
+            else:
+                victim_adr = Cat(adr_set, victim_do.tag)
+            self.sync += [
+                If(wbuf_load,
+                    wbuf_valid.eq(1),
+                    wbuf_data.eq(Array(port.dat_r for port in data_ports)[victim]),
+                    wbuf_adr.eq(victim_adr),
+                ).Elif(wbuf_done,
+                    wbuf_valid.eq(0),
+                )
+            ]
+            if wbuf_word is not None:
+                self.sync += \
+                    If(wbuf_load,
+                        wbuf_word.eq(0)
+                    ).Elif(wbuf_active & slave.ack,
+                        wbuf_word.eq(wbuf_word + 1)
+                    )
+
         # Control FSM
+        refilled = Signal()
         self.fsm = fsm = FSM(reset_state="IDLE")
         fsm.act("IDLE",
             If(master.cyc & master.stb,
@@ -681,20 +1202,31 @@ class Cache(LiteXModule):
         )
         fsm.act("TEST_HIT",
             word_clr.eq(1),
-            If(tag_do.tag == adr_tag,
+            If(hit,
                 master.ack.eq(1),
+                repl_touch.eq(1),
                 If(master.we,
                     tag_di.dirty.eq(1),
-                    tag_port.we.eq(1)
+                    tag_we.eq(1)
                 ),
+                NextValue(refilled, 0),
                 NextState("IDLE")
-            ).Else(
-                If(tag_do.dirty,
-                    NextState("EVICT")
+            ).Elif(~wbuf_valid,
+                NextValue(victim_r, victim),
+                If(victim_do.valid & victim_do.dirty,
+                    *([
+                        # Move the victim to the write buffer and write the tag to set the slave address
+                        wbuf_load.eq(1),
+                        tag_we.eq(1),
+                        NextValue(refilled, 1),
+                        NextState("REFILL")
+                    ] if with_write_buffer else [
+                        NextState("EVICT")
+                    ])
                 ).Else(
                     # Write the tag first to set the slave address
-                    tag_port.we.eq(1),
-                    word_clr.eq(1),
+                    tag_we.eq(1),
+                    NextValue(refilled, 1),
                     NextState("REFILL")
                 )
             )
@@ -708,8 +1240,9 @@ class Cache(LiteXModule):
                 word_inc.eq(1),
                  If(word_is_last(word),
                     # Write the tag first to set the slave address
-                    tag_port.we.eq(1),
+                    tag_we.eq(1),
                     word_clr.eq(1),
+                    NextValue(refilled, 1),
                     NextState("REFILL")
                 )
             )
@@ -728,3 +1261,55 @@ class Cache(LiteXModule):
                 )
             )
         )
+        self.comb += [
+            If(fsm.ongoing("TEST_HIT"),
+                way.eq(Mux(hit, hit_way, victim))
+            ).Else(
+                way.eq(victim_r)
+            ),
+            slave.adr.eq(slave_adr),
+            chooser(data_dat_r, word, slave.dat_w),
+        ]
+        if burst:
+            self.comb += slave.cti.eq(Mux(word_is_last(word), CTI_BURST_END, CTI_BURST_INCREMENTING))
+
+        # Write buffer write back (when the slave is not used by the FSM).
+        if with_write_buffer:
+            self.comb += wbuf_active.eq(wbuf_valid & ~fsm.ongoing("EVICT") & ~fsm.ongoing("REFILL"))
+            self.comb += If(wbuf_active,
+                slave.stb.eq(1),
+                slave.cyc.eq(1),
+                slave.we.eq(1),
+                slave.adr.eq(wbuf_adr if wbuf_word is None else (wbuf_adr | wbuf_word)),
+                chooser(wbuf_data, wbuf_word, slave.dat_w),
+                wbuf_done.eq(slave.ack & word_is_last(wbuf_word)),
+            )
+            if burst:
+                self.comb += If(wbuf_active,
+                    slave.cti.eq(Mux(word_is_last(wbuf_word), CTI_BURST_END, CTI_BURST_INCREMENTING))
+                )
+
+        # Statistics
+        self.hit      = Signal()
+        self.miss     = Signal()
+        self.eviction = Signal()
+        self.comb += [
+            self.hit.eq(fsm.ongoing("TEST_HIT") & hit & ~refilled),
+            self.miss.eq(fsm.ongoing("TEST_HIT") & ~hit & ~wbuf_valid),
+            self.eviction.eq(self.miss & victim_do.valid & victim_do.dirty),
+        ]
+        if with_csr:
+            self.add_csr()
+
+    def add_csr(self):
+        self._hits      = csr.CSRStatus(32, name="hits",      description="Number of cache hits.")
+        self._misses    = csr.CSRStatus(32, name="misses",    description="Number of cache misses.")
+        self._evictions = csr.CSRStatus(32, name="evictions", description="Number of dirty lines evictions.")
+
+        # # #
+
+        self.sync += [
+            If(self.hit,      self._hits.status.eq(self._hits.status + 1)),
+            If(self.miss,     self._misses.status.eq(self._misses.status + 1)),
+            If(self.eviction, self._evictions.status.eq(self._evictions.status + 1)),
+        ]
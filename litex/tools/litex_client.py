@@ -9,15 +9,133 @@
 
 import os
 import time
+import collections
 import threading
 import argparse
 import socket
 
-from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
-from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+from litex.tools.remote.etherbone import EtherboneCodec, EtherboneCodecRecord
 from litex.tools.remote.etherbone import EtherboneIPC
 from litex.tools.remote.csr_builder import CSRBuilder
 
+# Remote Batch -------------------------------------------------------------------------------------
+
+class RemoteBatchRead:
+    """Result of a batched read, available once the batch has been flushed."""
+    def __init__(self, batch, length, decode=None):
+        self.batch  = batch
+        self.length = length
+        self.decode = decode
+        self.datas  = []
+
+    @property
+    def done(self):
+        return len(self.datas) == (1 if self.length is None else self.length)
+
+    def result(self):
+        if not self.done:
+            self.batch.flush()
+        if self.decode is not None:
+            return self.decode(self.datas)
+        return self.datas[0] if self.length is None else self.datas
+
+
+class RemoteBatch:
+    """Batch of reads/writes to arbitrary addresses, sent in bulk to the RemoteServer.
+
+    Accesses are collected in Etherbone records (up to 255 reads to arbitrary addresses and/or a
+    burst of 255 writes per record, in order) and sent on flush (or on exit of the with block),
+    with up to max_inflight read records awaiting their response. Reads return RemoteBatchRead
+    results.
+
+    Example:
+        with bus.batch() as batch:
+            values = [batch.read(addr) for addr in addrs]
+        print([value.result() for value in values])
+    """
+    max_length = 255
+
+    def __init__(self, bus, max_inflight=16):
+        self.bus          = bus
+        self.max_inflight = max_inflight
+        self.records      = [] # List of (record, [(RemoteBatchRead, count)]).
+
+    def _get_record(self, reads=0, writes=0, write_addr=None):
+        # Return the last record if the access can be appended to it, else a new one.
+        if self.records:
+            record, results = self.records[-1]
+            nreads  = len(record.reads)
+            nwrites = len(record.writes)
+            if writes:
+                # Writes are done before the reads of a record and must be contiguous.
+                if (nreads == 0 and nwrites != 0 and
+                    write_addr == record.base_addr + 4*nwrites and
+                    nwrites + writes <= self.max_length):
+                    return record, results
+            elif nreads + reads <= self.max_length:
+                return record, results
+        record = EtherboneCodecRecord(base_addr=write_addr, writes=[], reads=[])
+        self.records.append((record, []))
+        return self.records[-1]
+
+    def read(self, addr, length=None, burst="incr", decode=None):
+        result     = RemoteBatchRead(self, length, decode)
+        length_int = 1 if length is None else length
+        incr       = (burst == "incr")
+        addrs      = [self.bus.base_address + addr + 4*incr*j for j in range(length_int)]
+        while addrs:
+            record, results = self._get_record(reads=1)
+            count = min(len(addrs), self.max_length - len(record.reads))
+            record.reads.extend(addrs[:count])
+            results.append((result, count))
+            addrs = addrs[count:]
+        return result
+
+    def read_register(self, register):
+        if register.mode not in ["rw", "ro"]:
+            raise KeyError(register.name + "register not readable")
+        return self.read(register.addr, length=register.length, decode=register.decode)
+
+    def write(self, addr, datas):
+        datas = datas if isinstance(datas, list) else [datas]
+        addr  = self.bus.base_address + addr
+        for data in datas:
+            record, results = self._get_record(writes=1, write_addr=addr)
+            record.writes.append(data)
+            addr += 4
+
+    def _receive(self, results):
+        addr_size = self.bus.csr_bus_address_width // 8
+        records   = self.bus.codec.decode(self.bus.receive_packet(self.bus.socket, addr_size))
+        datas     = records[-1].writes.tolist()
+        for result, count in results:
+            result.datas += datas[:count]
+            datas = datas[count:]
+
+    def flush(self):
+        records, self.records = self.records, []
+        inflight = collections.deque()
+        buf      = bytearray()
+        for record, results in records:
+            buf += self.bus.codec.encode([record])
+            if results:
+                inflight.append(results)
+            # Send and wait for the oldest response when the window is full.
+            if len(inflight) >= self.max_inflight:
+                self.bus.socket.sendall(buf)
+                buf = bytearray()
+                self._receive(inflight.popleft())
+        self.bus.socket.sendall(buf)
+        while inflight:
+            self._receive(inflight.popleft())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
 # Remote Client ------------------------------------------------------------------------------------
 
 class RemoteClient(EtherboneIPC, CSRBuilder):
@@ -46,7 +164,7 @@ class RemoteClient(EtherboneIPC, CSRBuilder):
         info = str(self.socket.recv(128))
 
         # With LitePCIe, CSRs are translated to 0 to limit BAR0 size, so also translate base address.
-        if "CommPCIe" in info:
+        if "CommPCIe" in info and hasattr(self, "mems"):
             self.base_address = -self.mems.csr.base
 
     def open(self):
@@ -54,6 +172,7 @@ class RemoteClient(EtherboneIPC, CSRBuilder):
             return
         self.socket = socket.create_connection((self.host, self.port), 5.0)
         self.socket.settimeout(5.0)
+        self.codec  = EtherboneCodec(self.csr_bus_address_width)
         self._receive_server_info()
         self.binded = True
 
@@ -67,53 +186,32 @@ class RemoteClient(EtherboneIPC, CSRBuilder):
     def read(self, addr, length=None, burst="incr"):
         length_int = 1 if length is None else length
         addr_size  = self.csr_bus_address_width // 8
-        # Prepare packet
-        record = EtherboneRecord(addr_size)
-        incr = (burst == "incr")
-        record.reads  = EtherboneReads(
-            addr_size = addr_size,
-            addrs     = [self.base_address + addr + 4*incr*j for j in range(length_int)]
-        )
-        record.rcount = len(record.reads)
-
-        # Send packet
-        packet = EtherbonePacket(self.csr_bus_address_width)
-        packet.records = [record]
-        packet.encode()
-        self.send_packet(self.socket, packet)
-
-        # Receive response
-        packet = EtherbonePacket(
-            addr_width = self.csr_bus_address_width,
-            init       = self.receive_packet(self.socket, addr_size)
-        )
-        packet.decode()
-        datas = packet.records.pop().writes.get_datas()
+        # Send request.
+        incr   = (burst == "incr")
+        record = EtherboneCodecRecord(reads=[self.base_address + addr + 4*incr*j for j in range(length_int)])
+        self.socket.sendall(self.codec.encode([record]))
+
+        # Receive response.
+        records = self.codec.decode(self.receive_packet(self.socket, addr_size))
+        datas   = records[-1].writes.tolist()
         if self.debug:
             for i, data in enumerate(datas):
                 print("read 0x{:08x} @ 0x{:08x}".format(data, self.base_address + addr + 4*i))
         return datas[0] if length is None else datas
 
     def write(self, addr, datas):
-        datas = datas if isinstance(datas, list) else [datas]
-        addr_size = self.csr_bus_address_width // 8
-        record = EtherboneRecord(addr_size)
-        record.writes = EtherboneWrites(
-            base_addr = self.base_address + addr,
-            addr_size = addr_size,
-            datas     = [d for d in datas]
-        )
-        record.wcount = len(record.writes)
-
-        packet = EtherbonePacket(self.csr_bus_address_width)
-        packet.records = [record]
-        packet.encode()
-        self.send_packet(self.socket, packet)
+        datas  = datas if isinstance(datas, list) else [datas]
+        record = EtherboneCodecRecord(base_addr=self.base_address + addr, writes=datas)
+        self.socket.sendall(self.codec.encode([record]))
 
         if self.debug:
             for i, data in enumerate(datas):
                 print("write 0x{:08x} @ 0x{:08x}".format(data, self.base_address + addr + 4*i))
 
+    def batch(self, max_inflight=16):
+        """Return a RemoteBatch to do many reads/writes with a few round trips."""
+        return RemoteBatch(self, max_inflight=max_inflight)
+
 # Utils --------------------------------------------------------------------------------------------
 
 def reg2addr(host, csr_csv, reg):
@@ -143,13 +241,18 @@ def dump_registers(host, csr_csv, port, filter=None, binary=False):
     bus = RemoteClient(host=host, csr_csv=csr_csv, port=port)
     bus.open()
 
-    for name, register in bus.regs.__dict__.items():
-        if (filter is None) or filter in name:
-            register_value = {
-                True  : f"0b{register.read():032b}",
-                False : f"0x{register.read():08x}",
-            }[binary]
-            print("0x{:08x} : {} {}".format(register.addr, register_value, name))
+    with bus.batch() as batch:
+        values = {name: batch.read_register(register)
+            for name, register in bus.regs.__dict__.items()
+            if ((filter is None) or filter in name) and register.mode in ["rw", "ro"]}
+
+    for name, value in values.items():
+        register = getattr(bus.regs, name)
+        register_value = {
+            True  : f"0b{value.result():032b}",
+            False : f"0x{value.result():08x}",
+        }[binary]
+        print("0x{:08x} : {} {}".format(register.addr, register_value, name))
 
     bus.close()
 
@@ -157,10 +260,13 @@ def read_memory(host, csr_csv, port, addr, length, binary=False):
     bus = RemoteClient(host=host, csr_csv=csr_csv, port=port)
     bus.open()
 
-    for offset in range(length//4):
+    with bus.batch() as batch:
+        values = batch.read(addr, length//4)
+
+    for offset, value in enumerate(values.result()):
         register_value = {
-            True  : f"0b{bus.read(addr + 4*offset):032b}",
-            False : f"0x{bus.read(addr + 4*offset):08x}",
+            True  : f"0b{value:032b}",
+            False : f"0x{value:08x}",
         }[binary]
         print(f"0x{addr + 4*offset:08x} : {register_value}")
 
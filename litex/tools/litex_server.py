@@ -12,11 +12,16 @@ import argparse
 
 import os
 import sys
+import queue
 import socket
+import selectors
 import time
+import warnings
 import threading
 
-from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneWrites
+from array import array
+
+from litex.tools.remote.etherbone import EtherboneCodec, EtherboneCodecRecord
 from litex.tools.remote.etherbone import EtherboneIPC
 
 # Read Merger --------------------------------------------------------------------------------------
@@ -67,15 +72,90 @@ def _read_merger(addrs, max_length=256, bursts=["incr", "fixed"]):
             burst_type   = "incr"
     yield (burst_base, burst_length, burst_type)
 
+# Remote Server Stats ------------------------------------------------------------------------------
+
+class RemoteClientStats:
+    """Per-client statistics: served requests, read/written words and request latencies."""
+    def __init__(self, name):
+        self.name          = name
+        self.start         = time.monotonic()
+        self.requests      = 0
+        self.reads         = 0
+        self.writes        = 0
+        self.latency_total = 0.0
+        self.latency_max   = 0.0
+
+    def update(self, reads, writes, latency):
+        self.requests      += 1
+        self.reads         += reads
+        self.writes        += writes
+        self.latency_total += latency
+        self.latency_max    = max(self.latency_max, latency)
+
+    @property
+    def latency_avg(self):
+        return self.latency_total/self.requests if self.requests else 0.0
+
+    @property
+    def throughput(self):
+        # Read/written words per second since connection.
+        elapsed = time.monotonic() - self.start
+        return (self.reads + self.writes)/elapsed if elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return "{}: {} requests / {} reads / {} writes / latency avg: {:.3f}ms max: {:.3f}ms / {:.0f} words/s".format(
+            self.name, self.requests, self.reads, self.writes,
+            self.latency_avg*1e3, self.latency_max*1e3, self.throughput)
+
 # Remote Server ------------------------------------------------------------------------------------
 
+class _RemoteServerClient:
+    def __init__(self, socket, name):
+        self.socket = socket
+        self.name   = name
+        self.buffer = bytearray()
+        self.output = bytearray()
+        self.lock   = threading.Lock()
+        self.stats  = RemoteClientStats(name)
+        self.closed = False
+
+
+class _RemoteServerRequest:
+    def __init__(self, client, record, timestamp):
+        self.client    = client
+        self.record    = record
+        self.timestamp = timestamp
+
+
 class RemoteServer(EtherboneIPC):
-    def __init__(self, comm, bind_ip, bind_port=1234, addr_width=32):
+    """Etherbone server sharing a comm (UART, UDP, PCIe, USB...) between several clients.
+
+    Clients are served by a selector-based thread that receives their Etherbone packets and queues
+    the requests. A comm thread serves the queued requests in batches: writes are done in order and
+    reads from consecutive requests (from any client) are merged in bursts with _read_merger.
+    Responses are sent without blocking: what can't be sent directly is kept in a per-client output
+    buffer flushed by the selector thread, so a stalled client does not stall the others.
+    """
+    def __init__(self, comm, bind_ip, bind_port=1234, addr_width=32, max_batch=64):
         self.comm       = comm
         self.bind_ip    = bind_ip
         self.bind_port  = bind_port
-        self.lock       = False
         self.addr_width = addr_width
+        self.max_batch  = max_batch
+        self.codec      = EtherboneCodec(addr_width)
+        self.requests   = queue.Queue()
+        self.clients    = {}
+        self.flushes    = queue.Queue()
+
+        # Read merging capabilities of the comm.
+        self.read_max_length = {
+            "CommUART": 256,
+            "CommUDP":  255,
+            "CommPCIe": 65536,
+        }.get(comm.__class__.__name__, 1)
+        self.read_bursts = {
+            "CommUART": ["incr", "fixed"]
+        }.get(comm.__class__.__name__, ["incr"])
 
     def open(self):
         if hasattr(self, "socket"):
@@ -86,16 +166,40 @@ class RemoteServer(EtherboneIPC):
         if hasattr(socket, "SO_REUSEPORT"):
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.socket.bind((self.bind_ip, self.bind_port))
+        self.bind_port = self.socket.getsockname()[1]
         print("tcp port: {:d}".format(self.bind_port))
-        self.socket.listen(1)
+        self.socket.listen(16)
+        self.socket.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        # Wakeup of the selector thread when a client has responses to flush.
+        self.wakeup_socket, self.wakeup_notify = socket.socketpair()
+        self.wakeup_socket.setblocking(False)
+        self.wakeup_notify.setblocking(False)
+        self.selector.register(self.wakeup_socket, selectors.EVENT_READ)
         self.comm.open()
 
     def close(self):
+        if hasattr(self, "serve_thread"):
+            self.stop_event.set()
+            self.requests.put(None)
+            self.serve_thread.join()
+            self.comm_thread.join()
+            del self.serve_thread, self.comm_thread
         self.comm.close()
         if not hasattr(self, "socket"):
             return
+        for client in list(self.clients.values()):
+            self._disconnect(client)
+        self.selector.close()
+        self.wakeup_socket.close()
+        self.wakeup_notify.close()
         self.socket.close()
-        del self.socket
+        del self.socket, self.wakeup_socket, self.wakeup_notify
+
+    def get_stats(self):
+        """Return the statistics of the connected clients."""
+        return [client.stats for client in list(self.clients.values())]
 
     def _send_server_info(self, client_socket):
         # FIXME: Formalize info/improve.
@@ -106,74 +210,224 @@ class RemoteServer(EtherboneIPC):
         info = ":".join(info)
         client_socket.sendall(bytes(info, "UTF-8"))
 
-    def _serve_thread(self):
-        while True:
+    # Clients (Serve Thread).
+
+    def _connect(self):
+        try:
             client_socket, addr = self.socket.accept()
-            self._send_server_info(client_socket)
-            print("Connected with " + addr[0] + ":" + str(addr[1]))
+        except BlockingIOError:
+            return
+        client_socket.setblocking(True)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._send_server_info(client_socket)
+        client_socket.setblocking(False)
+        print("Connected with " + addr[0] + ":" + str(addr[1]))
+        client = _RemoteServerClient(client_socket, f"{addr[0]}:{addr[1]}")
+        self.clients[client_socket] = client
+        self.selector.register(client_socket, selectors.EVENT_READ, client)
+
+    def _disconnect(self, client):
+        if client.closed:
+            return
+        client.closed = True
+        print(f"Disconnect ({client.stats})")
+        self.clients.pop(client.socket, None)
+        self.selector.unregister(client.socket)
+        with client.lock:
+            client.output.clear()
+            client.socket.close()
+
+    def _receive(self, client):
+        try:
+            data = client.socket.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if len(data) == 0:
+            self._disconnect(client)
+            return
+        client.buffer += data
+
+        # Queue the requests of all complete packets.
+        addr_size = self.addr_width // 8
+        timestamp = time.monotonic()
+        while len(client.buffer) >= self.header_length:
+            packet_size = self.get_packet_size(client.buffer, addr_size)
+            if len(client.buffer) < packet_size:
+                break
+            records = self.codec.decode(client.buffer, 0, packet_size)
+            del client.buffer[:packet_size]
+            for record in records:
+                self.requests.put(_RemoteServerRequest(client, record, timestamp))
+
+    def _send(self, client):
+        # Send the buffered responses of a client (without blocking), return True when all sent.
+        with client.lock:
+            if client.closed:
+                return True
+            try:
+                sent = client.socket.send(client.output)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                # Disconnection is detected on receive.
+                sent = len(client.output)
+            del client.output[:sent]
+            return len(client.output) == 0
+
+    def _flush(self, client):
+        if client.closed:
+            return
+        events = selectors.EVENT_READ
+        if not self._send(client):
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(client.socket, events, client)
+
+    def _wakeup(self):
+        try:
+            while self.wakeup_socket.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                self._flush(self.flushes.get_nowait())
+            except queue.Empty:
+                break
+
+    def _serve_thread(self):
+        while not self.stop_event.is_set():
+            for key, mask in self.selector.select(timeout=0.1):
+                if key.fileobj is self.socket:
+                    self._connect()
+                elif key.fileobj is self.wakeup_socket:
+                    self._wakeup()
+                else:
+                    if mask & selectors.EVENT_WRITE:
+                        self._flush(key.data)
+                    if mask & selectors.EVENT_READ:
+                        self._receive(key.data)
+
+    # Hardware Accesses (Comm Thread).
+
+    def _respond(self, request, datas):
+        client = request.client
+        record = EtherboneCodecRecord(base_addr=request.record.base_ret_addr, writes=datas)
+        packet = self.codec.encode([record])
+        client.stats.update(
+            reads   = len(datas),
+            writes  = 0 if request.record.writes is None else len(request.record.writes),
+            latency = time.monotonic() - request.timestamp)
+        with client.lock:
+            if client.closed:
+                return
+            # Send directly when nothing is pending, otherwise keep it for the selector thread.
+            if not client.output:
+                try:
+                    packet = packet[client.socket.send(packet):]
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    return
+            if not packet:
+                return
+            pending = bool(client.output)
+            client.output += packet
+        # Register the client for write events (from the selector thread).
+        if not pending:
+            self.flushes.put(client)
+            try:
+                self.wakeup_notify.send(b"\x00")
+            except BlockingIOError:
+                pass
+
+    def _serve_reads(self, requests):
+        if not requests:
+            return
+        # Merge the reads of all the requests and dispatch the results to each request.
+        # Comms with block accesses (CommPCIe) are read directly from the BAR (32-bit word accesses).
+        addrs = [addr for request in requests for addr in request.record.reads]
+        # Comms with pipelined reads (CommUART) get all the bursts at once.
+        datas  = array("I")
+        block  = hasattr(self.comm, "read_block")
+        bursts = list(_read_merger(addrs,
+            max_length = self.read_max_length,
+            bursts     = self.read_bursts))
+        if hasattr(self.comm, "read_pipelined"):
+            for burst_datas in self.comm.read_pipelined(bursts):
+                datas.extend(burst_datas)
+        else:
+            for addr, length, burst in bursts:
+                if block and (burst == "incr"):
+                    datas.extend(self.comm.read_block(addr, length)[:])
+                else:
+                    datas.extend(self.comm.read(addr, length, burst))
+        offset = 0
+        for request in requests:
+            length = len(request.record.reads)
+            self._respond(request, datas[offset:offset + length])
+            offset += length
+
+    def _serve_requests(self, requests):
+        pending_reads = []
+        for request in requests:
+            record = request.record
+
+            # Handle Etherbone writes (after the pending reads, to preserve accesses ordering).
+            if record.writes is not None:
+                self._serve_reads(pending_reads)
+                pending_reads = []
+                if hasattr(self.comm, "write_block"):
+                    self.comm.write_block(record.base_addr, record.writes)
+                else:
+                    self.comm.write(record.base_addr, record.writes.tolist())
+
+            # Handle Etherbone reads (merged with the following requests' reads).
+            if record.reads is not None:
+                pending_reads.append(request)
+            else:
+                request.client.stats.update(
+                    reads   = 0,
+                    writes  = len(record.writes),
+                    latency = time.monotonic() - request.timestamp)
+        self._serve_reads(pending_reads)
+
+    def _comm_thread(self):
+        running = True
+        while running:
+            # Get the queued requests (blocking on the first one).
+            requests = [self.requests.get()]
+            while len(requests) < self.max_batch:
+                try:
+                    requests.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            if None in requests:
+                running  = False
+                requests = requests[:requests.index(None)]
             try:
-                # Serve Etherbone reads/writes.
-                while True:
-                    # Receive packet.
+                self._serve_requests(requests)
+            except Exception as e:
+                # Drop the clients of the failed requests (disconnected by the serve thread).
+                print(f"Error: {e!r}")
+                for request in requests:
                     try:
-                        packet = self.receive_packet(client_socket, self.addr_width // 8)
-                        if packet == 0:
-                            break
-                    except:
-                        break
-                    # Decode Packet.
-                    packet = EtherbonePacket(self.addr_width, packet)
-                    packet.decode()
-
-                    # Get Packet's Record.
-                    record = packet.records.pop()
-
-                    # Hardware lock/reservation.
-                    while self.lock:
-                        time.sleep(0.01)
-                    self.lock = True
-
-                    # Handle Etherbone writes.
-                    if record.writes != None:
-                        self.comm.write(record.writes.base_addr, record.writes.get_datas())
-
-                    # Handle Etherbone reads.
-                    if record.reads != None:
-                        max_length = {
-                            "CommUART": 256,
-                            "CommUDP":    1,
-                        }.get(self.comm.__class__.__name__, 1)
-                        bursts = {
-                            "CommUART": ["incr", "fixed"]
-                        }.get(self.comm.__class__.__name__, ["incr"])
-                        reads = []
-                        for addr, length, burst in _read_merger(record.reads.get_addrs(),
-                            max_length  = max_length,
-                            bursts      = bursts):
-                            reads += self.comm.read(addr, length, burst)
-
-                        addr_size = self.addr_width // 8
-                        record = EtherboneRecord(addr_size)
-                        record.writes = EtherboneWrites(addr_size=addr_size, datas=reads)
-                        record.wcount = len(record.writes)
-
-                        packet = EtherbonePacket(self.addr_width)
-                        packet.records = [record]
-                        packet.encode()
-                        self.send_packet(client_socket, packet)
-
-                    # Release hardware lock.
-                    self.lock = False
-
-            finally:
-                print("Disconnect")
-                client_socket.close()
-
-    def start(self, nthreads):
-        for i in range(nthreads):
-            self.serve_thread = threading.Thread(target=self._serve_thread)
-            self.serve_thread.setDaemon(True)
-            self.serve_thread.start()
+                        request.client.socket.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+    def start(self, nthreads=None):
+        # Note: nthreads is no longer used (all clients are served by a single selector thread)
+        # and is only kept for compatibility.
+        if nthreads is not None:
+            warnings.warn("RemoteServer.start(nthreads) is deprecated: nthreads is ignored, clients "
+                "are served by a single selector thread.", DeprecationWarning, stacklevel=2)
+        self.stop_event = threading.Event()
+        self.serve_thread = threading.Thread(target=self._serve_thread, daemon=True)
+        self.comm_thread  = threading.Thread(target=self._comm_thread,  daemon=True)
+        self.serve_thread.start()
+        self.comm_thread.start()
 
 # Run ----------------------------------------------------------------------------------------------
 
@@ -189,6 +443,7 @@ def main():
     parser.add_argument("--uart",            action="store_true",    help="Select UART interface.")
     parser.add_argument("--uart-port",       default=None,           help="Set UART port.")
     parser.add_argument("--uart-baudrate",   default=115200,         help="Set UART baudrate.")
+    parser.add_argument("--uart-framed",     action="store_true",    help="Use UARTBone framed commands (larger bursts, CRC, pipelining).")
 
     # JTAG arguments
     parser.add_argument("--jtag",            action="store_true",             help="Select JTAG interface.")
@@ -222,7 +477,7 @@ def main():
         uart_port = args.uart_port
         uart_baudrate = int(float(args.uart_baudrate))
         print("[CommUART] port: {} / baudrate: {} / ".format(uart_port, uart_baudrate), end="")
-        comm = CommUART(uart_port, uart_baudrate, debug=args.debug, addr_width=int(args.addr_width))
+        comm = CommUART(uart_port, uart_baudrate, debug=args.debug, addr_width=int(args.addr_width), framed=args.uart_framed)
 
     # JTAG mode
     elif args.jtag:
@@ -283,7 +538,7 @@ def main():
 
     server = RemoteServer(comm, args.bind_ip, int(args.bind_port), addr_width=int(args.addr_width))
     server.open()
-    server.start(4)
+    server.start()
     try:
         import time
         while True: time.sleep(100)
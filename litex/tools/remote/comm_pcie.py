@@ -5,8 +5,8 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 import os
-import ctypes
 import mmap
+import ctypes
 
 from litex.tools.remote.csr_builder import CSRBuilder
 
@@ -39,27 +39,41 @@ class CommPCIe(CSRBuilder):
     def close(self):
         if not hasattr(self, "file"):
             return
-        self.file.close()
-        del self.file
         self.mmap.close()
+        os.close(self.file)
+        del self.file, self.mmap
+
+    def read_block(self, addr, length):
+        """Return a c_uint32 array of length words at addr mapped on the BAR.
+
+        Each element access is done directly on the BAR with a single 32-bit access (slicing the
+        array, ex block[:], reads all the words one at a time). The array must be deleted before
+        close().
+        """
+        assert addr % 4 == 0
+        return (ctypes.c_uint32*length).from_buffer(self.mmap, addr)
+
+    def write_block(self, addr, datas):
+        """Write datas (words as list/array/memoryview/NumPy array) at addr on the BAR, one 32-bit
+        word at a time."""
+        assert addr % 4 == 0
+        datas = datas if hasattr(datas, "__len__") else list(datas)
+        block = self.read_block(addr, len(datas))
+        block[:] = datas
+        del block
 
     def read(self, addr, length=None, burst="incr"):
         assert burst == "incr"
-        data = []
         length_int = 1 if length is None else length
-        for i in range(length_int):
-            value = ctypes.c_uint32.from_buffer(self.mmap, addr + 4*i).value
-            if self.debug:
+        datas = self.read_block(addr, length_int)[:]
+        if self.debug:
+            for i, value in enumerate(datas):
                 print("read 0x{:08x} @ 0x{:08x}".format(value, addr + 4*i))
-            if length is None:
-                return value
-            data.append(value)
-        return data
+        return datas[0] if length is None else datas
 
     def write(self, addr, data):
         data = data if isinstance(data, list) else [data]
-        length = len(data)
-        for i, value in enumerate(data):
-            ctypes.c_uint32.from_buffer(self.mmap, addr + 4*i).value = value
-            if self.debug:
+        self.write_block(addr, data)
+        if self.debug:
+            for i, value in enumerate(data):
                 print("write 0x{:08x} @ 0x{:08x}".format(value, addr + 4*i))
@@ -16,15 +16,58 @@ CMD_READ_BURST_INCR   = 0x02
 CMD_WRITE_BURST_FIXED = 0x03
 CMD_READ_BURST_FIXED  = 0x04
 
+# Framed commands: 16-bit length and CRC-8 on commands/responses (see Stream2Wishbone).
+CMD_FRAMED            = 0x10
+
+STATUS_OK             = 0x00
+STATUS_CRC_ERROR      = 0x01
+
+# CRC-8 --------------------------------------------------------------------------------------------
+
+def _crc8_table(poly=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for i in range(8):
+            crc = ((crc << 1) ^ (poly if crc & 0x80 else 0)) & 0xff
+        table.append(crc)
+    return bytes(table)
+
+_crc8_lut = _crc8_table()
+
+def crc8(data, crc=0):
+    """CRC-8 (polynomial 0x07, no reflection, init 0) of data."""
+    for byte in data:
+        crc = _crc8_lut[crc ^ byte]
+    return crc
+
 # CommUART -----------------------------------------------------------------------------------------
 
 class CommUART(CSRBuilder):
-    def __init__(self, port, baudrate=115200, csr_csv=None, debug=False, addr_width=32):
+    """UARTBone (Stream2Wishbone) over a serial port.
+
+    Each command is sent as one contiguous buffer and, since the bridge can't receive while sending
+    a response, read commands are sent one at a time.
+
+    With framed=True, the framed commands (up to 65535 words per read and write_max_length words per
+    write, CRC-8 checked) are used. Commands are pipelined: they are sent in advance while the
+    commands in flight fit in the RX FIFO of the bridge (rx_fifo_depth bytes). Commands with a CRC
+    error are retried up to retries times.
+    """
+    def __init__(self, port, baudrate=115200, csr_csv=None, debug=False, addr_width=32, framed=False, retries=4,
+        timeout=1.0, write_max_length=None, rx_fifo_depth=64):
         CSRBuilder.__init__(self, comm=self, csr_csv=csr_csv)
         self.port       = serial.serial_for_url(port, baudrate)
         self.baudrate   = str(baudrate)
         self.debug      = debug
         self.addr_bytes = addr_width // 8
+        self.framed     = framed
+        self.retries    = retries
+        self.max_length = 65535 if framed else 255
+        self.write_max_length = write_max_length or (64 if framed else 8)
+        self.rx_fifo_depth    = rx_fifo_depth if framed else 0
+        if framed:
+            self.port.timeout = timeout
 
     def open(self):
         if hasattr(self, "port"):
@@ -38,9 +81,12 @@ class CommUART(CSRBuilder):
         del self.port
 
     def _read(self, length):
-        r = bytes()
+        r = bytearray()
         while len(r) < length:
-            r += self.port.read(length - len(r))
+            chunk = self.port.read(length - len(r))
+            if self.framed and len(chunk) == 0:
+                break # Timeout, errors are detected on the response.
+            r += chunk
         return r
 
     def _write(self, data):
@@ -55,41 +101,114 @@ class CommUART(CSRBuilder):
         if self.port.inWaiting() > 0:
             self.port.read(self.port.inWaiting())
 
-    def read(self, addr, length=None, burst="incr"):
-        self._flush()
-        data       = []
-        length_int = 1 if length is None else length
-        cmd        = {
-            "incr" : CMD_READ_BURST_INCR,
-            "fixed": CMD_READ_BURST_FIXED,
-        }[burst]
-        self._write([cmd, length_int])
-        self._write(list((addr//4).to_bytes(self.addr_bytes, byteorder="big")))
-        for i in range(length_int):
-            value = int.from_bytes(self._read(4), "big")
+    def _drain(self):
+        # Wait for the end of the responses in flight and discard them.
+        while len(self.port.read(4096)):
+            pass
+
+    def _command(self, cmd, addr, length, data=b""):
+        # Command buffer: cmd, length, address (in words) and data (+ CRC in framed mode).
+        if self.framed:
+            buf = bytearray([cmd | CMD_FRAMED]) + length.to_bytes(2, "big")
+        else:
+            buf = bytearray([cmd, length])
+        buf += (addr//4).to_bytes(self.addr_bytes, byteorder="big")
+        buf += data
+        if self.framed:
+            buf.append(crc8(buf))
+        return buf
+
+    def _chunks(self, addr, length, burst, max_length):
+        incr = 4 if burst == "incr" else 0
+        for offset in range(0, length, max_length):
+            yield addr + incr*offset, offset, min(length - offset, max_length)
+
+    def _transfer(self, commands):
+        """Send a list of (command, response length) and return the responses.
+
+        A command is only sent in advance of the responses of the previous ones when all the
+        commands in flight fit in the RX FIFO of the bridge. In framed mode, the commands are sent
+        again from the first failing one (status/CRC error or timeout).
+        """
+        responses = []
+        retries   = 0
+        while commands:
+            self._flush()
+            sent     = 0
+            inflight = 0
+            for n, (command, length) in enumerate(commands):
+                while sent < len(commands):
+                    size = len(commands[sent][0])
+                    if (sent > n) and (inflight + size > self.rx_fifo_depth):
+                        break
+                    self._write(commands[sent][0])
+                    inflight += size
+                    sent     += 1
+                response  = self._read(length)
+                inflight -= len(command)
+                if self.framed and (
+                    len(response) != length or
+                    response[0] != STATUS_OK or
+                    crc8(response[1:]) != 0):
+                    break
+                responses.append(response)
+            else:
+                break
+            commands = commands[n:]
+            retries += 1
+            if retries > self.retries:
+                raise IOError("UARTBone error.")
             if self.debug:
-                print("read 0x{:08x} @ 0x{:08x}".format(value, addr + 4*i))
-            if length is None:
-                return value
-            data.append(value)
-        return data
+                print("UARTBone error, retrying ({}/{})".format(retries, self.retries))
+            self._drain()
+        return responses
 
-    def write(self, addr, data, burst="incr"):
-        self._flush()
-        data   = data if isinstance(data, list) else [data]
-        length = len(data)
-        offset = 0
-        while length:
-            size = min(length, 8)
+    def read_pipelined(self, requests):
+        """Read a list of (addr, length, burst) requests, return the list of their datas."""
+        commands = []
+        for addr, length, burst in requests:
             cmd = {
-                "incr" : CMD_WRITE_BURST_INCR,
-                "fixed": CMD_WRITE_BURST_FIXED,
+                "incr" : CMD_READ_BURST_INCR,
+                "fixed": CMD_READ_BURST_FIXED,
             }[burst]
-            self._write([cmd, size])
-            self._write(list(((addr//4 + offset).to_bytes(self.addr_bytes, byteorder="big"))))
-            for i, value in enumerate(data[offset:offset+size]):
-                self._write(list(value.to_bytes(4, byteorder="big")))
-                if self.debug:
-                    print("write 0x{:08x} @ 0x{:08x}".format(value, addr + offset, 4*i))
-            offset += size
-            length -= size
+            for chunk_addr, offset, size in self._chunks(addr, length, burst, self.max_length):
+                # Response: datas (+ status and CRC in framed mode).
+                commands.append((self._command(cmd, chunk_addr, size), 4*size + 2*self.framed))
+
+        datas = []
+        for response in self._transfer(commands):
+            if self.framed:
+                response = response[1:-1]
+            datas += struct.unpack(">{}I".format(len(response)//4), response)
+
+        # Split the datas per request.
+        results = []
+        for addr, length, burst in requests:
+            results.append(datas[:length])
+            datas = datas[length:]
+            if self.debug:
+                for i, value in enumerate(results[-1]):
+                    print("read 0x{:08x} @ 0x{:08x}".format(value, addr + 4*i*(burst == "incr")))
+        return results
+
+    def read(self, addr, length=None, burst="incr"):
+        length_int = 1 if length is None else length
+        data = self.read_pipelined([(addr, length_int, burst)])[0]
+        return data[0] if length is None else data
+
+    def write(self, addr, data, burst="incr"):
+        data = data if isinstance(data, list) else [data]
+        cmd  = {
+            "incr" : CMD_WRITE_BURST_INCR,
+            "fixed": CMD_WRITE_BURST_FIXED,
+        }[burst]
+        commands = []
+        for chunk_addr, offset, size in self._chunks(addr, len(data), burst, self.write_max_length):
+            payload = struct.pack(">{}I".format(size), *data[offset:offset + size])
+            # Response: status in framed mode.
+            commands.append((self._command(cmd, chunk_addr, size, payload), 1*self.framed))
+        self._transfer(commands)
+
+        if self.debug:
+            for i, value in enumerate(data):
+                print("write 0x{:08x} @ 0x{:08x}".format(value, addr + 4*i))
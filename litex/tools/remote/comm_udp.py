@@ -5,18 +5,56 @@
 # Copyright (c) 2016 Tim 'mithro' Ansell <mithro@mithis.com>
 # SPDX-License-Identifier: BSD-2-Clause
 
-import socket
 import time
+import socket
+import collections
 
-from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
-from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+from litex.tools.remote.etherbone import EtherbonePacket
+from litex.tools.remote.etherbone import EtherboneCodec, EtherboneCodecRecord
+from litex.tools.remote.etherbone import etherbone_packet_header_length, etherbone_record_header_length
 
 from litex.tools.remote.csr_builder import CSRBuilder
 
+# CommUDP Read -------------------------------------------------------------------------------------
+
+class CommUDPRead:
+    """Asynchronous CommUDP read, available once the responses of all its records are received."""
+    def __init__(self, comm, length, nrecords):
+        self.comm   = comm
+        self.length = length
+        self.datas  = [None]*nrecords
+
+    @property
+    def done(self):
+        return None not in self.datas
+
+    def result(self):
+        while not self.done:
+            self.comm._receive()
+        datas = [data for datas in self.datas for data in datas]
+        return datas[0] if self.length is None else datas
+
+
+class _CommUDPRequest:
+    def __init__(self, packet, read=None, index=0):
+        self.packet    = packet
+        self.read      = read
+        self.index     = index
+        self.timestamp = 0
+        self.retries   = 0
+
 # CommUDP ------------------------------------------------------------------------------------------
 
 class CommUDP(CSRBuilder):
-    def __init__(self, server="192.168.1.50", port=1234, csr_csv=None, debug=False, timeout=1.0, addr_width=32):
+    """Etherbone over UDP.
+
+    Reads are split in records of up to max_length words (limited by Etherbone and the MTU), tagged
+    with their base_ret_addr. Up to window records are kept in flight, the ones without response
+    after timeout are retransmitted (up to retries times). Writes are posted in order with the reads
+    (and are not limited by the window); close() waits for all queued requests to be sent/answered.
+    """
+    def __init__(self, server="192.168.1.50", port=1234, csr_csv=None, debug=False, timeout=1.0, addr_width=32,
+        window=8, retries=10, mtu=1500, bind_port=None):
         CSRBuilder.__init__(self, comm=self, csr_csv=csr_csv)
         self.server = server
         self.port   = port
@@ -24,12 +62,22 @@ class CommUDP(CSRBuilder):
         self.timeout= timeout
         self.read_counter = 0
         self.addr_width   = addr_width
+        self.window       = window
+        self.retries      = retries
+        self.bind_port    = port if bind_port is None else bind_port
+        self.codec        = EtherboneCodec(addr_width)
+        self.queue        = collections.deque()
+        self.inflight     = collections.OrderedDict()
+
+        # Max words per record (Requests: addr_size per word, Responses: 4 bytes per word).
+        payload = mtu - 20 - 8 - etherbone_packet_header_length - etherbone_record_header_length - addr_width//8
+        self.max_length = min(255, payload//max(4, addr_width//8))
 
     def open(self, probe=True):
         if hasattr(self, "socket"):
             return
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(("", self.port))
+        self.socket.bind(("", self.bind_port))
         self.socket.settimeout(self.timeout)
         if probe:
             self.probe(self.server, self.port)
@@ -37,8 +85,14 @@ class CommUDP(CSRBuilder):
     def close(self):
         if not hasattr(self, "socket"):
             return
-        self.socket.close()
-        del self.socket
+        # Flush the queued writes/reads before closing.
+        try:
+            self.wait()
+        finally:
+            self.socket.close()
+            del self.socket
+            self.queue.clear()
+            self.inflight.clear()
 
     def probe(self, ip, port, loose=False):
 
@@ -81,70 +135,97 @@ class CommUDP(CSRBuilder):
             if self.probe(ip=ip.format(str(i)), port=self.port, loose=True):
                 print("- {}".format(ip.format(i)))
 
-    def read(self, addr, length=None, burst="incr"):
-        assert burst == "incr"
-        length_int = 1 if length is None else length
+    # Requests.
 
-        retries = 10
-
-        for r in range(retries):
-            self.read_counter += 1
-
-            record = EtherboneRecord(addr_size=self.addr_width//8)
-            record.reads = EtherboneReads(addr_size=self.addr_width//8, addrs=[addr+4*j for j in range(length_int)])
-            record.rcount = len(record.reads)
-            record.reads.base_ret_addr = self.read_counter
-
-            packet = EtherbonePacket(addr_width=self.addr_width)
-            packet.records = [record]
-            packet.encode()
-
-            self.socket.sendto(packet.bytes, (self.server, self.port))
-
-            timed_out = False
-            while True:
-                try:
-                    datas, dummy = self.socket.recvfrom(8192)
-                except socket.timeout:
-                    if self.debug:
-                        print("socket timeout, retrying ({}/{})".format(r+1, retries))
-                    timed_out = True
-                    break
+    def _send(self, request):
+        request.timestamp = time.monotonic()
+        self.socket.sendto(request.packet, (self.server, self.port))
 
-                packet = EtherbonePacket(self.addr_width, datas)
-                packet.decode()
-                record = packet.records.pop()
-                datas = record.writes.get_datas()
-                if record.writes.base_addr == self.read_counter:
+    def _send_queued(self):
+        # Send the queued requests in order: Writes are posted (sent directly, without response to
+        # wait for) and only reads are limited by the window.
+        while self.queue:
+            tag, request = self.queue[0]
+            if request.read is not None:
+                if len(self.inflight) >= self.window:
                     break
-                else:
-                    if self.debug:
-                        print(f"WARNING: request/response id mismatch: 0x{self.read_counter:08x} != 0x{record.writes.base_addr:08x}")
+                self.inflight[tag] = request
+            self.queue.popleft()
+            self._send(request)
+
+    def _retransmit(self):
+        now = time.monotonic()
+        for request in self.inflight.values():
+            if (now - request.timestamp) >= self.timeout:
+                request.retries += 1
+                if request.retries > self.retries:
+                    raise socket.timeout
+                if self.debug:
+                    print("socket timeout, retrying ({}/{})".format(request.retries, self.retries))
+                self._send(request)
 
-            if not timed_out:
-                break
+    def _receive(self):
+        if not self.inflight:
+            self._send_queued()
+            return
+        # Wait until the oldest in flight request times out.
+        timeout     = min(request.timestamp for request in self.inflight.values()) + self.timeout
+        old_timeout = self.socket.gettimeout()
+        self.socket.settimeout(max(timeout - time.monotonic(), 0.001))
+        try:
+            datas, dummy = self.socket.recvfrom(8192)
+        except socket.timeout:
+            self._retransmit()
+            return
+        finally:
+            self.socket.settimeout(old_timeout)
+        for record in self.codec.decode(datas):
+            request = self.inflight.pop(record.base_addr, None)
+            if request is None:
+                if self.debug:
+                    print(f"WARNING: unexpected response id: 0x{record.base_addr:08x}")
+                continue
+            request.read.datas[request.index] = [] if record.writes is None else record.writes.tolist()
+        self._send_queued()
+        self._retransmit()
+
+    def _queue(self, record, read=None, index=0):
+        self.read_counter = (self.read_counter + 1) & 0xffffffff
+        if read is not None:
+            record = record._replace(base_ret_addr=self.read_counter)
+        self.queue.append((self.read_counter, _CommUDPRequest(self.codec.encode([record]), read, index)))
+
+    def read_async(self, addr, length=None, burst="incr"):
+        """Queue a read and return a CommUDPRead (its result() waits for the datas)."""
+        assert burst == "incr"
+        length_int = 1 if length is None else length
+        addrs  = [addr + 4*j for j in range(length_int)]
+        chunks = [addrs[i:i + self.max_length] for i in range(0, length_int, self.max_length)]
+        read   = CommUDPRead(self, length, len(chunks))
+        for i, chunk in enumerate(chunks):
+            self._queue(EtherboneCodecRecord(reads=chunk), read, i)
+        self._send_queued()
+        return read
+
+    def wait(self):
+        """Wait for the responses of all queued/in flight reads."""
+        while self.queue or self.inflight:
+            self._receive()
 
-        else:
-            raise socket.timeout
+    def read(self, addr, length=None, burst="incr"):
+        datas = self.read_async(addr, length, burst).result()
 
         if self.debug:
-            for i, value in enumerate(datas):
+            for i, value in enumerate(datas if length is not None else [datas]):
                 print("read 0x{:08x} @ 0x{:08x}".format(value, addr + 4*i))
 
-        return datas[0] if length is None else datas
+        return datas
 
     def write(self, addr, datas):
         datas = datas if isinstance(datas, list) else [datas]
-        length = len(datas)
-        record = EtherboneRecord(addr_size=self.addr_width//8)
-        record.writes = EtherboneWrites(addr_size=self.addr_width//8, base_addr=addr, datas=iter(datas))
-        record.wcount = len(record.writes)
-
-        packet = EtherbonePacket(self.addr_width)
-        packet.records = [record]
-        packet.encode()
-
-        self.socket.sendto(packet.bytes, (self.server, self.port))
+        for i in range(0, len(datas), self.max_length):
+            self._queue(EtherboneCodecRecord(base_addr=addr + 4*i, writes=datas[i:i + self.max_length]))
+        self._send_queued()
 
         if self.debug:
             for i, value in enumerate(datas):
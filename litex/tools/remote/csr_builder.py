@@ -37,7 +37,9 @@ class CSRRegister:
     def read(self):
         if self.mode not in ["rw", "ro"]:
             raise KeyError(self.name + "register not readable")
-        datas = self.readfn(self.addr, length=self.length)
+        return self.decode(self.readfn(self.addr, length=self.length))
+
+    def decode(self, datas):
         if isinstance(datas, int):
             return datas
         else:
@@ -5,8 +5,12 @@
 # Copyright (c) 2017 Tim Ansell <mithro@mithis.com>
 # SPDX-License-Identifier: BSD-2-Clause
 
+import sys
 import math
 import struct
+import collections
+
+from array import array
 
 from litex.soc.interconnect.packet import HeaderField, Header
 
@@ -392,15 +396,149 @@ class EtherbonePacket(Packet):
                 r += record.__repr__(i)
         return r
 
+# Etherbone Codec ----------------------------------------------------------------------------------
+
+# Record with writes (datas at base_addr) and reads (addrs, returned at base_ret_addr) as sequences
+# of words (arrays when decoded) or None. flags is the record header byte with bca/rca/rff/cyc/wca/wff.
+EtherboneCodecRecord = collections.namedtuple("EtherboneCodecRecord",
+    ["base_addr", "writes", "base_ret_addr", "reads", "byte_enable", "flags"],
+    defaults=[0, None, 0, None, 0xf, 0])
+
+def _words(typecode, datas):
+    # Array of native words from datas (or datas itself when already a matching array).
+    if isinstance(datas, array) and datas.typecode == typecode:
+        return datas
+    return array(typecode, datas)
+
+
+class EtherboneCodec:
+    """Fast Etherbone packets encoder/decoder.
+
+    Packets are encoded/decoded in one pass, each record's writes/reads being packed/unpacked as a
+    whole (array/memoryview copies) instead of per-word objects. Packets can contain multiple
+    records and are encoded in/decoded from preallocated buffers (bytearray/memoryview) without
+    intermediate copies.
+    """
+    def __init__(self, addr_width=32):
+        assert addr_width in [32, 64]
+        self.addr_size = addr_width//8
+        self.addr_type = {4: "I", 8: "Q"}[self.addr_size]
+        assert array("I").itemsize == 4
+        assert array("Q").itemsize == 8
+        self.header = bytes([
+            etherbone_magic >> 8, etherbone_magic & 0xff,
+            etherbone_version << 4,
+            (self.addr_size << 4) | 4,
+            0, 0, 0, 0,
+        ])
+        self._addr = struct.Struct(">" + self.addr_type)
+
+    def _pack(self, buf, offset, words):
+        # Big-endian copy of words in buf at offset, return the next offset.
+        if sys.byteorder == "little":
+            words = array(words.typecode, words)
+            words.byteswap()
+        size = len(words)*words.itemsize
+        memoryview(buf)[offset:offset + size] = memoryview(words).cast("B")
+        return offset + size
+
+    def _unpack(self, buf, offset, typecode, count):
+        # Array of count big-endian words from buf at offset.
+        words = array(typecode)
+        words.frombytes(memoryview(buf)[offset:offset + count*words.itemsize])
+        if sys.byteorder == "little":
+            words.byteswap()
+        return words
+
+    def get_record_size(self, wcount, rcount):
+        size = etherbone_record_header_length
+        if wcount:
+            size += self.addr_size + 4*wcount
+        if rcount:
+            size += self.addr_size + self.addr_size*rcount
+        return size
+
+    def get_packet_size(self, records):
+        size = etherbone_packet_header_length
+        for record in records:
+            size += self.get_record_size(
+                0 if record.writes is None else len(record.writes),
+                0 if record.reads  is None else len(record.reads))
+        return size
+
+    def encode_into(self, buf, offset, records):
+        """Encode a packet with records in buf at offset, return the next offset."""
+        header_end = offset + etherbone_packet_header_length
+        buf[offset:header_end] = self.header
+        offset = header_end
+        for record in records:
+            writes = None if record.writes is None else _words("I",            record.writes)
+            reads  = None if record.reads  is None else _words(self.addr_type, record.reads)
+            wcount = 0 if writes is None else len(writes)
+            rcount = 0 if reads  is None else len(reads)
+            if (wcount > 255) or (rcount > 255):
+                raise ValueError(f"Burst size of {max(wcount, rcount)} exceeds maximum of 255 allowed by Etherbone.")
+            buf[offset:offset + 4] = bytes([record.flags, record.byte_enable, wcount, rcount])
+            offset += 4
+            if wcount:
+                self._addr.pack_into(buf, offset, record.base_addr)
+                offset = self._pack(buf, offset + self.addr_size, writes)
+            if rcount:
+                self._addr.pack_into(buf, offset, record.base_ret_addr)
+                offset = self._pack(buf, offset + self.addr_size, reads)
+        return offset
+
+    def encode(self, records):
+        """Return a packet (bytearray) with records."""
+        buf = bytearray(self.get_packet_size(records))
+        self.encode_into(buf, 0, records)
+        return buf
+
+    def decode(self, buf, offset=0, length=None):
+        """Return the records of the packet in buf at offset."""
+        end = len(buf) if length is None else (offset + length)
+        if (buf[offset] << 8 | buf[offset + 1]) != etherbone_magic:
+            raise ValueError("Invalid Etherbone magic.")
+        offset += etherbone_packet_header_length
+        records = []
+        while offset < end:
+            flags, byte_enable, wcount, rcount = buf[offset:offset + 4]
+            offset += 4
+            base_addr, writes, base_ret_addr, reads = 0, None, 0, None
+            if wcount:
+                base_addr = self._addr.unpack_from(buf, offset)[0]
+                writes    = self._unpack(buf, offset + self.addr_size, "I", wcount)
+                offset   += self.addr_size + 4*wcount
+            if rcount:
+                base_ret_addr = self._addr.unpack_from(buf, offset)[0]
+                reads         = self._unpack(buf, offset + self.addr_size, self.addr_type, rcount)
+                offset       += self.addr_size + self.addr_size*rcount
+            records.append(EtherboneCodecRecord(base_addr, writes, base_ret_addr, reads, byte_enable, flags))
+        if offset != end:
+            raise ValueError("Truncated Etherbone packet.")
+        return records
+
 # Etherbone IPC ------------------------------------------------------------------------------------
 
 class EtherboneIPC:
+    header_length = etherbone_packet_header_length + etherbone_record_header_length
+
     def send_packet(self, socket, packet):
         socket.sendall(packet.bytes)
 
+    def get_packet_size(self, header, addr_size):
+        # Size of a (single record) packet from its packet/record headers.
+        wcount, rcount = struct.unpack(">BB", header[self.header_length-2:self.header_length])
+        packet_size = self.header_length
+        if wcount != 0:
+            packet_size += 4 * (wcount ) + addr_size
+        if rcount != 0:
+            packet_size += (rcount + 1 ) * addr_size
+        return packet_size
+
     def receive_packet(self, socket, addr_size):
         assert addr_size in [1, 2, 4, 8]
-        header_length = etherbone_packet_header_length + etherbone_record_header_length
+        header_length = self.header_length
         packet        = bytes()
         while len(packet) < header_length:
             chunk = socket.recv(header_length - len(packet))
@@ -408,13 +546,7 @@ class EtherboneIPC:
                 return 0
             else:
                 packet += chunk
-        wcount, rcount = struct.unpack(">BB", packet[header_length-2:])
-        counts = wcount + rcount
-        packet_size = header_length
-        if wcount != 0:
-            packet_size += 4 * (wcount ) + addr_size
-        if rcount != 0:
-            packet_size += (rcount + 1 ) * addr_size
+        packet_size = self.get_packet_size(packet, addr_size)
         while len(packet) < packet_size:
             chunk = socket.recv(packet_size - len(packet))
             if len(chunk) == 0:
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# AutoCSR gathering benchmark: CSRs/Constants/Memories gathering and CSRBankArray elaboration on a
+# module hierarchy with thousands of CSRs (first vs repeated/cached gathering).
+
+import time
+import argparse
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect.csr_bus import CSRBankArray
+
+# Design -------------------------------------------------------------------------------------------
+
+class Leaf(LiteXModule, AutoCSR):
+    def __init__(self, ncsrs):
+        for i in range(ncsrs):
+            if i%2:
+                setattr(self, f"csr{i}", CSRStorage(32, name=f"csr{i}"))
+            else:
+                setattr(self, f"csr{i}", CSRStatus(32, name=f"csr{i}"))
+
+class Core(LiteXModule, AutoCSR):
+    def __init__(self, nleaves, ncsrs):
+        for i in range(nleaves):
+            setattr(self, f"leaf{i}", Leaf(ncsrs))
+
+class Top(LiteXModule):
+    def __init__(self, ncores, nleaves, ncsrs):
+        self.cores = [Core(nleaves, ncsrs) for i in range(ncores)]
+        for i, core in enumerate(self.cores):
+            setattr(self, f"core{i}", core)
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def bench(name, ncsrs, function):
+    start    = time.perf_counter()
+    r        = function()
+    duration = time.perf_counter() - start
+    print("{:24s}: {:8.2f} ms ({:8.2f} kCSRs/s)".format(name, duration*1e3, ncsrs/duration/1e3))
+    return r
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX AutoCSR gathering benchmark.")
+    parser.add_argument("--cores",   default=16, type=int, help="Number of cores (CSR regions).")
+    parser.add_argument("--leaves",  default=8,  type=int, help="Number of sub-modules per core.")
+    parser.add_argument("--csrs",    default=16, type=int, help="Number of CSRs per sub-module.")
+    parser.add_argument("--repeats", default=8,  type=int, help="Number of repeated gatherings.")
+    args = parser.parse_args()
+
+    top   = Top(args.cores, args.leaves, args.csrs)
+    ncsrs = args.cores*args.leaves*args.csrs
+    print("{} CSRs in {} regions.".format(ncsrs, args.cores))
+
+    def gather():
+        for core in top.cores:
+            core.get_csrs()
+            core.get_constants()
+            core.get_memories()
+    def gather_sorted():
+        for core in top.cores:
+            core.get_csrs(sort=True)
+    bench("gather (first)",    ncsrs, gather)
+    bench("gather (repeated)", ncsrs*args.repeats, lambda: [gather() for i in range(args.repeats)])
+    bench("gather (sorted)",   ncsrs*args.repeats, lambda: [gather_sorted() for i in range(args.repeats)])
+
+    # CSRBankArray scan (as done by the SoC).
+    def address_map(name, memory):
+        return top.cores.index(getattr(top, name))
+    def csr_bank_array():
+        return CSRBankArray(top, address_map)
+    banks = bench("CSRBankArray", ncsrs, csr_bank_array)
+    bench("CSRBankArray elaborate", ncsrs, lambda: banks.get_fragment())
+
+    # Frozen after finalize.
+    for core in top.cores:
+        core.finalize()
+    bench("gather (finalized)", ncsrs*args.repeats, lambda: [gather() for i in range(args.repeats)])
+
+if __name__ == "__main__":
+    main()
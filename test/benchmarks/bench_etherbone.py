@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Etherbone encode/decode benchmark: EtherbonePacket objects vs EtherboneCodec (in words per second).
+
+import time
+import argparse
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneWrites
+from litex.tools.remote.etherbone import EtherboneCodec, EtherboneCodecRecord
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def bench(name, nwords, function):
+    start    = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    print("{:24s}: {:8.2f} Mwords/s".format(name, nwords/duration/1e6))
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX Etherbone encode/decode benchmark.")
+    parser.add_argument("--packets", default=4096, type=int, help="Number of packets.")
+    parser.add_argument("--records", default=4,    type=int, help="Number of records per packet.")
+    parser.add_argument("--words",   default=255,  type=int, help="Number of words per record.")
+    args = parser.parse_args()
+
+    datas  = list(range(args.words))
+    nwords = args.packets*args.records*args.words
+
+    # Legacy.
+    def legacy_encode():
+        packets = []
+        for i in range(args.packets):
+            packet = EtherbonePacket(32)
+            for j in range(args.records):
+                record = EtherboneRecord(4)
+                record.writes = EtherboneWrites(4, base_addr=0x1000*j, datas=datas)
+                packet.records.append(record)
+            packet.encode()
+            packets.append(bytes(packet.bytes))
+        return packets
+    packets = legacy_encode()
+    bench("EtherbonePacket encode", nwords, legacy_encode)
+
+    def legacy_decode():
+        for data in packets:
+            packet = EtherbonePacket(32, data)
+            packet.decode()
+            [record.writes.get_datas() for record in packet.records]
+    bench("EtherbonePacket decode", nwords, legacy_decode)
+
+    # Codec.
+    codec   = EtherboneCodec(32)
+    records = [EtherboneCodecRecord(base_addr=0x1000*j, writes=datas) for j in range(args.records)]
+    size    = codec.get_packet_size(records)
+    buf     = bytearray(size*args.packets)
+    def codec_encode():
+        offset = 0
+        for i in range(args.packets):
+            offset = codec.encode_into(buf, offset, records)
+    bench("EtherboneCodec encode", nwords, codec_encode)
+    assert bytes(buf[:size]) == packets[0]
+
+    def codec_decode():
+        view = memoryview(buf)
+        for i in range(args.packets):
+            codec.decode(view, i*size, size)
+    bench("EtherboneCodec decode", nwords, codec_decode)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Memory init benchmark: binary image loading (get_mem_data) and $readmemh init generation.
+
+import os
+import time
+import resource
+import argparse
+import tempfile
+
+from litex.gen.fhdl.memory import _memory_generate_init
+
+from litex.soc.integration.common import get_mem_data
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX memory init benchmark.")
+    parser.add_argument("--sizes",      default="1,16,64", help="Image sizes (in MB).")
+    parser.add_argument("--data-width", default=32, type=int, help="Memory data width.")
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "image.bin")
+            with open(filename, "wb") as f:
+                f.write(os.urandom(size*1024*1024))
+
+            start = time.perf_counter()
+            data  = get_mem_data(filename, data_width=args.data_width, endianness="little")
+            load  = time.perf_counter() - start
+
+            start   = time.perf_counter()
+            content = _memory_generate_init(data, args.data_width)
+            init    = time.perf_counter() - start
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+        print("image: {:3d}MB / get_mem_data: {:.2f}s / init: {:.2f}s ({:.1f}MB) / peak RSS: {:.0f}MB".format(
+            size, load, init, len(content)/1e6, rss))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Signal naming benchmark on a large synthetic hierarchy (wide fan-out, related signals).
+
+import time
+import argparse
+
+from migen import *
+
+from litex.gen.fhdl.namer import build_signal_namespace
+
+# Synthetic Signals --------------------------------------------------------------------------------
+
+def synthetic_signals(ncores, nsubmodules=8, nsignals=16, related_ratio=0.1):
+    # Signals are created with explicit backtraces: soc -> core{i} -> submodule{j} (instantiated
+    # twice from the same class, exercising numbering) -> signal{k}.
+    signals = []
+    for i in range(ncores):
+        for j in range(nsubmodules):
+            for n in range(2):
+                for k in range(nsignals):
+                    s = Signal(8)
+                    s.backtrace = [("soc", None), (f"core{i}", None), (f"sub{j}", n), (f"sig{k}", None)]
+                    signals.append(s)
+                    if (k % int(1/related_ratio)) == 0:
+                        r = Signal(4, related=s)
+                        r.backtrace = [("soc", None), (f"core{i}", None), ("cdc", None), (f"sig{k}", None)]
+                        signals.append(r)
+    return signals
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX signal naming benchmark.")
+    parser.add_argument("--cores",   default=1000, type=int,   help="Number of synthetic cores.")
+    parser.add_argument("--related", default=0.1,  type=float, help="Ratio of signals with a related signal.")
+    parser.add_argument("--jobs",    default=1,    type=int,   help="Number of naming jobs (parallel processes).")
+    args = parser.parse_args()
+
+    signals = synthetic_signals(args.cores, related_ratio=args.related)
+
+    start = time.perf_counter()
+    ns    = build_signal_namespace(signals, jobs=args.jobs)
+    names = {ns.get_name(s) for s in signals}
+    duration = time.perf_counter() - start
+
+    assert len(names) == len(signals)
+    print("signals: {} / jobs: {} / naming: {:.2f}s".format(len(signals), args.jobs, duration))
+
+if __name__ == "__main__":
+    main()
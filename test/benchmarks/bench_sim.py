@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Simulation micro-benchmarks on wide datapaths (stream.Converter/Gearbox).
+
+import time
+import random
+import argparse
+
+from migen import *
+
+from litex.gen.sim.core import run_simulation
+
+from litex.soc.interconnect.stream import Converter, Gearbox
+
+# Designs ------------------------------------------------------------------------------------------
+
+class GearboxDUT(Module):
+    def __init__(self, dw0, dw1):
+        self.submodules.gearbox0 = Gearbox(dw0, dw1)
+        self.submodules.gearbox1 = Gearbox(dw1, dw0)
+        self.comb += self.gearbox0.source.connect(self.gearbox1.sink)
+        self.sink   = self.gearbox0.sink
+        self.source = self.gearbox1.source
+
+
+def stream_generator(dut, nbits, cycles, seed=42):
+    prng = random.Random(seed)
+    for i in range(cycles):
+        yield dut.sink.valid.eq(prng.randrange(2))
+        yield dut.sink.data.eq(prng.randrange(2**nbits))
+        yield dut.source.ready.eq(prng.randrange(2))
+        yield
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+benchmarks = {
+    "converter_512_128" : (lambda: Converter(512, 128), 512),
+    "converter_128_512" : (lambda: Converter(128, 512), 128),
+    "gearbox_64_66"     : (lambda: GearboxDUT(64,  66),  64),
+    "gearbox_128_40"    : (lambda: GearboxDUT(128, 40), 128),
+}
+
+def run_benchmark(name, engine, cycles):
+    dut_cls, nbits = benchmarks[name]
+    dut = dut_cls()
+    start = time.perf_counter()
+    run_simulation(dut, stream_generator(dut, nbits, cycles), engine=engine)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX simulation benchmark.")
+    parser.add_argument("--cycles",  default=2000, type=int, help="Simulated cycles per benchmark.")
+    parser.add_argument("--engines", default="interpreted,compiled", help="Simulation engines.")
+    parser.add_argument("--filter",  default="",   help="Only run benchmarks containing this string.")
+    args = parser.parse_args()
+
+    for name in benchmarks.keys():
+        if args.filter not in name:
+            continue
+        for engine in args.engines.split(","):
+            duration = run_benchmark(name, engine, args.cycles)
+            print("{:20s} {:12s} {:8.3f}s {:10.0f} cycles/s".format(
+                name, engine, duration, args.cycles/duration))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Verilog conversion benchmark on a large synthetic SoC (reports time and peak RSS).
+
+import time
+import resource
+import argparse
+
+from migen import *
+
+from litex.gen import LiteXModule
+from litex.gen.fhdl.verilog import convert
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+# Synthetic SoC ------------------------------------------------------------------------------------
+
+class SyntheticCore(LiteXModule):
+    def __init__(self, mem_depth):
+        self.bus  = bus  = wishbone.Interface()
+        self.sink = sink = stream.Endpoint([("data", 32)])
+
+        # # #
+
+        # Memory with init (exercises Memory Verilog generation/init files).
+        self.sram = wishbone.SRAM(mem_depth*4, init=list(range(mem_depth)), bus=bus)
+
+        # Stream path.
+        self.fifo = stream.SyncFIFO([("data", 32)], 16)
+        self.comb += sink.connect(self.fifo.sink)
+
+        # Some comb/sync logic with Cases and nested Ifs.
+        counter = Signal(16)
+        state   = Signal(4)
+        result  = Signal(32)
+        self.sync += [
+            counter.eq(counter + 1),
+            If(self.fifo.source.valid,
+                Case(state, {i: result.eq(result + i*self.fifo.source.data) for i in range(16)}),
+                state.eq(state + 1),
+            )
+        ]
+        self.comb += self.fifo.source.ready.eq(counter[0] | result[3])
+
+
+class SyntheticSoC(LiteXModule):
+    def __init__(self, ncores, mem_depth):
+        self.cd_sys = ClockDomain("sys")
+        self.ios = {self.cd_sys.clk, self.cd_sys.rst}
+        for i in range(ncores):
+            core = SyntheticCore(mem_depth)
+            setattr(self, f"core{i}", core)
+            self.ios |= {core.bus.adr, core.bus.dat_r, core.sink.valid, core.sink.data}
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX Verilog conversion benchmark.")
+    parser.add_argument("--cores",     default=200, type=int, help="Number of synthetic cores.")
+    parser.add_argument("--mem-depth", default=256, type=int, help="Memory depth of each core.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    soc   = SyntheticSoC(args.cores, args.mem_depth)
+    elaboration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    r     = convert(soc, ios=soc.ios, name="synthetic")
+    conversion = time.perf_counter() - start
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+    print("cores: {} / verilog: {:.1f}MB".format(args.cores, len(r.main_source)/1e6))
+    print("elaboration: {:.2f}s / conversion: {:.2f}s / peak RSS: {:.0f}MB".format(
+        elaboration, conversion, rss))
+
+if __name__ == "__main__":
+    main()
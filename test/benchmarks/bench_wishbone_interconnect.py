@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Wishbone interconnect benchmark: sustained words/cycle of DMA-like masters streaming reads from
+# SRAMs through the Shared, Crossbar and Pipelined interconnects.
+
+import random
+import argparse
+
+from migen import *
+
+from litex.gen.sim.core import run_simulation
+
+from litex.soc.interconnect import wishbone
+
+# Design -------------------------------------------------------------------------------------------
+
+interconnects = {
+    "shared"             : wishbone.InterconnectShared,
+    "crossbar"           : wishbone.Crossbar,
+    "pipelined"          : wishbone.InterconnectPipelined,
+    "pipelined-crossbar" : wishbone.CrossbarPipelined,
+}
+
+class BenchSoC(Module):
+    def __init__(self, interconnect, nmasters, nslaves, master_mode="classic", slave_mode="classic"):
+        self.masters = [wishbone.Interface(mode=master_mode) for i in range(nmasters)]
+        slaves = []
+        for i in range(nslaves):
+            bus  = wishbone.Interface(mode=slave_mode, bursting=True)
+            sram = wishbone.SRAM(4*1024, bus=bus, init=[0x10000*i + j for j in range(1024)])
+            self.submodules += sram
+            slaves.append((lambda a, i=i: a[10:] == i, bus))
+        self.submodules.interconnect = interconnects[interconnect](self.masters, slaves,
+            register       = True,
+            timeout_cycles = None)
+
+# Masters ------------------------------------------------------------------------------------------
+
+def classic_reads(bus, adrs, burst, incr, stats):
+    # Classic reads: cycles of burst accesses, incrementing bursts (registered feedback) when incr.
+    yield bus.we.eq(0)
+    for n in range(0, len(adrs), burst):
+        yield bus.cyc.eq(1)
+        yield bus.stb.eq(1)
+        for i in range(burst):
+            yield bus.adr.eq(adrs[n + i])
+            if incr and (burst > 1):
+                yield bus.cti.eq(wishbone.CTI_BURST_END if i == (burst - 1) else wishbone.CTI_BURST_INCREMENTING)
+            yield
+            while not (yield bus.ack):
+                yield
+            stats["words"] += 1
+        yield bus.cyc.eq(0)
+        yield bus.stb.eq(0)
+        yield bus.cti.eq(0)
+
+def pipelined_reads(bus, adrs, burst, incr, stats):
+    # Pipelined reads: cycles of burst requests issued back-to-back (when not stalled).
+    yield bus.we.eq(0)
+    for n in range(0, len(adrs), burst):
+        issued = acked = 0
+        yield bus.cyc.eq(1)
+        while acked < burst:
+            yield bus.stb.eq(issued < burst)
+            yield bus.adr.eq(adrs[n + min(issued, burst - 1)])
+            yield
+            if (yield bus.ack):
+                acked += 1
+                stats["words"] += 1
+            if (yield bus.stb) and not (yield bus.stall):
+                issued += 1
+        yield bus.cyc.eq(0)
+        yield bus.stb.eq(0)
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def run_benchmark(interconnect, nmasters, nslaves, length, burst, pattern, master_mode, slave_mode):
+    soc   = BenchSoC(interconnect, nmasters, nslaves, master_mode, slave_mode)
+    stats = {"words": 0, "cycles": 0}
+    reads = {"classic": classic_reads, "pipelined": pipelined_reads}[master_mode]
+    def master_generator(n):
+        # Each master reads from its own SRAM (when available): incrementing or random addresses.
+        base = (n % nslaves)*1024
+        if pattern == "incr":
+            adrs = [base + i for i in range(length)]
+        else:
+            prng = random.Random(n)
+            adrs = [base + prng.randrange(1024) for i in range(length)]
+        yield from reads(soc.masters[n], adrs, burst, pattern == "incr", stats)
+    def cycles_counter():
+        while stats["words"] < nmasters*length:
+            stats["cycles"] += 1
+            yield
+    run_simulation(soc, [master_generator(n) for n in range(nmasters)] + [cycles_counter()])
+    return stats["words"]/stats["cycles"]
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteX Wishbone interconnect benchmark.")
+    parser.add_argument("--masters",  default=3,   type=int,     help="Number of masters.")
+    parser.add_argument("--slaves",   default=3,   type=int,     help="Number of SRAM slaves.")
+    parser.add_argument("--length",   default=256, type=int,     help="Words read by each master.")
+    parser.add_argument("--bursts",   default="1,8",         help="Accesses per bus cycle (1: single accesses).")
+    parser.add_argument("--patterns", default="incr,random", help="Address patterns (incr: incrementing bursts).")
+    args = parser.parse_args()
+
+    configs = [
+        ("shared",             "classic",   "classic"),
+        ("crossbar",           "classic",   "classic"),
+        ("pipelined",          "classic",   "classic"),
+        ("pipelined",          "classic",   "pipelined"),
+        ("pipelined",          "pipelined", "pipelined"),
+        ("pipelined-crossbar", "classic",   "classic"),
+        ("pipelined-crossbar", "classic",   "pipelined"),
+        ("pipelined-crossbar", "pipelined", "pipelined"),
+    ]
+    for pattern in args.patterns.split(","):
+        for burst in [int(burst) for burst in args.bursts.split(",")]:
+            for interconnect, master_mode, slave_mode in configs:
+                words_per_cycle = run_benchmark(interconnect, args.masters, args.slaves, args.length,
+                    burst, pattern, master_mode, slave_mode)
+                print("{:6s} x{:<2d} / {:18s} (masters: {:9s}, slaves: {:9s}): {:.2f} words/cycle".format(
+                    pattern, burst, interconnect, master_mode, slave_mode, words_per_cycle))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+import types
+import tempfile
+import unittest
+
+from litex import get_data_mod
+from litex.soc.cores.cpu import CPUNone
+from litex.soc.integration.builder import Builder
+
+# Helpers ------------------------------------------------------------------------------------------
+
+makefile = """\
+SRC_DIR := $(dir $(lastword $(MAKEFILE_LIST)))
+GEN_H   := $(abspath $(CURDIR)/../include/generated/gen.h)
+
+all: out.txt
+
+out.txt: $(SRC_DIR)in.txt $(SRC_DIR)../common.txt
+\tcat $(SRC_DIR)in.txt $(SRC_DIR)../common.txt > $@
+\techo "$@: $(wildcard $(GEN_H))" > out.d
+\techo build >> builds.log
+
+-include out.d
+"""
+
+class VariablesBuilder(Builder):
+    # Builder with controlled variables (no CPU/toolchain/Picolibc required).
+    variables = "TRIPLE=--native--\nCPU=none\n"
+
+    def _get_variables_contents(self):
+        return self.variables
+
+
+class ToolchainCPU(CPUNone):
+    # CPU with a (not installed) toolchain.
+    name       = "test"
+    family     = "test"
+    gcc_triple = "litex-test"
+    gcc_flags  = ""
+
+
+def get_builder(output_dir, **kwargs):
+    soc = types.SimpleNamespace(platform=types.SimpleNamespace(name="test"), cpu=CPUNone(), cpu_type=None)
+    return VariablesBuilder(soc, output_dir=output_dir, **kwargs)
+
+def write_file(filename, contents, mtime=None):
+    with open(filename, "w") as f:
+        f.write(contents)
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+def create_package(d, contents="0", mtime=None):
+    # Package with a source (in.txt) and an input outside of the package (common.txt).
+    src_dir = os.path.join(d, "package")
+    os.makedirs(src_dir, exist_ok=True)
+    write_file(os.path.join(src_dir, "Makefile"), makefile)
+    write_file(os.path.join(src_dir, "in.txt"), contents, mtime)
+    write_file(os.path.join(d, "common.txt"), "", mtime)
+    return src_dir
+
+def read_file(*args):
+    with open(os.path.join(*args)) as f:
+        return f.read()
+
+def has_software_data():
+    try:
+        get_data_mod("software", "picolibc")
+        get_data_mod("software", "compiler_rt")
+        return True
+    except ImportError:
+        return False
+
+# Test Builder -------------------------------------------------------------------------------------
+
+class TestBuilderSoftware(unittest.TestCase):
+    def test_stages(self):
+        with tempfile.TemporaryDirectory() as d:
+            builder = get_builder(d)
+            builder.add_software_package("bios")
+            stages = [[name for name, src_dir in stage] for stage in builder._get_software_stages()]
+            libraries = [name for name in builder.software_libraries if name != "libc"]
+            self.assertEqual(stages, [["libc"], libraries, ["bios"]])
+            stages = [[name for name, src_dir in stage] for stage in builder._get_software_stages(compile_bios=False)]
+            self.assertEqual(stages, [["libc"], libraries])
+
+    def test_reuse(self):
+        with tempfile.TemporaryDirectory() as d:
+            builder = get_builder(d)
+            src_dir = create_package(d, mtime=time.time() - 100)
+            dst_dir = os.path.join(builder.software_dir, "package")
+            os.makedirs(dst_dir)
+            h0 = builder._build_software_package("package", src_dir, [], 1)
+            h1 = builder._build_software_package("package", src_dir, [], 1)
+            # Unchanged: Nothing re-built.
+            self.assertEqual(h0, h1)
+            self.assertEqual(read_file(dst_dir, "builds.log"), "build\n")
+            # Changed sources: Re-built.
+            create_package(d, contents="1")
+            h2 = builder._build_software_package("package", src_dir, [], 1)
+            self.assertNotEqual(h1, h2)
+            self.assertEqual(read_file(dst_dir, "out.txt"), "1")
+            self.assertEqual(read_file(dst_dir, "builds.log"), "build\n"*2)
+            # Changed inputs not part of the hash (tracked by make): Re-built.
+            write_file(os.path.join(d, "common.txt"), "2")
+            self.assertEqual(h2, builder._build_software_package("package", src_dir, [], 1))
+            self.assertEqual(read_file(dst_dir, "out.txt"), "12")
+            # Changed dependencies: Different hash.
+            self.assertNotEqual(h2, builder._build_software_package("package", src_dir, ["libc"], 1))
+
+    def test_clean(self):
+        with tempfile.TemporaryDirectory() as d:
+            builder = get_builder(d)
+            src_dir = create_package(d)
+            dst_dir = os.path.join(builder.software_dir, "package")
+            os.makedirs(dst_dir)
+            builder._build_software_package("package", src_dir, [], 1)
+            # Changed variables: Package cleaned and re-built.
+            builder.variables += "CPUFLAGS=-O0\n"
+            builder._build_software_package("package", src_dir, [], 1)
+            self.assertEqual(read_file(dst_dir, "builds.log"), "build\n")
+            self.assertEqual(read_file(dst_dir, "out.txt"), "0")
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache_dir = os.path.join(d, "cache")
+            src_dir   = create_package(d, mtime=time.time() - 100)
+            dst_dirs  = []
+            for n in range(2):
+                builder = get_builder(os.path.join(d, f"build{n}"), software_cache_dir=cache_dir)
+                dst_dirs.append(os.path.join(builder.software_dir, "package"))
+                os.makedirs(dst_dirs[-1])
+                h = builder._build_software_package("package", src_dir, [], 1)
+            # Second build restored from cache (and not re-built).
+            self.assertEqual(os.listdir(cache_dir), [f"package-{h}"])
+            self.assertEqual(read_file(dst_dirs[1], "out.txt"), "0")
+            self.assertEqual(read_file(dst_dirs[1], "builds.log"), "build\n")
+
+    def test_cache_build_directories(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache_dir = os.path.join(d, "cache")
+            src_dir   = create_package(d, mtime=time.time() - 100)
+            builders  = []
+            for n in range(2):
+                builder = get_builder(os.path.join(d, f"build{n}"), software_cache_dir=cache_dir)
+                os.makedirs(builder.generated_dir)
+                os.makedirs(os.path.join(builder.software_dir, "package"))
+                # Generated file, only differing by its banner.
+                gen_h = os.path.join(builder.generated_dir, "gen.h")
+                write_file(gen_h, f"// Auto-generated by LiteX (0000000) on 2024-01-0{n + 1}\n#define GEN 0\n", time.time() - 100)
+                builder.variables += f"BUILDINC_DIRECTORY={builder.include_dir}\n"
+                builder._build_software_package("package", src_dir, [], 1)
+                builders.append(builder)
+            # Second build restored from cache (and not re-built) with its own dependencies.
+            dst_dir = os.path.join(builders[1].software_dir, "package")
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertEqual(read_file(dst_dir, "builds.log"), "build\n")
+            self.assertIn(gen_h, read_file(dst_dir, "out.d"))
+            self.assertNotIn(builders[0].software_dir, read_file(dst_dir, "out.d"))
+            # Changed generated file: Re-built.
+            write_file(gen_h, "#define GEN 1\n")
+            builders[1]._build_software_package("package", src_dir, [], 1)
+            self.assertEqual(read_file(dst_dir, "builds.log"), "build\n"*2)
+
+    @unittest.skipUnless(has_software_data(), "Picolibc/Compiler-RT data not installed.")
+    def test_cache_variables(self):
+        with tempfile.TemporaryDirectory() as d:
+            src_dir = create_package(d)
+            hashes  = []
+            for n in range(2):
+                soc = types.SimpleNamespace(platform=types.SimpleNamespace(name="test"), cpu=ToolchainCPU(), cpu_type=None)
+                builder = Builder(soc, output_dir=os.path.join(d, f"build{n}"), compile_software=False)
+                self.assertIn(builder.include_dir, builder._get_variables_contents())
+                os.makedirs(builder.generated_dir)
+                write_file(os.path.join(builder.generated_dir, "gen.h"), f"// Auto-generated by LiteX (0000000) on 2024-01-0{n + 1}\n")
+                hashes.append(builder._get_software_package_hashes("package", src_dir, [])[1])
+            # Same inputs hash for builds in different directories.
+            self.assertEqual(hashes[0], hashes[1])
+            # Changed generated file: Different inputs hash.
+            write_file(os.path.join(builder.generated_dir, "gen.h"), "#define GEN 1\n")
+            self.assertNotEqual(hashes[1], builder._get_software_package_hashes("package", src_dir, [])[1])
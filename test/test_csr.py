@@ -10,6 +10,7 @@ from migen import *
 
 from litex.soc.interconnect import csr
 from litex.soc.interconnect import csr_bus
+from litex.soc.interconnect import wishbone
 
 
 def csr32_write(dut, adr, dat):
@@ -17,10 +18,10 @@ def csr32_write(dut, adr, dat):
         yield from dut.csr.write(adr + 3 - i, (dat >> 8*i) & 0xff)
 
 
-def csr32_read(dut, adr):
+def csr32_read(dut, adr, latency=0):
     dat = 0
     for i in range(4):
-        dat |= ((yield from dut.csr.read(adr + 3 - i)) << 8*i)
+        dat |= ((yield from dut.csr.read(adr + 3 - i, latency=latency)) << 8*i)
     return dat
 
 
@@ -65,6 +66,29 @@ class CSRDUT(Module):
             slaves = self.csrbankarray.get_buses()
         )
 
+class CSRTreeDUT(Module):
+    mapaddrs = {"csrmodule0": 0, "csrmodule1": 1, "csrmodule2": 9, "csrmodule3": 30}
+    def address_map(self, name, memory):
+            return self.mapaddrs[name]
+
+    def __init__(self, stages=1):
+        self.csr = csr_bus.Interface()
+        for name in self.mapaddrs.keys():
+            setattr(self.submodules, name, CSRModule())
+        self.submodules.csrbankarray = csr_bus.CSRBankArray(
+            source      = self,
+            address_map = self.address_map,
+            decode      = False,
+            )
+        self.submodules.csrcon = csr_bus.InterconnectTree(
+            masters         = [self.csr],
+            slaves          = self.csrbankarray.get_slaves(),
+            request_stages  = stages,
+            response_stages = stages,
+        )
+        self.latency = self.csrcon.latency
+
+
 class TestCSR(unittest.TestCase):
     def test_csr_constant(self):
         def generator(dut):
@@ -144,3 +168,98 @@ class TestCSR(unittest.TestCase):
                 ]
         dut = DUT()
         run_simulation(dut, generator(dut))
+
+    def test_csr_tree(self):
+        def generator(dut):
+            # Check init values.
+            for mapaddr in dut.mapaddrs.values():
+                self.assertEqual(hex((yield from csr32_read(dut, 0x200*mapaddr + 5, dut.latency))), hex(0x12345678))
+
+            # Check writes/reads on each bank.
+            for n, mapaddr in enumerate(dut.mapaddrs.values()):
+                yield from csr32_write(dut, 0x200*mapaddr + 1, 0x5a5a5a00 + n)
+            for n, mapaddr in enumerate(dut.mapaddrs.values()):
+                self.assertEqual(hex((yield from csr32_read(dut, 0x200*mapaddr + 1, dut.latency))), hex(0x5a5a5a00 + n))
+
+            # Check update from dev (only on the selected bank).
+            yield from dut.csr.write(0x200*9, 1)
+            yield from dut.csr.write(0x200*9, 1)
+            self.assertEqual(hex((yield from csr32_read(dut, 0x200*9 + 5, dut.latency))), hex(0xdeadbeef))
+            self.assertEqual(hex((yield from csr32_read(dut, 0x200*1 + 5, dut.latency))), hex(0x12345678))
+
+            # Check read latency: data is not returned earlier.
+            if dut.latency:
+                self.assertNotEqual((yield from dut.csr.read(0x200*30 + 5 + 3, latency=dut.latency - 1)), 0x78)
+                self.assertEqual((yield from dut.csr.read(0x200*30 + 5 + 3, latency=dut.latency)), 0x78)
+
+        for stages in [0, 1, 2]:
+            dut = CSRTreeDUT(stages=stages)
+            self.assertEqual(dut.latency, 2*stages)
+            run_simulation(dut, generator(dut))
+
+    def test_csr_tree_wishbone_bridge(self):
+        class DUT(CSRTreeDUT):
+            def __init__(self, register):
+                CSRTreeDUT.__init__(self, stages=1)
+                self.submodules.bridge = wishbone.Wishbone2CSR(
+                    bus_csr  = self.csr,
+                    register = register,
+                    latency  = self.latency)
+                self.wb = self.bridge.wishbone
+
+        def generator(dut):
+            for n, mapaddr in enumerate(dut.mapaddrs.values()):
+                for i in range(4):
+                    yield from dut.wb.write(0x200*mapaddr + 1 + 3 - i, ((0xc0ffee00 + n) >> 8*i) & 0xff)
+            for n, mapaddr in enumerate(dut.mapaddrs.values()):
+                dat = 0
+                for i in range(4):
+                    dat |= (yield from dut.wb.read(0x200*mapaddr + 1 + 3 - i)) << 8*i
+                self.assertEqual(hex(dat), hex(0xc0ffee00 + n))
+
+        for register in [False, True]:
+            dut = DUT(register)
+            run_simulation(dut, generator(dut))
+
+    def test_autocsr_gather_cache(self):
+        class Child(Module, csr.AutoCSR):
+            def __init__(self):
+                self.a = csr.CSRStorage(name="a")
+
+        class Parent(Module, csr.AutoCSR):
+            def __init__(self):
+                self.child = Child()
+                self.b     = csr.CSRStorage(name="b")
+
+        parent = Parent()
+        csrs   = parent.get_csrs()
+        self.assertEqual([c.name for c in csrs], ["child_a", "b"])
+        # Cached items (returned lists can be modified by the caller).
+        csrs.append(None)
+        self.assertEqual([c.name for c in parent.get_csrs()], ["child_a", "b"])
+        # Invalidated when attributes change (on the parent or its children).
+        parent.c = csr.CSRStatus(name="c")
+        self.assertEqual([c.name for c in parent.get_csrs()], ["child_a", "b", "c"])
+        parent.child.d = csr.CSRStatus(name="d")
+        self.assertEqual([c.name for c in parent.get_csrs()], ["child_a", "b", "c", "child_d"])
+        del parent.b
+        self.assertEqual([c.name for c in parent.get_csrs()], ["child_a", "c", "child_d"])
+        # Sorted items are stable (same reserved CSRs).
+        self.assertTrue(all(x is y for x, y in zip(parent.get_csrs(sort=True), parent.get_csrs(sort=True))))
+        # Frozen once finalized.
+        parent.finalize()
+        parent.get_csrs()
+        parent.e = csr.CSRStatus(name="e")
+        self.assertEqual([c.name for c in parent.get_csrs()], ["child_a", "c", "child_d"])
+
+    def test_autocsr_sort(self):
+        items = [csr.CSRStatus(name=f"csr{i}", n=[None, 5, None, 0, None][i]) for i in range(5)]
+        r = csr._sort_gathered_items(items)
+        self.assertEqual([c.name for c in r], ["csr3", "csr0", "csr2", "csr4", "reserved4", "csr1"])
+        # Fixed item on the last location.
+        items = [csr.CSRStatus(name="a"), csr.CSRStatus(name="b", n=2)]
+        self.assertEqual([c.name for c in csr._sort_gathered_items(items)], ["a", "reserved1", "b"])
+        # Conflicts.
+        items = [csr.CSRStatus(name="a", n=1), csr.CSRStatus(name="b", n=1)]
+        with self.assertRaises(ValueError):
+            csr._sort_gathered_items(items)
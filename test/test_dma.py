@@ -0,0 +1,214 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import wishbone
+from litex.soc.cores.dma import WishboneDMAReader, WishboneDMAWriter
+
+# Helpers ------------------------------------------------------------------------------------------
+
+class DMADUT(LiteXModule):
+    def __init__(self, mode="classic", bursting=False, init=[], with_csr=False):
+        def bus():
+            return wishbone.Interface(data_width=32, address_width=32, addressing="word",
+                bursting=bursting, mode=mode)
+        self.bus     = bus()
+        self.bus_r   = bus()
+        self.bus_w   = bus()
+        self.sram    = wishbone.SRAM(4*256, init=init, bus=self.bus)
+        self.reader  = WishboneDMAReader(self.bus_r, endianness="big")
+        self.writer  = WishboneDMAWriter(self.bus_w, endianness="big")
+        self.arbiter = wishbone.Arbiter([self.bus_r, self.bus_w], self.bus)
+        if with_csr:
+            self.reader.add_csr(with_scatter_gather=True)
+            self.writer.add_csr(with_scatter_gather=True)
+
+def reader_generator(dut, addresses):
+    for i, address in enumerate(addresses):
+        yield dut.reader.sink.valid.eq(1)
+        yield dut.reader.sink.address.eq(address)
+        yield dut.reader.sink.last.eq(i == (len(addresses) - 1))
+        yield
+        while not (yield dut.reader.sink.ready):
+            yield
+    yield dut.reader.sink.valid.eq(0)
+    for i in range(8):
+        yield
+
+def writer_generator(dut, addresses, datas):
+    for address, data in zip(addresses, datas):
+        yield dut.writer.sink.valid.eq(1)
+        yield dut.writer.sink.address.eq(address)
+        yield dut.writer.sink.data.eq(data)
+        yield
+        while not (yield dut.writer.sink.ready):
+            yield
+    yield dut.writer.sink.valid.eq(0)
+
+@passive
+def source_generator(source, datas, cycles):
+    yield source.ready.eq(1)
+    cycle = 0
+    while True:
+        if (yield source.valid):
+            datas.append((yield source.data))
+            cycles.append(cycle)
+        cycle += 1
+        yield
+
+# TestDMA ------------------------------------------------------------------------------------------
+
+class TestDMA(unittest.TestCase):
+    modes = [("classic", False), ("classic", True), ("pipelined", False)]
+
+    def reader_test(self, mode, bursting, length=64):
+        init = [(0x01020304*i) & 0xffffffff for i in range(256)]
+        dut  = DMADUT(mode=mode, bursting=bursting, init=init)
+        datas, cycles = [], []
+        generators = [
+            reader_generator(dut, range(16, 16 + length)),
+            source_generator(dut.reader.source, datas, cycles),
+        ]
+        run_simulation(dut, generators)
+        self.assertEqual(datas, init[16:16 + length])
+        return (cycles[-1] - cycles[0] + 1)/length
+
+    def test_reader_classic(self):
+        self.reader_test(mode="classic", bursting=False)
+
+    def test_reader_classic_burst(self):
+        self.assertLess(self.reader_test(mode="classic", bursting=True), 1.1)
+
+    def test_reader_pipelined(self):
+        self.assertLess(self.reader_test(mode="pipelined", bursting=False), 1.1)
+
+    def writer_test(self, mode, bursting, length=64):
+        datas = [(0x01020304*i) & 0xffffffff for i in range(length)]
+        dut   = DMADUT(mode=mode, bursting=bursting)
+        mem   = []
+        acks  = []
+        def generator():
+            yield from writer_generator(dut, range(32, 32 + length), datas)
+            for i in range(8):
+                yield
+            for i in range(32, 32 + length):
+                mem.append((yield dut.sram.mem[i]))
+        @passive
+        def monitor():
+            cycle = 0
+            while True:
+                if (yield dut.writer.sink.valid) & (yield dut.writer.sink.ready):
+                    acks.append(cycle)
+                cycle += 1
+                yield
+        run_simulation(dut, [generator(), monitor()])
+        self.assertEqual(mem, datas)
+        return (acks[-1] - acks[0] + 1)/length
+
+    def test_writer_classic(self):
+        self.writer_test(mode="classic", bursting=False)
+
+    def test_writer_classic_burst(self):
+        self.assertLess(self.writer_test(mode="classic", bursting=True), 1.1)
+
+    def test_writer_pipelined(self):
+        self.assertLess(self.writer_test(mode="pipelined", bursting=False), 1.1)
+
+    def test_reader_scatter_gather(self):
+        # Descriptors table at 0x00: 2 buffers (0x40/4 words, 0x80/8 words).
+        init = [(0x01020304*i) & 0xffffffff for i in range(256)]
+        init[0:4] = [0x40*4, 4*4, 0x80*4, 8*4 | (1 << 31)]
+        for mode, bursting in self.modes:
+            dut = DMADUT(mode=mode, bursting=bursting, init=init, with_csr=True)
+            datas, cycles = [], []
+            def generator():
+                yield dut.reader._scatter_gather.storage.eq(1)
+                yield dut.reader._enable.storage.eq(1)
+                while not (yield dut.reader._done.status):
+                    yield
+                for i in range(8):
+                    yield
+                self.assertEqual((yield dut.reader._words.status), 12)
+            run_simulation(dut, [generator(), source_generator(dut.reader.source, datas, cycles)])
+            self.assertEqual(datas, init[0x40:0x44] + init[0x80:0x88])
+
+    def test_writer_scatter_gather(self):
+        # Descriptors table at 0x00: 2 buffers (0x40/4 words, 0x80/8 words).
+        init = [0]*256
+        init[0:4] = [0x40*4, 4*4, 0x80*4, 8*4 | (1 << 31)]
+        datas = [(0x01020304*i) & 0xffffffff for i in range(12)]
+        for mode, bursting in self.modes:
+            dut = DMADUT(mode=mode, bursting=bursting, init=init, with_csr=True)
+            mem = []
+            def generator():
+                yield dut.writer._scatter_gather.storage.eq(1)
+                yield dut.writer._enable.storage.eq(1)
+                yield
+                for data in datas:
+                    yield dut.writer.sink.valid.eq(1)
+                    yield dut.writer.sink.data.eq(data)
+                    yield
+                    while not (yield dut.writer.sink.ready):
+                        yield
+                yield dut.writer.sink.valid.eq(0)
+                while not (yield dut.writer._done.status):
+                    yield
+                for i in range(8):
+                    yield
+                self.assertEqual((yield dut.writer._words.status), 12)
+                for i in list(range(0x40, 0x44)) + list(range(0x80, 0x88)):
+                    mem.append((yield dut.sram.mem[i]))
+            run_simulation(dut, generator())
+            self.assertEqual(mem, datas)
+
+    def test_reader_done(self):
+        init = [(0x01020304*i) & 0xffffffff for i in range(256)]
+        for mode, bursting in self.modes:
+            dut = DMADUT(mode=mode, bursting=bursting, init=init, with_csr=True)
+            datas, cycles = [], []
+            def generator():
+                yield dut.reader._base.storage.eq(0x40*4)
+                yield dut.reader._length.storage.eq(16*4)
+                yield dut.reader._enable.storage.eq(1)
+                while not (yield dut.reader._done.status):
+                    # Offset is the number of completed reads.
+                    self.assertEqual((yield dut.reader._offset.status), (yield dut.reader._words.status))
+                    yield
+                # Done when all reads are completed.
+                self.assertEqual((yield dut.reader._offset.status), 16)
+                self.assertEqual((yield dut.reader._words.status),  16)
+            run_simulation(dut, [generator(), source_generator(dut.reader.source, datas, cycles)])
+            self.assertEqual(datas, init[0x40:0x50])
+
+    def test_writer_done(self):
+        datas = [(0x01020304*i) & 0xffffffff for i in range(16)]
+        for mode, bursting in self.modes:
+            dut = DMADUT(mode=mode, bursting=bursting, with_csr=True)
+            mem = []
+            def generator():
+                yield dut.writer._base.storage.eq(0x40*4)
+                yield dut.writer._length.storage.eq(16*4)
+                yield dut.writer._enable.storage.eq(1)
+                yield
+                for data in datas:
+                    yield dut.writer.sink.valid.eq(1)
+                    yield dut.writer.sink.data.eq(data)
+                    yield
+                    while not (yield dut.writer.sink.ready):
+                        yield
+                yield dut.writer.sink.valid.eq(0)
+                while not (yield dut.writer._done.status):
+                    yield
+                # Done when all writes are completed (in memory).
+                self.assertEqual((yield dut.writer._offset.status), 16)
+                for i in range(0x40, 0x50):
+                    mem.append((yield dut.sram.mem[i]))
+            run_simulation(dut, generator())
+            self.assertEqual(mem, datas)
@@ -0,0 +1,108 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import json
+import tempfile
+import unittest
+
+from migen import *
+
+from litex.build.tools import write_to_file_with_digest
+
+from litex.soc.interconnect.csr import *
+from litex.soc.integration.soc import SoCCSRRegion
+from litex.soc.integration import export
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def get_regions():
+    return {
+        "ctrl" : SoCCSRRegion(0xf0000000, 32, [
+            CSRStorage(32, reset=0x1234, name="scratch"),
+            CSRStatus(64, name="bus_errors"),
+        ]),
+        "leds" : SoCCSRRegion(0xf0000800, 32, [
+            CSRStorage(fields=[
+                CSRField("en",   size=1, reset=1),
+                CSRField("mode", size=3, offset=4),
+            ], name="out"),
+        ]),
+        "mem"  : SoCCSRRegion(0xf0001000, 32, Memory(32, 16)),
+    }
+
+# Test Export --------------------------------------------------------------------------------------
+
+class TestExport(unittest.TestCase):
+    def test_csr_model(self):
+        model = export.CSRModel(get_regions(), {"CONFIG_CSR_ALIGNMENT": 32})
+        self.assertEqual([region.name for region in model.regions], ["ctrl", "leds", "mem"])
+        ctrl, leds, mem = model.regions
+        self.assertEqual([(r.name, r.addr, r.nwords, r.type) for r in ctrl.registers], [
+            ("scratch",    0xf0000000, 1, "rw"),
+            ("bus_errors", 0xf0000004, 2, "ro"),
+        ])
+        self.assertEqual(ctrl.registers[0].reset, 0x1234)
+        self.assertEqual(leds.registers[0].reset, 0x1)
+        self.assertEqual([(f.name, f.offset, f.size) for f in leds.registers[0].fields], [("en", 0, 1), ("mode", 4, 3)])
+        self.assertIsNone(mem.registers)
+
+    def test_csr_header(self):
+        regions = get_regions()
+        header  = export.get_csr_header(regions, {})
+        self.assertIn("#define CSR_CTRL_BUS_ERRORS_ADDR (CSR_BASE + 0x4L)\n", header)
+        self.assertIn("static inline uint64_t ctrl_bus_errors_read(void) {\n", header)
+        self.assertNotIn("ctrl_bus_errors_write", header)
+        self.assertIn("#define CSR_LEDS_OUT_MODE_OFFSET 4\n", header)
+        self.assertIn("static inline void leds_out_mode_write(uint32_t plain_value) {\n", header)
+        self.assertIn("#define CSR_MEM_BASE (CSR_BASE + 0x1000L)\n", header)
+        # Rendering from a pre-computed model gives the same header.
+        model = export.CSRModel(regions, {})
+        self.assertEqual(header.split("\n")[3:], export.get_csr_header(regions, {}, model=model).split("\n")[3:])
+
+    def test_csr_json_csv(self):
+        regions   = get_regions()
+        constants = {"CONFIG_CSR_ALIGNMENT": 32, "CONFIG_CPU_TYPE": "NONE", "CONFIG_FLAG": None}
+        model     = export.CSRModel(regions, constants)
+        d = json.loads(export.get_csr_json(model=model))
+        self.assertEqual(d["csr_bases"]["mem"], 0xf0001000)
+        self.assertEqual(d["csr_registers"]["ctrl_bus_errors"], {"addr": 0xf0000004, "size": 2, "type": "ro"})
+        self.assertEqual(d["constants"], {"config_csr_alignment": 32, "config_cpu_type": "none", "config_flag": None})
+        csv = export.get_csr_csv(model=model)
+        self.assertIn("csr_register,leds_out,0xf0000800,1,rw\n", csv)
+        self.assertIn("constant,config_flag,None,,\n", csv)
+
+    def test_write_to_file_with_digest(self):
+        calls = []
+        def contents():
+            calls.append(None)
+            return "contents"
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "csr.h")
+            # Without digest: Always generated, no digest file.
+            self.assertTrue(write_to_file_with_digest(filename, contents))
+            self.assertEqual(os.listdir(d), ["csr.h"])
+            self.assertTrue(write_to_file_with_digest(filename, contents, "a"))
+            # Unchanged digest: Skipped.
+            self.assertFalse(write_to_file_with_digest(filename, contents, "a"))
+            # Changed digest or removed file: Regenerated.
+            self.assertTrue(write_to_file_with_digest(filename, contents, "b"))
+            os.remove(filename)
+            self.assertTrue(write_to_file_with_digest(filename, contents, "b"))
+            # Without digest: Stale digest file removed.
+            self.assertTrue(write_to_file_with_digest(filename, contents))
+            self.assertEqual(os.listdir(d), ["csr.h"])
+            self.assertEqual(len(calls), 5)
+            with open(filename) as f:
+                self.assertEqual(f.read(), "contents")
+
+    def test_csr_model_digest(self):
+        constants = {"CONFIG_CSR_ALIGNMENT": 32}
+        digest    = export.CSRModel(get_regions(), constants).get_digest("csr.h")
+        self.assertEqual(digest, export.CSRModel(get_regions(), constants).get_digest("csr.h"))
+        self.assertNotEqual(digest, export.CSRModel(get_regions(), constants).get_digest("csr.json"))
+        regions = get_regions()
+        regions["ctrl"].obj.append(CSRStorage(name="new"))
+        self.assertNotEqual(digest, export.CSRModel(regions, constants).get_digest("csr.h"))
@@ -0,0 +1,52 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import json
+import random
+import tempfile
+import unittest
+
+from litex.gen.fhdl.memory import _memory_generate_init
+
+from litex.soc.integration.common import get_mem_data
+
+# Test Memory Data ---------------------------------------------------------------------------------
+
+class TestMemData(unittest.TestCase):
+    def test_get_mem_data(self):
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "image.bin")
+            with open(filename, "wb") as f:
+                f.write(bytes(range(1, 19)))
+            self.assertEqual(get_mem_data(filename, endianness="big"),
+                [0x01020304, 0x05060708, 0x090a0b0c, 0x0d0e0f10, 0x11120000])
+            self.assertEqual(get_mem_data(filename, endianness="little"),
+                [0x04030201, 0x08070605, 0x0c0b0a09, 0x100f0e0d, 0x00001211])
+            self.assertEqual(get_mem_data(filename, data_width=64, endianness="big"),
+                [0x0506070801020304, 0x0d0e0f10090a0b0c, 0x0000000011120000])
+            self.assertEqual(get_mem_data(filename, data_width=64, endianness="little"),
+                [0x0807060504030201, 0x100f0e0d0c0b0a09, 0x0000000000001211])
+
+    def test_get_mem_data_regions(self):
+        with tempfile.TemporaryDirectory() as d:
+            for name, content in [("a.bin", b"\x00\x00\x00\x01"), ("b.bin", b"\x00\x00\x00\x02")]:
+                with open(os.path.join(d, name), "wb") as f:
+                    f.write(content)
+            with open(os.path.join(d, "regions.json"), "w") as f:
+                json.dump({"a.bin": "0x00000000", "b.bin": "0x00000008"}, f)
+            self.assertEqual(get_mem_data(os.path.join(d, "regions.json")), [1, 0, 2])
+            # Regions outside of the memory data.
+            with self.assertRaises(AssertionError):
+                get_mem_data(os.path.join(d, "regions.json"), offset=0x8)
+
+    def test_memory_generate_init(self):
+        prng = random.Random(42)
+        for width in [8, 30, 32, 64]:
+            init = [prng.randrange(2**width) for _ in range(64)]
+            ref  = "".join(f"{{:0{int(width/4)}x}}\n".format(d) for d in init)
+            self.assertEqual(_memory_generate_init(init, width), ref)
+        self.assertEqual(_memory_generate_init([-1], 32), "{:08x}\n".format(-1))
+        self.assertEqual(_memory_generate_init([], 32), "")
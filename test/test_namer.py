@@ -0,0 +1,46 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+from migen import *
+
+from litex.gen.fhdl.namer import build_signal_namespace
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def signal(backtrace, related=None):
+    s = Signal(related=related)
+    s.backtrace = backtrace
+    return s
+
+# Test Namer ---------------------------------------------------------------------------------------
+
+class TestNamer(unittest.TestCase):
+    def setUp(self):
+        self.signals = []
+        for core in ["core0", "core1"]:
+            for n in range(2):
+                for name in ["valid", "ready"]:
+                    s = signal([("soc", None), (core, None), ("fifo", n), (name, None)])
+                    self.signals.append(s)
+                    self.signals.append(signal([("soc", None), (core, None), (name, None)], related=s))
+        self.signals.append(signal([("soc", None), ("csr", None), ("valid", None)]))
+
+    def get_names(self, **kwargs):
+        ns = build_signal_namespace(self.signals, **kwargs)
+        return [ns.get_name(s) for s in self.signals]
+
+    def test_names(self):
+        names = self.get_names()
+        self.assertEqual(len(set(names)), len(names))
+        self.assertEqual(names[:4], [
+            "core0_fifo0_valid", "core0_fifo0_valid_core0_valid0",
+            "core0_fifo0_ready", "core0_fifo0_ready_core0_ready0",
+        ])
+        self.assertEqual(names[-1], "valid")
+
+    def test_parallel_names(self):
+        self.assertEqual(self.get_names(jobs=2), self.get_names())
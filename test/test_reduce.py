@@ -59,3 +59,46 @@ class TestReduce(unittest.TestCase):
         self.reduce_test(operator="ADD", value=Constant(0b011, 3), reduced=2)
         self.reduce_test(operator="ADD", value=Constant(0b110, 3), reduced=2)
         self.reduce_test(operator="ADD", value=Constant(0b111, 3), reduced=3)
+
+    def test_reduced_modes(self):
+        prng   = random.Random(42)
+        values = [prng.randrange(2**8) for i in range(13)]
+        refs   = {
+            "AND" : 0xff,
+            "OR"  : 0x00,
+            "XOR" : 0x00,
+            "ADD" : 0,
+        }
+        for value in values:
+            refs["AND"] &= value
+            refs["OR"]  |= value
+            refs["XOR"] ^= value
+            refs["ADD"] += value
+        class DUT(Module):
+            def __init__(self, operator, mode, stages):
+                self.inputs  = [Signal(8) for i in range(len(values))]
+                self.reduced = Reduce(operator, self.inputs, mode=mode, stages=stages, module=self)
+        def checker(dut, ref, latency):
+            for i, value in enumerate(values):
+                yield dut.inputs[i].eq(value)
+            for i in range(latency + 1):
+                yield
+                self.assertEqual((yield dut.reduced), ref if i == latency else 0)
+        for operator, ref in refs.items():
+            for mode, stages in [("chain", 1), ("tree", 1), ("pipelined", 1), ("pipelined", 3), ("pipelined", 6)]:
+                dut = DUT(operator, mode, stages)
+                latency = stages if mode == "pipelined" else 0
+                run_simulation(dut, checker(dut, ref, latency))
+
+    def test_reduced_pipelined_module(self):
+        with self.assertRaises(ValueError):
+            Reduce("OR", [Signal(), Signal()], mode="pipelined")
+
+    def test_reduced_default_chain(self):
+        # Default reduction is a linear chain (unchanged generated logic).
+        a, b, c = Signal(), Signal(), Signal()
+        chain = Reduce("OR", [a, b, c])
+        self.assertIs(chain.operands[1], c)
+        self.assertIs(chain.operands[0].operands[0], a)
+        tree  = Reduce("OR", [a, b, c, Signal()], mode="tree")
+        self.assertNotIsInstance(tree.operands[1], Signal)
@@ -0,0 +1,377 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import io
+import os
+import time
+import socket
+import tempfile
+import unittest
+import threading
+import contextlib
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneReads, EtherboneWrites
+from litex.tools.remote.etherbone import EtherboneCodec, EtherboneCodecRecord
+from litex.tools.remote.comm_udp import CommUDP
+from litex.tools.remote.comm_pcie import CommPCIe
+from litex.tools.litex_server import RemoteServer, _read_merger
+from litex.tools.litex_client import RemoteClient, dump_registers
+
+# Helpers ------------------------------------------------------------------------------------------
+
+class CommMemory:
+    # Memory-backed comm (with UART-like burst capabilities).
+    def __init__(self):
+        self.mem   = {}
+        self.reads = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self, addr, length=None, burst="incr"):
+        self.reads.append((addr, length, burst))
+        length_int = 1 if length is None else length
+        incr = (burst == "incr")
+        datas = [self.mem.get(addr + 4*incr*i, 0) for i in range(length_int)]
+        return datas[0] if length is None else datas
+
+    def write(self, addr, datas):
+        for i, data in enumerate(datas):
+            self.mem[addr + 4*i] = data
+
+
+class UDPMemory(threading.Thread):
+    # Memory-backed Etherbone UDP device (dropping the first transmission of one out of drop reads).
+    def __init__(self, drop=0):
+        threading.Thread.__init__(self, daemon=True)
+        self.codec  = EtherboneCodec()
+        self.mem    = {}
+        self.drop   = drop
+        self.seen   = set()
+        self.count  = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port   = self.socket.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                datas, addr = self.socket.recvfrom(8192)
+            except OSError:
+                return
+            if datas[2] & 0x1:
+                # Probe: Reply with probe reply flag.
+                self.socket.sendto(datas[:2] + bytes([(datas[2] & ~0x1) | 0x2]) + datas[3:], addr)
+                continue
+            records = self.codec.decode(datas)
+            if any(record.reads is not None for record in records):
+                self.count += 1
+                if self.drop and (self.count % self.drop) == 0 and datas not in self.seen:
+                    self.seen.add(datas)
+                    continue
+            for record in records:
+                if record.writes is not None:
+                    for i, data in enumerate(record.writes):
+                        self.mem[record.base_addr + 4*i] = data
+                if record.reads is not None:
+                    response = EtherboneCodecRecord(
+                        base_addr = record.base_ret_addr,
+                        writes    = [self.mem.get(addr, 0) for addr in record.reads])
+                    self.socket.sendto(self.codec.encode([response]), addr)
+
+    def close(self):
+        self.socket.close()
+
+
+class RemoteServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.comm   = CommMemory()
+        self.server = RemoteServer(self.comm, "localhost", 0)
+        self.server.read_max_length = 256
+        self.server.read_bursts     = ["incr", "fixed"]
+        self.server.open()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.close()
+
+    def get_client(self):
+        client = RemoteClient(port=self.server.bind_port)
+        client.open()
+        return client
+
+# Test Remote ---------------------------------------------------------------------------------------
+
+class TestRemote(RemoteServerTestCase):
+    def test_read_merger(self):
+        bursts = list(_read_merger([0x0, 0x4, 0x10, 0x14, 0x20, 0x20]))
+        self.assertEqual(bursts, [(0x0, 2, "incr"), (0x10, 2, "incr"), (0x20, 2, "fixed")])
+
+    def test_read_write(self):
+        client = self.get_client()
+        client.write(0x100, [1, 2, 3, 4])
+        self.assertEqual(client.read(0x100, 4), [1, 2, 3, 4])
+        self.assertEqual(client.read(0x104), 2)
+        self.assertEqual(client.read(0x108, 3, burst="fixed"), [3, 3, 3])
+        client.close()
+
+    def test_multiple_clients(self):
+        errors = []
+        def client_thread(n):
+            client = self.get_client()
+            for i in range(32):
+                base = 0x1000*n + 0x10*i
+                client.write(base, [n, i])
+                if client.read(base, 2) != [n, i]:
+                    errors.append((n, i))
+            client.close()
+        threads = [threading.Thread(target=client_thread, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_stats(self):
+        client = self.get_client()
+        client.write(0x0, [1, 2])
+        client.read(0x0, 2)
+        stats = self.server.get_stats()
+        self.assertEqual(len(stats), 1)
+        self.assertEqual((stats[0].requests, stats[0].reads, stats[0].writes), (2, 2, 2))
+        self.assertGreater(stats[0].latency_max, 0)
+        client.close()
+
+    def test_batch(self):
+        client = self.get_client()
+        with client.batch(max_inflight=2) as batch:
+            batch.write(0x0, list(range(300)))
+            values  = [batch.read(4*i) for i in range(0, 600, 7)]
+            burst   = batch.read(0x0, 300)
+            batch.write(0x10, 0x1234)
+            fixed   = batch.read(0x10, 3, burst="fixed")
+        self.assertEqual([value.result() for value in values], [i if i < 300 else 0 for i in range(0, 600, 7)])
+        self.assertEqual(burst.result(), list(range(300)))
+        self.assertEqual(fixed.result(), [0x1234]*3)
+        # Accesses are grouped in a few Etherbone records/requests.
+        self.assertLessEqual(self.server.get_stats()[0].requests, 5)
+        client.close()
+
+    def test_stalled_client(self):
+        # Client sending read requests without reading the responses.
+        stalled = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.connect(("localhost", self.server.bind_port))
+        codec  = EtherboneCodec()
+        packet = codec.encode([EtherboneCodecRecord(reads=[4*i for i in range(255)])])
+        stalled.sendall(packet*8192)
+        # Other clients are still served.
+        client = self.get_client()
+        client.write(0x0, [1, 2])
+        self.assertEqual(client.read(0x0, 2), [1, 2])
+        client.close()
+        stalled.close()
+
+    def test_start_nthreads(self):
+        server = RemoteServer(CommMemory(), "localhost", 0)
+        server.open()
+        with self.assertWarns(DeprecationWarning):
+            server.start(4)
+        server.close()
+
+    def test_dump_registers(self):
+        self.comm.write(0x0, [0x12345678, 0x9abcdef0, 0x11111111])
+        with tempfile.TemporaryDirectory() as d:
+            csr_csv = os.path.join(d, "csr.csv")
+            with open(csr_csv, "w") as f:
+                f.write("constant,config_csr_data_width,32,,\n")
+                f.write("constant,config_bus_address_width,32,,\n")
+                f.write("csr_register,ctrl_scratch,0x00000000,1,rw\n")
+                f.write("csr_register,ctrl_reset,0x00000004,1,wo\n")
+                f.write("csr_register,ctrl_bus_errors,0x00000008,1,ro\n")
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                dump_registers("localhost", csr_csv, self.server.bind_port)
+        # Write-only registers are not read.
+        lines = [line for line in output.getvalue().splitlines() if line.startswith("0x")]
+        self.assertEqual(lines, [
+            "0x00000000 : 0x12345678 ctrl_scratch",
+            "0x00000008 : 0x11111111 ctrl_bus_errors",
+        ])
+        self.assertNotIn(0x4, [addr for addr, length, burst in self.comm.reads])
+
+# Test Etherbone -----------------------------------------------------------------------------------
+
+class TestEtherbone(unittest.TestCase):
+    def test_codec_legacy(self):
+        # Codec packets must match the EtherbonePacket ones.
+        for addr_width in [32, 64]:
+            codec = EtherboneCodec(addr_width)
+            for record in [
+                EtherboneCodecRecord(base_addr=0x100, writes=list(range(255))),
+                EtherboneCodecRecord(base_ret_addr=0x200, reads=[4*i for i in range(16)]),
+                EtherboneCodecRecord(base_addr=0x10, writes=[5], base_ret_addr=0x20, reads=[0x30]),
+                ]:
+                legacy = EtherboneRecord(addr_width//8)
+                if record.writes is not None:
+                    legacy.writes = EtherboneWrites(addr_width//8, base_addr=record.base_addr, datas=record.writes)
+                if record.reads is not None:
+                    legacy.reads = EtherboneReads(addr_width//8, base_ret_addr=record.base_ret_addr, addrs=record.reads)
+                packet = EtherbonePacket(addr_width)
+                packet.records = [legacy]
+                packet.encode()
+                self.assertEqual(bytes(packet.bytes), bytes(codec.encode([record])))
+
+    def test_codec_records(self):
+        codec   = EtherboneCodec()
+        records = [
+            EtherboneCodecRecord(base_addr=0x100, writes=[0xdeadbeef, 0x12345678]),
+            EtherboneCodecRecord(base_ret_addr=0x200, reads=[0x0, 0x4, 0x8], flags=0x10),
+            EtherboneCodecRecord(base_addr=0x10, writes=[5], base_ret_addr=0x20, reads=[0x30]),
+        ]
+        # Encode in a preallocated buffer (at an offset) and decode from it.
+        buf    = bytearray(16 + codec.get_packet_size(records))
+        length = codec.encode_into(buf, 16, records) - 16
+        self.assertEqual(length, codec.get_packet_size(records))
+        decoded = codec.decode(memoryview(buf), 16, length)
+        self.assertEqual(len(decoded), 3)
+        for record, result in zip(records, decoded):
+            self.assertEqual(result.base_addr,     record.base_addr)
+            self.assertEqual(result.base_ret_addr, record.base_ret_addr)
+            self.assertEqual(result.flags,         record.flags)
+            self.assertEqual(None if result.writes is None else result.writes.tolist(), record.writes)
+            self.assertEqual(None if result.reads  is None else result.reads.tolist(),  record.reads)
+
+    def test_codec_errors(self):
+        codec = EtherboneCodec()
+        with self.assertRaises(ValueError):
+            codec.encode([EtherboneCodecRecord(writes=[0]*256)])
+        packet = codec.encode([EtherboneCodecRecord(writes=[0]*4)])
+        with self.assertRaises(ValueError):
+            codec.decode(packet[:-4])
+
+# Test CommUDP -------------------------------------------------------------------------------------
+
+class TestCommUDP(unittest.TestCase):
+    def get_comm(self, drop=0, **kwargs):
+        self.device = UDPMemory(drop=drop)
+        self.device.start()
+        comm = CommUDP("127.0.0.1", self.device.port, bind_port=0, **kwargs)
+        comm.open()
+        return comm
+
+    def tearDown(self):
+        self.device.close()
+
+    def test_read_write(self):
+        comm = self.get_comm()
+        comm.write(0x100, [1, 2, 3, 4])
+        self.assertEqual(comm.read(0x100, 4), [1, 2, 3, 4])
+        self.assertEqual(comm.read(0x104), 2)
+        comm.close()
+
+    def test_bulk(self):
+        comm  = self.get_comm(timeout=0.05)
+        datas = list(range(4096))
+        comm.write(0x1000, datas)
+        self.assertEqual(comm.read(0x1000, 4096), datas)
+        # Reads are done with records of max_length words.
+        self.assertEqual(comm.max_length, 255)
+        comm.close()
+
+    def test_async(self):
+        comm  = self.get_comm(window=4)
+        comm.write(0x0, list(range(1024)))
+        reads = [comm.read_async(4*i, 16) for i in range(0, 1024, 16)]
+        comm.wait()
+        self.assertTrue(all(read.done for read in reads))
+        self.assertEqual([data for read in reads for data in read.result()], list(range(1024)))
+        comm.close()
+
+    def test_retransmit(self):
+        comm  = self.get_comm(drop=3, timeout=0.05)
+        datas = list(range(2048))
+        comm.write(0x0, datas)
+        self.assertEqual(comm.read(0x0, 2048), datas)
+        self.assertGreater(len(self.device.seen), 0)
+        comm.close()
+
+    def test_posted_writes(self):
+        comm = self.get_comm(window=1)
+        comm.write(0x0, [1, 2])
+        # Writes are not held by the window.
+        read = comm.read_async(0x0, 2)
+        comm.write(0x8, 3)
+        self.assertEqual(len(comm.queue), 0)
+        self.assertEqual(read.result(), [1, 2])
+        # Socket timeout is restored.
+        self.assertEqual(comm.socket.gettimeout(), comm.timeout)
+        # Queued requests are flushed on close.
+        reads = [comm.read_async(0x0, 2) for i in range(2)]
+        comm.write(0xc, 4)
+        self.assertEqual(len(comm.queue), 2)
+        comm.close()
+        self.assertTrue(all(read.done for read in reads))
+        for i in range(100):
+            if 0xc in self.device.mem:
+                break
+            time.sleep(0.01)
+        self.assertEqual([self.device.mem.get(4*i) for i in range(4)], [1, 2, 3, 4])
+
+# Test CommPCIe ------------------------------------------------------------------------------------
+
+class TestCommPCIe(unittest.TestCase):
+    def setUp(self):
+        # File-backed BAR.
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "sys/bus/pci/devices/0000:01:00.0")
+        os.makedirs(path)
+        with open(os.path.join(path, "resource0"), "wb") as f:
+            f.write(bytes(0x10000))
+        with open(os.path.join(path, "enable"), "w") as f:
+            f.write("0")
+        self.comm = CommPCIe(os.path.join(path, "resource0"))
+        self.comm.open()
+
+    def tearDown(self):
+        self.comm.close()
+        self.tmp.cleanup()
+
+    def test_read_write(self):
+        self.comm.write(0x100, [1, 2, 3, 4])
+        self.assertEqual(self.comm.read(0x100, 4), [1, 2, 3, 4])
+        self.assertEqual(self.comm.read(0x104), 2)
+
+    def test_blocks(self):
+        self.comm.write_block(0x1000, range(1024))
+        block = self.comm.read_block(0x1000, 1024)
+        self.assertEqual(block[:], list(range(1024)))
+        # Blocks are mapped on the BAR.
+        self.comm.write(0x1000, 0x1234)
+        self.assertEqual(block[0], 0x1234)
+        block[1] = 0x5678
+        self.assertEqual(self.comm.read(0x1004), 0x5678)
+        del block
+        # Writes from memoryviews.
+        self.comm.write_block(0x2000, memoryview(bytes([1, 0, 0, 0, 2, 0, 0, 0])).cast("I"))
+        self.assertEqual(self.comm.read(0x2000, 2), [1, 2])
+
+    def test_server(self):
+        server = RemoteServer(self.comm, "localhost", 0)
+        server.open()
+        server.start()
+        client = RemoteClient(port=server.bind_port)
+        client.open()
+        client.write(0x0, list(range(255)))
+        with client.batch() as batch:
+            reads = [batch.read(4*i, 255) for i in range(0, 1024, 255)]
+        self.assertEqual(reads[0].result(), list(range(255)))
+        self.assertEqual(self.comm.read(0x0, 255), list(range(255)))
+        client.close()
+        server.close()
+        self.comm.open()
@@ -0,0 +1,269 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import gzip
+import tempfile
+import unittest
+import random
+
+from migen import *
+
+from litex.gen.reduce import Reduce
+from litex.gen.sim.core import run_simulation
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def trace(dut_cls, signals, cycles, stimulus=None):
+    # Run a DUT with both simulation engines and return the sampled values.
+    traces = {}
+    for engine in ["interpreted", "compiled"]:
+        dut     = dut_cls()
+        prng    = random.Random(42)
+        samples = []
+        def sampler():
+            for i in range(cycles):
+                if stimulus is not None:
+                    yield from stimulus(dut, prng)
+                yield
+                samples.append((yield signals(dut)))
+        run_simulation(dut, sampler(), engine=engine)
+        traces[engine] = samples
+    return traces
+
+# Test Simulator -----------------------------------------------------------------------------------
+
+class TestSimulator(unittest.TestCase):
+    def check_engines(self, dut_cls, signals, cycles, stimulus=None):
+        traces = trace(dut_cls, signals, cycles, stimulus)
+        self.assertEqual(traces["interpreted"], traces["compiled"])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            run_simulation(Module(), [], engine="unknown")
+
+    def test_operators(self):
+        class DUT(Module):
+            def __init__(self):
+                self.a = a = Signal(8)
+                self.b = b = Signal((8, True))
+                self.outputs = [Signal(16), Signal((16, True)), Signal(4), Signal(24),
+                    Signal(12), Signal(8), Signal(2), Signal((5, True))]
+                o = self.outputs
+                self.comb += [
+                    o[0].eq(a + b),
+                    o[1].eq(a*b - 3),
+                    o[2].eq(Cat(a[3:5], b < 0, ~a[0])),
+                    o[3].eq(Replicate(a[1:4], 8)),
+                    o[4].eq(Mux(a > 100, a << 2, b >> 1)),
+                    o[5].eq(-b),
+                    o[6][1].eq(a == 3),
+                    o[7].eq(b),
+                ]
+                self.sync += a.eq(a + 7), b.eq(b - 3)
+        self.check_engines(DUT, lambda dut: dut.outputs, 100)
+
+    def test_assign_slices(self):
+        class DUT(Module):
+            def __init__(self):
+                self.a = a = Signal(16)
+                self.b = b = Signal((12, True))
+                self.c = c = Signal(4)
+                self.sync += [
+                    a[4:12].eq(a[4:12] + 1),
+                    a[0:4].eq(a[12:]),
+                    Cat(b[2:5], c).eq(a),
+                    b[8:][1:3].eq(c),
+                ]
+        self.check_engines(DUT, lambda dut: [dut.a, dut.b, dut.c], 100)
+
+    def test_arrays(self):
+        class DUT(Module):
+            def __init__(self):
+                self.idx    = idx  = Signal(3)
+                self.regs   = regs = Array(Signal(8, reset=i) for i in range(5))
+                self.mixed  = mixed = Array([regs[0], regs[1][2:6], Cat(regs[2], regs[3]), C(5)])
+                self.o      = o    = Signal(16)
+                self.p      = p    = Signal(16)
+                self.comb += o.eq(regs[idx]), p.eq(mixed[idx])
+                self.sync += [
+                    idx.eq(idx + 1),
+                    regs[idx].eq(regs[idx] + idx),
+                    regs[idx + 2][4:].eq(idx),
+                    Array([regs[0], Cat(regs[1][:4], regs[2][4:])])[idx[0]].eq(o + 3),
+                ]
+        self.check_engines(DUT, lambda dut: [dut.o, dut.p] + list(dut.regs), 100)
+
+    def test_memory(self):
+        class DUT(Module):
+            def __init__(self):
+                mem = Memory(32, 16, init=[i*3 for i in range(16)])
+                self.specials += mem
+                self.port = port = mem.get_port(write_capable=True, we_granularity=8)
+                self.specials += port
+                counter = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.comb += [
+                    port.adr.eq(counter),
+                    port.dat_w.eq(counter*0x01010101),
+                    port.we.eq(counter[4:8]),
+                ]
+        self.check_engines(DUT, lambda dut: [dut.port.dat_r], 100)
+
+    def test_memory_granularity(self):
+        # Width not multiple of the write granularity (2 lanes of 5 bits, upper 2 bits not writable).
+        class DUT(Module):
+            def __init__(self):
+                mem = Memory(12, 4)
+                self.specials += mem
+                self.port = port = mem.get_port(write_capable=True, we_granularity=5)
+                self.specials += port
+        for engine in ["interpreted", "compiled"]:
+            dut  = DUT()
+            prng = random.Random(42)
+            def generator():
+                model = [0]*4
+                for i in range(64):
+                    adr   = prng.randrange(4)
+                    dat_w = prng.randrange(2**12)
+                    we    = prng.randrange(2**2)
+                    yield dut.port.adr.eq(adr)
+                    yield dut.port.dat_w.eq(dat_w)
+                    yield dut.port.we.eq(we)
+                    yield
+                    for lane, (lsb, width) in enumerate([(0, 5), (5, 5)]):
+                        if we & (1 << lane):
+                            mask = (2**width - 1) << lsb
+                            model[adr] = (model[adr] & ~mask) | (dat_w & mask)
+                    yield dut.port.we.eq(0)
+                    yield
+                    self.assertEqual((yield dut.port.dat_r), model[adr])
+            run_simulation(dut, generator(), engine=engine)
+
+    def test_case(self):
+        for ncases in [4, 64]:
+            class DUT(Module):
+                def __init__(self):
+                    self.sel = sel = Signal(8)
+                    self.o   = o   = Signal(8)
+                    self.s   = s   = Signal((4, True))
+                    cases = {i: o.eq(i*7) for i in range(ncases)}
+                    cases["default"] = o.eq(0xff)
+                    self.comb += Case(sel, cases)
+                    self.comb += Case(s, {-1: o[0].eq(0), 3: o[1].eq(1)})
+                    self.sync += sel.eq(sel + 1), s.eq(s + 1)
+            self.check_engines(DUT, lambda dut: [dut.o], 100)
+
+    def test_deep_expressions(self):
+        class DUT(Module):
+            def __init__(self):
+                self.inputs = inputs = [Signal(8, reset=i) for i in range(256)]
+                self.o      = o      = Signal(8)
+                self.p      = p      = Signal(16)
+                self.comb += o.eq(Reduce("XOR", inputs)), p.eq(Reduce("ADD", inputs))
+                self.sync += [i.eq(i + 1) for i in inputs]
+                # Deeply nested conditions.
+                self.q = q = Signal(8)
+                stmt = q.eq(q + 1)
+                for i in range(64):
+                    stmt = If(inputs[i] != 0, stmt)
+                self.sync += stmt
+        self.check_engines(DUT, lambda dut: [dut.o, dut.p, dut.q], 300)
+
+    def test_comb_groups(self):
+        class DUT(Module):
+            def __init__(self):
+                self.a = a = Signal(4)
+                self.o = o = Signal(4)
+                self.p = p = Signal(8)
+                self.q = q = Signal(8)
+                self.comb += [
+                    If(a[0], o[0].eq(1)),
+                    If(a[1], o[1:3].eq(a[2:4])),
+                    p.eq(o + 1),
+                    q.eq(p + o),
+                    If(a == 5, o[3].eq(1)),
+                ]
+                self.sync += a.eq(a + 1)
+        self.check_engines(DUT, lambda dut: [dut.o, dut.p, dut.q], 40)
+
+    def test_comb_driven_from_generator(self):
+        for engine in ["interpreted", "compiled"]:
+            a = Signal(8)
+            o = Signal(8)
+            m = Module()
+            m.comb += o.eq(a + 1)
+            samples = []
+            def generator():
+                yield a.eq(3)
+                yield
+                yield o.eq(0)
+                yield
+                samples.append((yield o))
+            run_simulation(m, generator(), engine=engine)
+            self.assertEqual(samples, [4])
+
+    def test_stream_converter(self):
+        def stimulus(dut, prng):
+            yield dut.sink.valid.eq(prng.randrange(2))
+            yield dut.sink.data.eq(prng.randrange(2**32))
+            yield dut.source.ready.eq(prng.randrange(2))
+        for nbits_from, nbits_to in [(8, 32), (32, 8)]:
+            self.check_engines(lambda: stream.Converter(nbits_from, nbits_to),
+                lambda dut: [dut.sink.ready, dut.source.valid, dut.source.data], 200, stimulus)
+
+    def test_wishbone_sram(self):
+        def stimulus(dut, prng):
+            yield dut.bus.cyc.eq(1)
+            yield dut.bus.stb.eq(prng.randrange(2))
+            yield dut.bus.we.eq(prng.randrange(2))
+            yield dut.bus.sel.eq(prng.randrange(16))
+            yield dut.bus.adr.eq(prng.randrange(16))
+            yield dut.bus.dat_w.eq(prng.randrange(2**32))
+        self.check_engines(lambda: wishbone.SRAM(64),
+            lambda dut: [dut.bus.ack, dut.bus.dat_r], 200, stimulus)
+
+    def vcd_test(self, filename, **kwargs):
+        class DUT(Module):
+            def __init__(self):
+                self.counter = Signal(8, name_override="counter")
+                self.other   = Signal(8, name_override="other")
+                self.sync += self.counter.eq(self.counter + 1), self.other.eq(self.other + 3)
+        def generator():
+            for i in range(20):
+                yield
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, filename)
+            run_simulation(DUT(), generator(), vcd_name=filename, **kwargs)
+            if filename.endswith(".gz"):
+                with gzip.open(filename, "rt") as f:
+                    return f.read()
+            with open(filename, "r") as f:
+                return f.read()
+
+    def test_vcd(self):
+        vcd = self.vcd_test("sim.vcd")
+        self.assertIn(" counter $end", vcd)
+        self.assertIn(" other $end", vcd)
+        self.assertIn("#0\n$dumpvars\n", vcd)
+
+    def test_vcd_filter(self):
+        vcd = self.vcd_test("sim.vcd", vcd_include=["count*", "other"], vcd_exclude=["other"])
+        self.assertIn(" counter $end", vcd)
+        self.assertNotIn(" other $end", vcd)
+        self.assertNotIn(" sys_clk $end", vcd)
+
+    def test_vcd_window(self):
+        vcd = self.vcd_test("sim.vcd.gz", vcd_include=["counter"], vcd_window=(5, 10),
+            vcd_threaded=True)
+        times = [int(l[1:]) for l in vcd.splitlines() if l.startswith("#")]
+        self.assertEqual(min(times), 5*10)
+        self.assertEqual(max(times), 10*10)
+        # Values are dumped on window entry, then only changes.
+        self.assertIn("$dumpvars\nb00000101 !\n$end", vcd)
+        self.assertEqual(vcd.count("b0000"), 6)
@@ -0,0 +1,74 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import tempfile
+import unittest
+
+from litex.build.sim.verilator import _build_sim, _compile_sim
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def write(filename, content):
+    with open(filename, "w") as f:
+        f.write(content)
+
+def read(filename):
+    with open(filename, "r") as f:
+        return f.read()
+
+# Test Sim Build -----------------------------------------------------------------------------------
+
+class TestSimBuild(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def build(self, build_dir, verilog="module sim(); endmodule", init="00", include="", cache_dir=None):
+        os.makedirs(os.path.join(build_dir, "include"), exist_ok=True)
+        os.chdir(build_dir)
+        for filename, content in [("sim.v", verilog), ("mem.init", init), ("include/sim.vh", include),
+            ("sim_header.h", ""), ("sim_init.cpp", "")]:
+            write(filename, content)
+        # Absolute paths (as added by the platform).
+        include_paths = [os.path.abspath("include")]
+        write("variables.mak", f"INC_DIR = -I{include_paths[0]}\n")
+        sources = [(os.path.abspath("sim.v"), "verilog", "work"), (os.path.abspath("mem.init"), None, None)]
+        _build_sim("sim", sources, jobs=None, threads=1, coverage=False, include_paths=include_paths)
+        # Replace Verilator/make build with a build that just records its executions.
+        write("build_sim.sh", "\n".join([
+            "mkdir -p obj_dir modules",
+            "echo build >> builds.log",
+            "cp sim.v obj_dir/Vsim",
+            "touch modules/clocker.so",
+        ]))
+        _compile_sim("sim", verbose=False, cache_dir=cache_dir)
+        return len(read("builds.log").splitlines()) if os.path.exists("builds.log") else 0
+
+    def test_build_cache(self):
+        build_dir = os.path.join(self.tmp.name, "build")
+        self.assertEqual(self.build(build_dir), 1)
+        # Unchanged sources/runtime data changes: build is reused.
+        self.assertEqual(self.build(build_dir), 1)
+        self.assertEqual(self.build(build_dir, init="01"), 1)
+        # Sources changes: incremental build (obj_dir is kept).
+        write(os.path.join(build_dir, "obj_dir", "Vsim__ALL.o"), "")
+        self.assertEqual(self.build(build_dir, verilog="module sim(input a); endmodule"), 2)
+        self.assertTrue(os.path.exists(os.path.join(build_dir, "obj_dir", "Vsim__ALL.o")))
+
+    def test_shared_build_cache(self):
+        build_dirs = [os.path.join(self.tmp.name, f"build{n}") for n in range(3)]
+        self.assertEqual(self.build(build_dirs[0], cache_dir=self.cache_dir), 1)
+        # Same design in another build directory: build is restored from the cache.
+        self.assertEqual(self.build(build_dirs[1], cache_dir=self.cache_dir), 0)
+        self.assertEqual(read(os.path.join(build_dirs[1], "obj_dir", "Vsim")), "module sim(); endmodule")
+        self.assertTrue(os.path.exists(os.path.join(build_dirs[1], "modules", "clocker.so")))
+        # Include changes: build is not restored from the cache.
+        self.assertEqual(self.build(build_dirs[2], include="`define A", cache_dir=self.cache_dir), 1)
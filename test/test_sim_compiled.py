@@ -0,0 +1,33 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import functools
+import unittest
+from unittest import mock
+
+from litex.gen.sim import run_simulation
+
+from test import test_stream, test_wishbone, test_axi
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def with_compiled_engine(module, cls):
+    # Run the tests of cls (unchanged) with run_simulation(..., engine="compiled").
+    class TestCompiled(cls):
+        def setUp(self):
+            patcher = mock.patch.object(module, "run_simulation",
+                functools.partial(run_simulation, engine="compiled"))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            cls.setUp(self)
+    TestCompiled.__name__     = cls.__name__ + "Compiled"
+    TestCompiled.__qualname__ = cls.__name__ + "Compiled"
+    return TestCompiled
+
+# Test Compiled Simulation Engine ------------------------------------------------------------------
+
+TestStreamCompiled    = with_compiled_engine(test_stream,   test_stream.TestStream)
+TestWishboneCompiled  = with_compiled_engine(test_wishbone, test_wishbone.TestWishbone)
+TestAXICompiled       = with_compiled_engine(test_axi,      test_axi.TestAXI)
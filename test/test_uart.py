@@ -0,0 +1,224 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import struct
+import unittest
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import wishbone
+from litex.soc.cores.uart import Stream2Wishbone
+
+from litex.tools.remote.comm_uart import CommUART, crc8
+from litex.tools.remote.comm_uart import CMD_FRAMED, STATUS_OK, STATUS_CRC_ERROR
+
+# Helpers ------------------------------------------------------------------------------------------
+
+class UARTBoneDUT(LiteXModule):
+    def __init__(self, framed):
+        self.bridge = Stream2Wishbone(clk_freq=1e6, framed=framed)
+        self.sram   = wishbone.SRAM(4*1024, bus=self.bridge.wishbone)
+
+def run_commands(dut, commands, period=None):
+    # Send the commands bytes to the bridge and return the response bytes. With period, bytes are
+    # sent/received every period cycles like with a UART PHY (bytes not accepted are lost).
+    response = bytearray()
+    dropped  = []
+    def sink():
+        for byte in b"".join(commands):
+            yield dut.bridge.sink.valid.eq(1)
+            yield dut.bridge.sink.data.eq(byte)
+            yield
+            if period is None:
+                while not (yield dut.bridge.sink.ready):
+                    yield
+            else:
+                if not (yield dut.bridge.sink.ready):
+                    dropped.append(byte)
+                yield dut.bridge.sink.valid.eq(0)
+                for i in range(period - 1):
+                    yield
+        yield dut.bridge.sink.valid.eq(0)
+        for i in range(1024 if period is None else 64*period):
+            yield
+
+    @passive
+    def source():
+        while True:
+            yield dut.bridge.source.ready.eq(1)
+            yield
+            if (yield dut.bridge.source.valid):
+                response.append((yield dut.bridge.source.data))
+                if period is not None:
+                    yield dut.bridge.source.ready.eq(0)
+                    for i in range(period - 1):
+                        yield
+
+    run_simulation(dut, [sink(), source()])
+    assert not dropped
+    return response
+
+
+class UARTBoneModel:
+    # UARTBone device model (serial port like), corrupting the bytes of the selected commands. Like
+    # the bridge, bytes are only received when no response is being sent: Bytes received while
+    # sending go to the RX FIFO (of rx_fifo_depth bytes) or are lost when it is full.
+    def __init__(self, corrupt=[], rx_fifo_depth=0):
+        self.mem      = {}
+        self.rx       = bytearray()
+        self.tx       = bytearray()
+        self.fifo     = bytearray()
+        self.timeout  = None
+        self.commands = 0
+        self.corrupt  = corrupt
+        self.rx_fifo_depth = rx_fifo_depth
+        self.fifo_level    = 0
+        self.dropped       = 0
+
+    def inWaiting(self):
+        return len(self.tx)
+
+    def read(self, length):
+        data, self.tx = self.tx[:length], self.tx[length:]
+        self._receive()
+        return bytes(data)
+
+    def write(self, data):
+        self._receive(data)
+        return len(data)
+
+    def _receive(self, data=b""):
+        self.fifo += data
+        pos = 0
+        while pos < len(self.fifo) and not self.tx:
+            self.rx.append(self.fifo[pos])
+            self._command()
+            pos += 1
+        del self.fifo[:pos]
+        self.fifo_level = max(self.fifo_level, min(len(self.fifo), self.rx_fifo_depth))
+        if len(self.fifo) > self.rx_fifo_depth:
+            self.dropped += len(self.fifo) - self.rx_fifo_depth
+            del self.fifo[self.rx_fifo_depth:]
+
+    def _command(self):
+        if len(self.rx) < 1:
+            return False
+        cmd     = self.rx[0]
+        framed  = bool(cmd & CMD_FRAMED)
+        header  = 1 + (2 if framed else 1) + 4
+        if len(self.rx) < header:
+            return False
+        length  = int.from_bytes(self.rx[1:header - 4], "big")
+        addr    = int.from_bytes(self.rx[header - 4:header], "big")
+        write   = (cmd & 0xf) in [0x1, 0x3]
+        incr    = (cmd & 0xf) in [0x1, 0x2]
+        size    = header + (4*length if write else 0) + framed
+        if len(self.rx) < size:
+            return False
+        command, self.rx = self.rx[:size], self.rx[size:]
+        self.commands += 1
+        if self.commands in self.corrupt:
+            command[-1] ^= 0xff
+        if framed and crc8(command) != 0:
+            self.tx.append(STATUS_CRC_ERROR)
+            return True
+        if framed:
+            self.tx.append(STATUS_OK)
+        if write:
+            datas = struct.unpack(">{}I".format(length), command[header:header + 4*length])
+            for i, data in enumerate(datas):
+                self.mem[addr + i*incr] = data
+        else:
+            response = struct.pack(">{}I".format(length), *[self.mem.get(addr + i*incr, 0) for i in range(length)])
+            self.tx += response
+            if framed:
+                self.tx.append(crc8(response))
+        return True
+
+def get_comm(framed, corrupt=[]):
+    comm = CommUART("loop://", framed=framed, timeout=0)
+    comm.port = UARTBoneModel(corrupt, rx_fifo_depth=comm.rx_fifo_depth)
+    return comm
+
+# TestUARTBone -------------------------------------------------------------------------------------
+
+class TestUARTBone(unittest.TestCase):
+    def test_gateware_legacy(self):
+        comm     = get_comm(framed=False)
+        datas    = list(range(16))
+        commands = [
+            comm._command(0x01, 0x40, len(datas), struct.pack(">16I", *datas)),
+            comm._command(0x02, 0x40, len(datas)),
+        ]
+        response = run_commands(UARTBoneDUT(framed=True), commands)
+        self.assertEqual(list(struct.unpack(">16I", response)), datas)
+
+    def test_gateware_framed(self):
+        comm     = get_comm(framed=True)
+        datas    = list(range(300))
+        commands = [comm._command(0x01, 0x40 + 4*i, 60, struct.pack(">60I", *datas[i:i + 60])) for i in range(0, 300, 60)]
+        commands.append(comm._command(0x02, 0x40, len(datas)))
+        bad_read = comm._command(0x02, 0x40, 4)
+        bad_read[-1] ^= 0xff
+        # Write with a corrupted data (or longer than the write buffer): Nothing written.
+        bad_write = comm._command(0x01, 0x800, 4, struct.pack(">4I", 1, 2, 3, 4))
+        bad_write[-2] ^= 0xff
+        long_write = comm._command(0x01, 0x800, 65, struct.pack(">65I", *range(65)))
+        check_read = comm._command(0x02, 0x800, 4)
+        response = run_commands(UARTBoneDUT(framed=True), commands + [bad_read, bad_write, long_write, check_read])
+        # Write status.
+        self.assertEqual(response[:5], bytes([STATUS_OK]*5))
+        # Read status/datas/CRC.
+        self.assertEqual(response[5], STATUS_OK)
+        self.assertEqual(list(struct.unpack(">300I", response[6:6 + 4*300])), datas)
+        self.assertEqual(crc8(response[6:6 + 4*300 + 1]), 0)
+        # Read/Writes with CRC error.
+        response = response[6 + 4*300 + 1:]
+        self.assertEqual(response[:3], bytes([STATUS_CRC_ERROR]*3))
+        self.assertEqual(response[3:], bytes([STATUS_OK] + [0]*16 + [0]))
+
+    def test_gateware_rx_fifo(self):
+        # Pipelined commands (up to the RX FIFO depth) with UART-like byte timings.
+        comm     = get_comm(framed=True)
+        datas    = list(range(16))
+        commands = [comm._command(0x01, 0x40, 16, struct.pack(">16I", *datas))]
+        commands += [comm._command(0x02, 0x40 + 4*i, 4) for i in range(0, 16, 4)]
+        self.assertLessEqual(sum(len(command) for command in commands[1:]), comm.rx_fifo_depth)
+        response = run_commands(UARTBoneDUT(framed=True), commands, period=16)
+        self.assertEqual(response[0], STATUS_OK)
+        for i in range(4):
+            read = response[1 + 18*i:1 + 18*(i + 1)]
+            self.assertEqual(read[0], STATUS_OK)
+            self.assertEqual(list(struct.unpack(">4I", read[1:17])), datas[4*i:4*(i + 1)])
+            self.assertEqual(crc8(read[1:]), 0)
+
+    def test_host(self):
+        for framed in [False, True]:
+            comm = get_comm(framed=framed)
+            comm.write(0x100, list(range(1000)))
+            self.assertEqual(comm.read(0x100, 1000), list(range(1000)))
+            self.assertEqual(comm.read(0x104), 1)
+            self.assertEqual(comm.read(0x104, 3, burst="fixed"), [1, 1, 1])
+            self.assertEqual(comm.read_pipelined([(0x100, 2, "incr"), (0x200, 2, "incr")]), [[0, 1], [64, 65]])
+            self.assertEqual(comm.port.dropped, 0)
+
+    def test_host_flow_control(self):
+        for framed in [False, True]:
+            comm  = get_comm(framed=framed)
+            datas = list(range(256))
+            comm.write(0x0, datas)
+            reads = comm.read_pipelined([(4*i, 4, "incr") for i in range(0, 256, 4)])
+            self.assertEqual([data for read in reads for data in read], datas)
+            # No bytes lost, commands only sent in advance with the RX FIFO (framed mode).
+            self.assertEqual(comm.port.dropped, 0)
+            self.assertEqual(comm.port.fifo_level > 0, framed)
+
+    def test_host_retries(self):
+        comm = get_comm(framed=True, corrupt=[1, 3])
+        comm.write(0x0, list(range(8)))
+        self.assertEqual(comm.read(0x0, 8), list(range(8)))
+        self.assertEqual(comm.port.commands, 4)
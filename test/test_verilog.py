@@ -0,0 +1,72 @@
+#
+# This file is part of LiteX.
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+from migen import *
+from migen.fhdl.tools import list_signals, list_targets, list_special_ios, group_by_targets
+
+from litex.gen.fhdl.verilog  import convert, _FragmentAnalysis
+from litex.gen.fhdl.analysis import list_statements_targets
+from litex.gen.fhdl.analysis import group_by_targets as _group_by_targets
+
+from litex.soc.interconnect import wishbone
+
+# Helpers ------------------------------------------------------------------------------------------
+
+class DUT(Module):
+    def __init__(self):
+        self.sel   = sel   = Signal(2, name_override="sel")
+        self.regs  = regs  = Array(Signal(8, name_override=f"reg{i}") for i in range(4))
+        self.a     = a     = Signal(8, name_override="a")
+        self.b     = b     = Signal(8, name_override="b")
+        self.c     = c     = Signal(8, name_override="c")
+        self.d     = d     = Signal(8, name_override="d")
+        self.e     = e     = Signal(8, name_override="e")
+        self.comb += [
+            a.eq(b + 1),
+            If(sel == 0, c[0:4].eq(a)),
+            Case(sel, {1: d.eq(c), "default": e.eq(d)}),
+            If(sel == 2, c[4:8].eq(b)),  # Merges with the If above.
+            e[0].eq(a[0]),               # Merges with the Case above.
+            regs[sel].eq(e),
+        ]
+        self.sync += b.eq(b + regs[sel])
+        self.submodules.sram = wishbone.SRAM(64, init=[1, 2, 3])
+
+# Test Verilog -------------------------------------------------------------------------------------
+
+class TestVerilog(unittest.TestCase):
+    def test_fragment_analysis(self):
+        f = DUT().get_fragment()
+        analysis = _FragmentAnalysis(f)
+        special_ios  = list_special_ios(f, ins=True, outs=True, inouts=True)
+        special_outs = list_special_ios(f, ins=False, outs=True, inouts=True)
+        self.assertEqual(analysis.signals, list_signals(f) | special_ios)
+        self.assertEqual(analysis.targets, list_targets(f) | special_outs)
+        groups = group_by_targets(f.comb)
+        self.assertEqual(len(analysis.comb_groups), len(groups))
+        for (targets, statements), (ref_targets, ref_statements) in zip(analysis.comb_groups, groups):
+            self.assertEqual(targets, ref_targets)
+            self.assertEqual([id(s) for s in statements], [id(s) for s in ref_statements])
+
+    def test_group_by_targets(self):
+        f = DUT().get_fragment()
+        groups     = _group_by_targets(list_statements_targets(f.comb))
+        ref_groups = group_by_targets(f.comb)
+        self.assertEqual(len(groups), len(ref_groups))
+        for (targets, statements), (ref_targets, ref_statements) in zip(groups, ref_groups):
+            self.assertEqual(targets, ref_targets)
+            self.assertEqual([id(s) for s in statements], [id(s) for s in ref_statements])
+
+    def test_convert(self):
+        dut = DUT()
+        dut.clock_domains.cd_sys = ClockDomain("sys")
+        r   = convert(dut, ios={dut.sel, dut.a, dut.e}, name="dut")
+        self.assertIn("module dut (", r.main_source)
+        self.assertIn("assign a = (b + 1'd1);", r.main_source)
+        self.assertIn("output reg     [7:0] e", r.main_source)
+        self.assertIn("endmodule", r.main_source)
+        self.assertEqual(len(r.data_files), 1)
@@ -4,12 +4,34 @@
 # Copyright (c) 2019 Florent Kermarrec <florent@enjoy-digital.fr>
 # SPDX-License-Identifier: BSD-2-Clause
 
+import random
 import unittest
 
 from migen import *
 
 from litex.soc.interconnect import wishbone
 
+# Helpers ------------------------------------------------------------------------------------------
+
+def burst_read(bus, adr, length):
+    # Classic incrementing burst (registered feedback).
+    datas = []
+    yield bus.cyc.eq(1)
+    yield bus.stb.eq(1)
+    yield bus.we.eq(0)
+    for i in range(length):
+        yield bus.adr.eq(adr + i)
+        yield bus.cti.eq(wishbone.CTI_BURST_END if i == (length - 1) else wishbone.CTI_BURST_INCREMENTING)
+        yield
+        while not (yield bus.ack):
+            yield
+        datas.append((yield bus.dat_r))
+    yield bus.cyc.eq(0)
+    yield bus.stb.eq(0)
+    yield bus.cti.eq(0)
+    yield
+    return datas
+
 # TestWishbone -------------------------------------------------------------------------------------
 
 class TestWishbone(unittest.TestCase):
@@ -117,3 +139,260 @@ class TestWishbone(unittest.TestCase):
 
         dut = DUT()
         run_simulation(dut, generator(dut))
+
+    def test_interconnect_pipelined(self):
+        def pipelined_reads(bus, adrs):
+            # Pipelined requests issued back-to-back.
+            datas  = []
+            issued = 0
+            yield bus.cyc.eq(1)
+            yield bus.we.eq(0)
+            while len(datas) < len(adrs):
+                yield bus.stb.eq(issued < len(adrs))
+                yield bus.adr.eq(adrs[min(issued, len(adrs) - 1)])
+                yield
+                if (yield bus.ack):
+                    datas.append((yield bus.dat_r))
+                if (yield bus.stb) and not (yield bus.stall):
+                    issued += 1
+            yield bus.cyc.eq(0)
+            yield bus.stb.eq(0)
+            yield
+            return datas
+
+        class DUT(Module):
+            def __init__(self, interconnect, register, slave_mode):
+                self.m0 = wishbone.Interface(data_width=32, adr_width=30)
+                self.m1 = wishbone.Interface(data_width=32, adr_width=30, mode="pipelined")
+                slaves = []
+                for i in range(2):
+                    bus = wishbone.Interface(data_width=32, adr_width=30, mode=slave_mode, bursting=True)
+                    self.submodules += wishbone.SRAM(1024, bus=bus, init=[0x1000*(i + 1) + j for j in range(256)])
+                    slaves.append((lambda a, i=i: a[8:] == i, bus))
+                self.submodules += interconnect([self.m0, self.m1], slaves, register=register,
+                    read_ahead=lambda a: a[8:] == 0)
+
+        for interconnect in [wishbone.InterconnectPipelined, wishbone.CrossbarPipelined]:
+            for register in [False, True]:
+                for slave_mode in ["classic", "pipelined"]:
+                    dut = DUT(interconnect, register, slave_mode)
+                    def m0_generator():
+                        yield from dut.m0.write(0x010, 0xdeadbeef)
+                        self.assertEqual((yield from dut.m0.read(0x010)), 0xdeadbeef)
+                        self.assertEqual((yield from dut.m0.read(0x105)), 0x2005)
+                        self.assertEqual((yield from burst_read(dut.m0, 0x020, 8)), [0x1020 + i for i in range(8)])
+                        self.assertEqual((yield from burst_read(dut.m0, 0x1f0, 4)), [0x20f0 + i for i in range(4)])
+                        self.assertEqual((yield from dut.m0.read(0x011)), 0x1011)
+                    def m1_generator():
+                        yield from dut.m1.write(0x110, 0xc0ffee00)
+                        self.assertEqual((yield from dut.m1.read(0x110)), 0xc0ffee00)
+                        datas = yield from pipelined_reads(dut.m1, [0x000, 0x001, 0x002, 0x100, 0x101, 0x003, 0x102])
+                        self.assertEqual(datas, [0x1000, 0x1001, 0x1002, 0x2000, 0x2001, 0x1003, 0x2002])
+                    run_simulation(dut, [m0_generator(), m1_generator()])
+
+    def test_classic2pipelined_read_ahead(self):
+        class DUT(Module):
+            def __init__(self, read_ahead):
+                self.master = wishbone.Interface(data_width=32, adr_width=30)
+                self.slave  = wishbone.Interface(data_width=32, adr_width=30, mode="pipelined")
+                self.submodules += wishbone.Classic2Pipelined(self.master, self.slave, read_ahead=read_ahead)
+                self.submodules += wishbone.SRAM(2048, bus=self.slave, init=[0x1000 + j for j in range(512)])
+
+        @passive
+        def monitor(dut, reads):
+            # Reads issued to the slave.
+            while True:
+                if (yield dut.slave.cyc) and (yield dut.slave.stb) and not (yield dut.slave.stall):
+                    reads.append((yield dut.slave.adr))
+                yield
+
+        # Read ahead in the first 256 words only (ex: memory followed by IO), none by default.
+        for read_ahead in [None, lambda a: a[8:] == 0]:
+            dut   = DUT(read_ahead)
+            reads = []
+            def generator(dut):
+                self.assertEqual((yield from burst_read(dut.master, 0x010, 8)), [0x1010 + i for i in range(8)])
+                self.assertEqual((yield from burst_read(dut.master, 0x0fe, 4)), [0x10fe + i for i in range(4)])
+                self.assertEqual((yield from dut.master.read(0x011)), 0x1011)
+                for i in range(8):
+                    yield
+            run_simulation(dut, [generator(dut), monitor(dut, reads)])
+            # Reads issued ahead stay in the read ahead addresses, others are only the requested ones.
+            requested = [0x010 + i for i in range(8)] + [0x0fe + i for i in range(4)] + [0x011]
+            self.assertEqual([adr for adr in reads if adr >= 0x100], [0x100, 0x101])
+            if read_ahead is None:
+                self.assertEqual(reads, requested)
+            else:
+                self.assertTrue(set(requested).issubset(reads))
+                self.assertGreater(len(reads), len(requested))
+
+    def test_cache(self):
+        class DUT(Module):
+            def __init__(self, dw_from, dw_to, **kwargs):
+                self.master = wishbone.Interface(data_width=dw_from, adr_width=30)
+                slave       = wishbone.Interface(data_width=dw_to,   adr_width=30, bursting=True)
+                self.submodules.cache = wishbone.Cache(64, self.master, slave, with_csr=True, **kwargs)
+                self.submodules.sram  = wishbone.SRAM(4096, bus=slave)
+
+        configs = [
+            (32,  32, dict()),
+            (32, 128, dict(ways=2, replacement="lru",    with_write_buffer=True)),
+            (128, 32, dict(ways=4, replacement="plru",   with_write_buffer=True)),
+            (128, 32, dict(ways=2, replacement="random", with_write_buffer=False)),
+        ]
+        for dw_from, dw_to, kwargs in configs:
+            dut  = DUT(dw_from, dw_to, **kwargs)
+            prng = random.Random(42)
+            ref  = {}
+            def generator(dut):
+                # Random reads/writes on 4x the cache size, checked against a reference memory.
+                for i in range(150):
+                    adr = prng.randrange(4096//(dw_from//8))
+                    if prng.randrange(2):
+                        ref[adr] = prng.randrange(2**dw_from)
+                        yield from dut.master.write(adr, ref[adr])
+                    else:
+                        self.assertEqual((yield from dut.master.read(adr)), ref.get(adr, 0))
+                yield
+                hits      = (yield dut.cache._hits.status)
+                misses    = (yield dut.cache._misses.status)
+                evictions = (yield dut.cache._evictions.status)
+                self.assertEqual(hits + misses, 150)
+                self.assertGreater(evictions, 0)
+                self.assertLessEqual(evictions, misses)
+            run_simulation(dut, generator(dut))
+
+    def test_decoder_pipelined_reduce(self):
+        class DUT(Module):
+            def __init__(self, reduce_mode, reduce_stages):
+                self.master = wishbone.Interface(data_width=32, adr_width=30)
+                slaves = []
+                for i in range(5):
+                    bus = wishbone.Interface(data_width=32, adr_width=30)
+                    self.submodules += wishbone.SRAM(1024, bus=bus, init=[0x1000*(i + 1) + j for j in range(256)])
+                    slaves.append((lambda a, i=i: a[8:] == i, bus))
+                self.slaves = slaves
+                self.submodules.decoder = wishbone.Decoder(self.master, slaves,
+                    reduce_mode   = reduce_mode,
+                    reduce_stages = reduce_stages)
+
+        for reduce_mode, reduce_stages in [("chain", 1), ("tree", 1), ("pipelined", 1), ("pipelined", 2)]:
+            dut = DUT(reduce_mode, reduce_stages)
+            def generator(dut):
+                for i in range(5):
+                    self.assertEqual((yield from dut.master.read(0x100*i + 0x10)), 0x1000*(i + 1) + 0x10)
+                    yield from dut.master.write(0x100*i + 0x20, i)
+                for i in range(5):
+                    self.assertEqual((yield from dut.master.read(0x100*i + 0x20)), i)
+                    self.assertEqual((yield from dut.master.read(0x100*i + 0x21)), 0x1000*(i + 1) + 0x21)
+            acks = []
+            def monitor(dut):
+                # Count slaves acks: Each access must be acked once by the slave.
+                for i in range(200):
+                    for _, bus in dut.slaves:
+                        acks.append((yield bus.ack))
+                    yield
+            run_simulation(dut, [generator(dut), monitor(dut)])
+            self.assertEqual(sum(acks), 20)
+
+    def test_wishbone2csr_pipelined(self):
+        from litex.soc.interconnect import csr_bus
+
+        class DUT(Module):
+            def __init__(self, mode, register, latency):
+                self.wb  = wishbone.Interface(data_width=32, adr_width=30, mode=mode)
+                csr      = csr_bus.Interface(data_width=32, address_width=14)
+                sram_bus = csr_bus.Interface(data_width=32, address_width=14)
+                self.submodules.bridge = wishbone.Wishbone2CSR(self.wb, csr,
+                    register  = register,
+                    latency   = latency,
+                    pipelined = True)
+                # CSR SRAM behind a CSR Interconnect with latency extra cycles of read latency.
+                self.submodules.interconnect = csr_bus.InterconnectShared([csr], [sram_bus],
+                    reduce_mode   = "pipelined" if latency else "tree",
+                    reduce_stages = latency)
+                self.submodules.sram = csr_bus.SRAM(Memory(32, 256), 0, bus=sram_bus)
+
+        def pipelined_accesses(bus, adrs, we=0, datas=None):
+            # Pipelined accesses issued back-to-back, returns (read datas, cycles).
+            results = []
+            issued  = 0
+            cycles  = 0
+            yield bus.cyc.eq(1)
+            yield bus.we.eq(we)
+            yield bus.sel.eq(0xf)
+            while len(results) < len(adrs):
+                yield bus.stb.eq(issued < len(adrs))
+                yield bus.adr.eq(adrs[min(issued, len(adrs) - 1)])
+                if datas is not None:
+                    yield bus.dat_w.eq(datas[min(issued, len(adrs) - 1)])
+                yield
+                cycles += 1
+                if (yield bus.ack):
+                    results.append((yield bus.dat_r))
+                if (yield bus.stb) and not (yield bus.stall):
+                    issued += 1
+            yield bus.cyc.eq(0)
+            yield bus.stb.eq(0)
+            yield
+            return results, cycles
+
+        def burst_read(bus, adr, length):
+            # Classic incrementing burst, returns (read datas, cycles).
+            datas  = []
+            cycles = 0
+            yield bus.cyc.eq(1)
+            yield bus.stb.eq(1)
+            yield bus.we.eq(0)
+            for i in range(length):
+                yield bus.adr.eq(adr + i)
+                yield bus.cti.eq(wishbone.CTI_BURST_END if i == (length - 1) else wishbone.CTI_BURST_INCREMENTING)
+                yield
+                cycles += 1
+                while not (yield bus.ack):
+                    yield
+                    cycles += 1
+                datas.append((yield bus.dat_r))
+            yield bus.cyc.eq(0)
+            yield bus.stb.eq(0)
+            yield bus.cti.eq(0)
+            for i in range(8):
+                yield
+            return datas, cycles
+
+        n = 64
+        for register in [False, True]:
+            for latency in [0, 2]:
+                # Pipelined Wishbone: Writes/Reads at one access per cycle.
+                dut = DUT("pipelined", register, latency)
+                def generator(dut):
+                    datas = [0x1000 + i for i in range(n)]
+                    _, cycles = yield from pipelined_accesses(dut.wb, list(range(n)), we=1, datas=datas)
+                    self.assertLess(cycles, n + 4 + latency)
+                    results, cycles = yield from pipelined_accesses(dut.wb, list(range(n)))
+                    self.assertEqual(results, datas)
+                    self.assertLess(cycles, n + 4 + latency)
+                    # Non-contiguous reads.
+                    results, cycles = yield from pipelined_accesses(dut.wb, [7, 3, 5, 3])
+                    self.assertEqual(results, [0x1007, 0x1003, 0x1005, 0x1003])
+                run_simulation(dut, generator(dut))
+
+                # Classic Wishbone: Single accesses and incrementing bursts.
+                dut = DUT("classic", register, latency)
+                csr_accesses = []
+                def generator(dut):
+                    for i in range(n):
+                        yield from dut.wb.write(i, 0x2000 + i)
+                    self.assertEqual((yield from dut.wb.read(5)), 0x2005)
+                    csr_accesses.clear()
+                    datas, cycles = yield from burst_read(dut.wb, 1, n - 1)
+                    self.assertEqual(datas, [0x2000 + i for i in range(1, n)])
+                    # Only the requested reads are done on the CSR bus (no read-ahead).
+                    self.assertEqual(sum(csr_accesses), n - 1)
+                    self.assertEqual((yield from dut.wb.read(6)), 0x2006)
+                @passive
+                def monitor(dut):
+                    while True:
+                        csr_accesses.append((yield dut.bridge.csr.adr) != 0)
+                        yield
+                run_simulation(dut, [generator(dut), monitor(dut)])